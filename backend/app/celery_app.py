@@ -1,5 +1,12 @@
-from celery import Celery
+from celery import Celery, chord, group
+from celery.exceptions import Ignore
+from celery.signals import worker_process_init, worker_process_shutdown
 import os
+import json
+import time
+import shutil
+import threading
+import numpy as np
 from dotenv import load_dotenv
 import logging
 from sqlalchemy.orm import sessionmaker
@@ -7,8 +14,10 @@ from sqlalchemy import create_engine
 
 from .database import Document, DATABASE_URL
 from .core.document_processor import DocumentProcessor
-from .core.vector_store import VectorStoreManager
+from .core.enhanced_vector_store import EnhancedVectorStore
 from .core.model_factory import ModelFactory
+from .ingest_scheduler import LANE_QUEUES, DEFERRED_STATUS, select_deferred
+from .core.progress import ProgressReporter
 
 load_dotenv()
 
@@ -37,10 +46,26 @@ celery_app.conf.update(
     worker_max_tasks_per_child=50,
     task_routes={
         'app.celery_app.process_document_task': {'queue': 'document_processing'},
+        'app.celery_app.ingest_shard_task': {'queue': 'document_processing'},
+        'app.celery_app.finalize_ingest_task': {'queue': 'document_processing'},
         'app.celery_app.cleanup_task': {'queue': 'maintenance'},
+        'app.celery_app.dispatch_deferred_task': {'queue': 'maintenance'},
     }
 )
 
+# 流式入库时每次嵌入写入的块数
+INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", 64))
+
+# 入库完成后自动生成全文摘要并写入缓存
+SUMMARY_ON_INGEST = os.getenv("SUMMARY_ON_INGEST", "true").lower() == "true"
+
+# 分片入库：页数达到阈值的文档按页范围拆成子任务，由多个工作进程并行提取、分块和嵌入
+INGEST_FANOUT_MIN_PAGES = int(os.getenv("INGEST_FANOUT_MIN_PAGES", 300))
+INGEST_SHARD_PAGES = int(os.getenv("INGEST_SHARD_PAGES", 100))
+INGEST_SHARD_MAX_RETRIES = int(os.getenv("INGEST_SHARD_MAX_RETRIES", 3))
+# 分片结果（文本块和向量）的暂存目录，合并完成后删除
+INGEST_SHARD_DIR = os.getenv("INGEST_SHARD_DIR", "./ingest_shards")
+
 # 数据库连接
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -49,13 +74,22 @@ def get_db_session():
     """获取数据库会话"""
     return SessionLocal()
 
-# 初始化组件
-def get_components():
-    """获取处理组件"""
+# 工作进程启动时预热：jieba词典（关键词索引分词用），以及可选的模型客户端（会产生一次API调用）
+WORKER_PREWARM = os.getenv("WORKER_PREWARM", "true").lower() == "true"
+WORKER_PREWARM_MODELS = os.getenv("WORKER_PREWARM_MODELS", "false").lower() == "true"
+
+# 进程级组件单例：每个工作进程初始化一次，跨任务复用（fork之后创建，不与父进程共享连接）
+_components = None
+_agent = None
+_components_lock = threading.RLock()
+
+def build_components():
+    """创建处理组件"""
     embedding_type = os.getenv("EMBEDDING_TYPE", "openai")
     
     processor = DocumentProcessor()
-    vector_store = VectorStoreManager(
+    # 使用增强的向量存储，入库时同时建立关键词索引
+    vector_store = EnhancedVectorStore(
         embedding_type=embedding_type,
         embedding_config={
             "model": os.getenv("QWEN_EMBEDDING_MODEL", "text-embedding-v1")
@@ -64,10 +98,94 @@ def get_components():
     
     return processor, vector_store
 
+def get_components():
+    """获取处理组件（进程内单例）"""
+    global _components
+    if _components is None:
+        with _components_lock:
+            if _components is None:
+                _components = build_components()
+    return _components
+
+def get_agent():
+    """获取文档分析智能体（进程内单例，与任务共用向量存储）"""
+    global _agent
+    if _agent is None:
+        with _components_lock:
+            if _agent is None:
+                from .core.agent_core import DocumentAnalysisAgent
+                
+                _, vector_store = get_components()
+                _agent = DocumentAnalysisAgent(
+                    vector_store_manager=vector_store,
+                    llm_type=os.getenv("LLM_TYPE", "openai"),
+                    model_config={
+                        "model": os.getenv("QWEN_MODEL", "qwen-plus"),
+                        "temperature": 0.1
+                    }
+                )
+    return _agent
+
+def close_components():
+    """释放进程内组件持有的数据库连接（仅在工作进程退出时调用）"""
+    global _components, _agent
+    with _components_lock:
+        if _components is not None:
+            _, vector_store = _components
+            try:
+                vector_store.keyword_index.close()
+                embedding_cache = getattr(vector_store.embeddings, "cache", None)
+                if embedding_cache is not None:
+                    embedding_cache.close()
+            except Exception as e:
+                logger.error(f"释放工作进程组件失败: {e}")
+        
+        _components = None
+        _agent = None
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """工作进程启动时初始化组件并预热"""
+    start_time = time.time()
+    
+    try:
+        _, vector_store = get_components()
+        get_agent()
+        
+        if WORKER_PREWARM:
+            import jieba
+            jieba.initialize()
+        
+        if WORKER_PREWARM_MODELS:
+            vector_store.embeddings.embed_query("预热")
+        
+        logger.info(f"工作进程 {os.getpid()} 组件初始化完成，耗时 {time.time() - start_time:.2f}s")
+    except Exception as e:
+        # 初始化失败不阻止进程启动，首个任务会再次尝试
+        logger.error(f"工作进程组件初始化失败: {e}")
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    """工作进程退出时释放组件"""
+    close_components()
+    logger.info(f"工作进程 {os.getpid()} 组件已释放")
+
+def enqueue_document(document: Document):
+    """按文档的优先级通道提交处理任务"""
+    return process_document_task.apply_async(
+        args=[document.id, document.file_path],
+        queue=LANE_QUEUES.get(document.lane, LANE_QUEUES["bulk"])
+    )
+
 @celery_app.task(bind=True, name='app.celery_app.process_document_task')
 def process_document_task(self, document_id: str, file_path: str):
     """异步处理文档任务"""
     db = get_db_session()
+    document = None
+    
+    # 细粒度进度通过Redis pub/sub推送给客户端（见 /api/v1/documents/{id}/progress）
+    reporter = ProgressReporter(document_id)
+    reporter.reset()
     
     try:
         # 更新任务状态
@@ -75,6 +193,7 @@ def process_document_task(self, document_id: str, file_path: str):
             state="PROCESSING", 
             meta={"step": "初始化", "progress": 0}
         )
+        reporter.publish("初始化", progress=0)
         
         # 获取处理组件
         processor, vector_store = get_components()
@@ -91,30 +210,91 @@ def process_document_task(self, document_id: str, file_path: str):
             meta={"step": "提取文本", "progress": 20}
         )
         
-        # 处理文档
-        result = processor.process_document(file_path)
+        # 只读取页数和元数据，文本按窗口流式提取
+        pdf_info = processor.get_pdf_info(file_path)
+        total_pages = pdf_info["pages"]
+        if document:
+            document.pages = total_pages
+            db.commit()
+        
+        reporter.publish("提取文本", progress=20, pages_processed=0, total_pages=total_pages)
+        
+        # 创建向量存储
+        if not vector_store.create_document_collection(document_id):
+            raise Exception("创建向量集合失败")
+        
+        # 大文档拆成页范围分片并行处理，由合并回调写入向量库并更新文档记录
+        if total_pages >= INGEST_FANOUT_MIN_PAGES:
+            ranges = [
+                (start, min(start + INGEST_SHARD_PAGES, total_pages))
+                for start in range(0, total_pages, INGEST_SHARD_PAGES)
+            ]
+            # 分片和合并回调把进度及最终结果写回本任务，/api/v1/tasks/{task_id} 可持续跟踪
+            task_id = self.request.id
+            callback = finalize_ingest_task.s(document_id, total_pages, task_id).on_error(
+                ingest_failed_task.s(document_id, task_id)
+            )
+            chord(
+                group(
+                    ingest_shard_task.s(document_id, file_path, start, end, total_pages, task_id)
+                    for start, end in ranges
+                )
+            )(callback)
+            
+            reporter.publish(
+                "分片入库", progress=20, pages_processed=0, total_pages=total_pages, shards=len(ranges)
+            )
+            
+            self.update_state(
+                state="PROCESSING", 
+                meta={"step": "分片入库", "progress": 20, "shards": len(ranges), "total_pages": total_pages}
+            )
+            logger.info(f"文档 {document_id} 拆分为 {len(ranges)} 个分片并行入库")
+            
+            # 不以SUCCESS结束：任务保持PROCESSING，由合并回调写入最终结果
+            raise Ignore()
         
-        if not result["success"]:
-            # 处理失败
+        # 流式流水线：提取窗口 → 分块 → 分批嵌入 → 写入向量库
+        chunk_count = 0
+        pages_before = 0
+        for batch in processor.iter_chunk_batches(file_path):
+            chunks = batch["chunks"]
+            window_pages = batch["pages_processed"] - pages_before
+            for i in range(0, len(chunks), INGEST_EMBED_BATCH_SIZE):
+                if not vector_store.add_document_chunks(document_id, chunks[i:i + INGEST_EMBED_BATCH_SIZE]):
+                    raise Exception("写入向量存储失败")
+                
+                # 按窗口内已嵌入的块数估算已完成的页数，进度随嵌入吞吐推进
+                embedded = min(i + INGEST_EMBED_BATCH_SIZE, len(chunks))
+                pages_done = pages_before + window_pages * embedded / len(chunks)
+                elapsed = time.time() - reporter.start_time
+                reporter.publish(
+                    "嵌入",
+                    progress=20 + int(70 * pages_done / max(total_pages, 1)),
+                    pages_processed=int(pages_done),
+                    total_pages=total_pages,
+                    chunks_embedded=chunk_count + embedded,
+                    chunks_per_second=round((chunk_count + embedded) / elapsed, 2) if elapsed else None
+                )
+            
+            chunk_count += len(chunks)
+            pages_before = batch["pages_processed"]
+            
+            # 已写入的块立即可检索
             if document:
-                document.status = "failed"
+                document.chunk_count = chunk_count
                 db.commit()
             
             self.update_state(
-                state="FAILURE", 
-                meta={"error": result["error"]}
+                state="PROCESSING", 
+                meta={
+                    "step": "流式入库",
+                    "progress": 20 + int(70 * batch["pages_processed"] / max(total_pages, 1)),
+                    "pages_processed": batch["pages_processed"],
+                    "total_pages": total_pages,
+                    "chunk_count": chunk_count
+                }
             )
-            return {"status": "failed", "error": result["error"]}
-        
-        # 更新任务状态
-        self.update_state(
-            state="PROCESSING", 
-            meta={"step": "创建向量存储", "progress": 60}
-        )
-        
-        # 创建向量存储
-        vector_store.create_document_collection(document_id)
-        vector_store.add_document_chunks(document_id, result["chunks"])
         
         # 更新任务状态
         self.update_state(
@@ -124,8 +304,8 @@ def process_document_task(self, document_id: str, file_path: str):
         
         # 更新数据库
         if document:
-            document.pages = result["metadata"]["pages"]
-            document.chunk_count = result["chunk_count"]
+            document.pages = total_pages
+            document.chunk_count = chunk_count
             document.status = "completed"
             db.commit()
         
@@ -136,14 +316,28 @@ def process_document_task(self, document_id: str, file_path: str):
         )
         
         logger.info(f"文档 {document_id} 处理完成")
+        reporter.publish(
+            "完成", status="completed", progress=100,
+            pages_processed=total_pages, total_pages=total_pages, chunks_embedded=chunk_count
+        )
+        
+        # 后台预生成摘要，/summary 请求直接读取缓存
+        if SUMMARY_ON_INGEST:
+            generate_summary_task.delay(document_id)
+        
+        # 积压减少，提交排队中的文档
+        dispatch_deferred_task.delay()
         
         return {
             "status": "completed",
-            "chunk_count": result["chunk_count"],
-            "pages": result["metadata"]["pages"],
+            "chunk_count": chunk_count,
+            "pages": total_pages,
             "message": "文档处理完成"
         }
         
+    except Ignore:
+        raise
+        
     except Exception as e:
         logger.error(f"处理文档 {document_id} 时发生错误: {str(e)}")
         
@@ -152,6 +346,9 @@ def process_document_task(self, document_id: str, file_path: str):
             document.status = "failed"
             db.commit()
         
+        reporter.publish("失败", status="failed", error=str(e))
+        dispatch_deferred_task.delay()
+        
         self.update_state(
             state="FAILURE", 
             meta={"error": str(e)}
@@ -162,6 +359,261 @@ def process_document_task(self, document_id: str, file_path: str):
     finally:
         db.close()
 
+def _update_parent_task(task_id: str, state: str, meta: dict) -> None:
+    """把分片入库的进度或最终结果写回原始的处理任务"""
+    if not task_id:
+        return
+    
+    try:
+        if state == "SUCCESS":
+            celery_app.backend.mark_as_done(task_id, meta)
+        else:
+            celery_app.backend.store_result(task_id, meta, state)
+    except Exception as e:
+        logger.error(f"更新任务 {task_id} 状态失败: {e}")
+
+def _shard_path(document_id: str, start_page: int, end_page: int) -> str:
+    """分片结果文件路径（不含扩展名），按页范围命名，分片大小调整后不会误用旧结果"""
+    return os.path.join(INGEST_SHARD_DIR, document_id, f"pages-{start_page:06d}-{end_page:06d}")
+
+def _write_shard(path: str, chunks: list, embeddings: list) -> None:
+    """原子写入分片结果：先写向量，最后写文本块文件作为完成标记"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    
+    with open(path + ".npy.tmp", "wb") as f:
+        np.save(f, np.asarray(embeddings, dtype=np.float32))
+    os.replace(path + ".npy.tmp", path + ".npy")
+    
+    with open(path + ".json.tmp", "w", encoding="utf-8") as f:
+        json.dump(chunks, f, ensure_ascii=False)
+    os.replace(path + ".json.tmp", path + ".json")
+
+def _read_shard(path: str):
+    """读取分片结果，返回 (文本块, 向量矩阵)"""
+    with open(path + ".json", encoding="utf-8") as f:
+        chunks = json.load(f)
+    return chunks, np.load(path + ".npy")
+
+@celery_app.task(
+    bind=True,
+    name='app.celery_app.ingest_shard_task',
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=INGEST_SHARD_MAX_RETRIES,
+    acks_late=True
+)
+def ingest_shard_task(
+    self, 
+    document_id: str, 
+    file_path: str, 
+    start_page: int, 
+    end_page: int, 
+    total_pages: int = None,
+    parent_task_id: str = None
+):
+    """分片入库子任务：提取[start_page, end_page)页、分块并计算向量，结果暂存到磁盘
+    
+    分片内的块编号从0开始，由合并回调统一重新编号。已完成的分片不会重复处理，
+    失败的分片按退避策略单独重试，或在重新提交入库时只处理缺失的分片。
+    """
+    path = _shard_path(document_id, start_page, end_page)
+    reporter = ProgressReporter(document_id)
+    total_pages = total_pages or end_page
+    
+    def report_shard_done(chunk_count: int) -> None:
+        # 各分片并行执行，已完成页数通过Redis计数器汇总
+        pages_done = reporter.increment("pages_processed", end_page - start_page)
+        progress = 20 + int(70 * pages_done / max(total_pages, 1))
+        reporter.publish(
+            "分片入库",
+            progress=progress,
+            pages_processed=pages_done,
+            total_pages=total_pages,
+            shard=[start_page + 1, end_page],
+            shard_chunks=chunk_count
+        )
+        _update_parent_task(parent_task_id, "PROCESSING", {
+            "step": "分片入库",
+            "progress": progress,
+            "pages_processed": pages_done,
+            "total_pages": total_pages
+        })
+    
+    if os.path.exists(path + ".json"):
+        logger.info(f"文档 {document_id} 第{start_page + 1}-{end_page}页分片已完成，跳过")
+        with open(path + ".json", encoding="utf-8") as f:
+            chunk_count = len(json.load(f))
+        report_shard_done(chunk_count)
+        return {"start_page": start_page, "end_page": end_page, "chunk_count": chunk_count}
+    
+    processor, vector_store = get_components()
+    
+    # 并行度来自分片本身，子任务内串行提取
+    chunks = [
+        chunk
+        for batch in processor.iter_chunk_batches(
+            file_path, start_page=start_page, end_page=end_page, parallel=False
+        )
+        for chunk in batch["chunks"]
+    ]
+    
+    embeddings = []
+    for i in range(0, len(chunks), INGEST_EMBED_BATCH_SIZE):
+        batch = chunks[i:i + INGEST_EMBED_BATCH_SIZE]
+        embeddings.extend(vector_store.embeddings.embed_documents([chunk["content"] for chunk in batch]))
+        
+        # 所有分片累计嵌入的块数（重试时重复计入，反映实际嵌入量）
+        reporter.publish(
+            "分片嵌入",
+            chunks_embedded=reporter.increment("chunks_embedded", len(batch)),
+            shard=[start_page + 1, end_page]
+        )
+    
+    _write_shard(path, chunks, embeddings)
+    logger.info(f"文档 {document_id} 第{start_page + 1}-{end_page}页分片完成: {len(chunks)} 个文本块")
+    report_shard_done(len(chunks))
+    
+    return {"start_page": start_page, "end_page": end_page, "chunk_count": len(chunks)}
+
+@celery_app.task(bind=True, name='app.celery_app.finalize_ingest_task')
+def finalize_ingest_task(self, shard_results: list, document_id: str, total_pages: int, parent_task_id: str = None):
+    """分片入库合并回调：按页顺序为文本块统一编号，写入向量库并更新文档记录"""
+    db = get_db_session()
+    document = None
+    reporter = ProgressReporter(document_id)
+    total_chunks = sum(result.get("chunk_count", 0) for result in shard_results)
+    
+    try:
+        _, vector_store = get_components()
+        document = db.query(Document).filter(Document.id == document_id).first()
+        
+        chunk_count = 0
+        for shard in sorted(shard_results, key=lambda result: result["start_page"]):
+            path = _shard_path(document_id, shard["start_page"], shard["end_page"])
+            chunks, embeddings = _read_shard(path)
+            
+            # 编号与ID只由分片顺序和块内容决定，重复执行合并时按ID覆盖
+            chunks = DocumentProcessor.renumber_chunks(chunks, chunk_count)
+            for i in range(0, len(chunks), INGEST_EMBED_BATCH_SIZE):
+                if not vector_store.add_document_chunks(
+                    document_id,
+                    chunks[i:i + INGEST_EMBED_BATCH_SIZE],
+                    embeddings[i:i + INGEST_EMBED_BATCH_SIZE].tolist()
+                ):
+                    raise Exception("写入向量存储失败")
+                
+                written = chunk_count + min(i + INGEST_EMBED_BATCH_SIZE, len(chunks))
+                reporter.publish(
+                    "写入向量库",
+                    progress=90 + int(10 * written / max(total_chunks, 1)),
+                    pages_processed=total_pages,
+                    total_pages=total_pages,
+                    chunks_written=written,
+                    chunks_total=total_chunks
+                )
+            
+            chunk_count += len(chunks)
+            
+            # 已写入的块立即可检索
+            if document:
+                document.chunk_count = chunk_count
+                db.commit()
+        
+        if document:
+            document.pages = total_pages
+            document.chunk_count = chunk_count
+            document.status = "completed"
+            db.commit()
+        
+        shutil.rmtree(os.path.join(INGEST_SHARD_DIR, document_id), ignore_errors=True)
+        logger.info(f"文档 {document_id} 分片入库完成: {len(shard_results)} 个分片, {chunk_count} 个文本块")
+        reporter.publish(
+            "完成", status="completed", progress=100,
+            pages_processed=total_pages, total_pages=total_pages, chunks_embedded=chunk_count
+        )
+        
+        if SUMMARY_ON_INGEST:
+            generate_summary_task.delay(document_id)
+        
+        dispatch_deferred_task.delay()
+        
+        result = {
+            "status": "completed",
+            "chunk_count": chunk_count,
+            "pages": total_pages,
+            "message": "文档处理完成"
+        }
+        _update_parent_task(parent_task_id, "SUCCESS", result)
+        return result
+    
+    except Exception as e:
+        # 分片结果保留在磁盘上，重新提交入库时直接复用
+        logger.error(f"合并文档 {document_id} 的分片时发生错误: {str(e)}")
+        
+        if document:
+            document.status = "failed"
+            db.commit()
+        
+        reporter.publish("失败", status="failed", error=str(e))
+        dispatch_deferred_task.delay()
+        
+        result = {"status": "failed", "error": str(e)}
+        _update_parent_task(parent_task_id, "SUCCESS", result)
+        return result
+    
+    finally:
+        db.close()
+
+@celery_app.task(name='app.celery_app.ingest_failed_task')
+def ingest_failed_task(request, exc, traceback, document_id: str, parent_task_id: str = None):
+    """分片重试耗尽时的回调：标记文档失败（已完成的分片保留，重新提交时只处理失败的分片）"""
+    logger.error(f"文档 {document_id} 分片入库失败: {exc}")
+    ProgressReporter(document_id).publish("失败", status="failed", error=str(exc))
+    
+    db = get_db_session()
+    try:
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if document:
+            document.status = "failed"
+            db.commit()
+    finally:
+        db.close()
+    
+    # 与单任务入库失败时的结果一致
+    _update_parent_task(parent_task_id, "SUCCESS", {"status": "failed", "error": str(exc)})
+    dispatch_deferred_task.delay()
+
+@celery_app.task(name='app.celery_app.dispatch_deferred_task')
+def dispatch_deferred_task():
+    """提交排队中的文档：按租户轮转，积压不超过准入上限"""
+    db = get_db_session()
+    
+    try:
+        dispatched = 0
+        for document in select_deferred(db):
+            # 条件更新，多个调度任务并发执行时同一文档只提交一次
+            claimed = db.query(Document).filter(
+                Document.id == document.id,
+                Document.status == DEFERRED_STATUS
+            ).update({"status": "pending"}, synchronize_session=False)
+            db.commit()
+            
+            if claimed:
+                enqueue_document(document)
+                dispatched += 1
+        
+        if dispatched:
+            logger.info(f"提交了 {dispatched} 个排队中的文档")
+        
+        return {"dispatched": dispatched}
+    
+    except Exception as e:
+        logger.error(f"提交排队文档失败: {str(e)}")
+        return {"error": str(e)}
+    
+    finally:
+        db.close()
+
 @celery_app.task(name='app.celery_app.cleanup_task')
 def cleanup_task():
     """清理任务：删除过期文件和数据"""
@@ -184,6 +636,9 @@ def cleanup_task():
             if os.path.exists(doc.file_path):
                 os.remove(doc.file_path)
             
+            # 删除未合并的分片结果
+            shutil.rmtree(os.path.join(INGEST_SHARD_DIR, doc.id), ignore_errors=True)
+            
             # 删除数据库记录
             db.delete(doc)
             cleaned_count += 1
@@ -211,24 +666,11 @@ def generate_summary_task(document_id: str):
         if not document or document.status != "completed":
             return {"error": "文档不存在或未完成处理"}
         
-        # 获取组件
-        _, vector_store = get_components()
-        
-        # 初始化智能体
-        llm_type = os.getenv("LLM_TYPE", "openai")
-        from .core.agent_core import DocumentAnalysisAgent
-        
-        agent = DocumentAnalysisAgent(
-            vector_store_manager=vector_store,
-            llm_type=llm_type,
-            model_config={
-                "model": os.getenv("QWEN_MODEL", "qwen-plus"),
-                "temperature": 0.1
-            }
-        )
+        # 复用进程内的智能体
+        agent = get_agent()
         
-        # 生成摘要
-        result = agent.generate_summary(document_id)
+        # 生成摘要（按向量文档ID缓存，内容相同的文档共享）
+        result = agent.generate_summary(document.vector_id)
         
         if result["success"]:
             logger.info(f"文档 {document_id} 摘要生成完成")
@@ -252,4 +694,8 @@ celery_app.conf.beat_schedule = {
         'task': 'app.celery_app.cleanup_task',
         'schedule': crontab(hour=2, minute=0),  # 每天凌晨2点执行
     },
+    'dispatch-deferred-documents': {
+        'task': 'app.celery_app.dispatch_deferred_task',
+        'schedule': 60.0,  # 兜底：每分钟检查一次排队中的文档
+    },
 } 
\ No newline at end of file
@@ -1,13 +1,46 @@
 from langchain.prompts import ChatPromptTemplate
 from langchain.schema.output_parser import StrOutputParser
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, AsyncIterator, Awaitable, Callable
+import os
 import time
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from .vector_store import VectorStoreManager
 from .model_factory import ModelFactory
+from .semantic_cache import SemanticAnswerCache, semantic_cache
+from .single_flight import SingleFlight, single_flight
+from .cache_manager import cache_manager
 
 logger = logging.getLogger(__name__)
 
+# 摘要模式：map_reduce（全文分段并发摘要后合并）或 quick（仅取最相关的5个文本块）
+SUMMARY_MODE_MAP_REDUCE = "map_reduce"
+SUMMARY_MODE_QUICK = "quick"
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中文约每字一个token，其他字符约每4个一个token"""
+    cjk = sum(1 for ch in text if '\u4e00' <= ch <= '\u9fff')
+    return cjk + (len(text) - cjk) // 4 + 1
+
+def group_by_tokens(texts: List[str], max_tokens: int) -> List[str]:
+    """按顺序把文本合并为不超过max_tokens的分段（单段超出预算时独立成段）"""
+    groups = []
+    current = []
+    current_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > max_tokens:
+            groups.append("\n\n".join(current))
+            current = []
+            current_tokens = 0
+        current.append(text)
+        current_tokens += tokens
+    
+    if current:
+        groups.append("\n\n".join(current))
+    return groups
+
 class DocumentAnalysisAgent:
     """文档分析智能体 - 支持多种大模型"""
     
@@ -15,9 +48,22 @@ class DocumentAnalysisAgent:
         self, 
         vector_store_manager: VectorStoreManager,
         llm_type: str = None,
-        model_config: dict = None
+        model_config: dict = None,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        coalescer: Optional[SingleFlight] = None
     ):
         self.vector_store = vector_store_manager
+        self.model_name = (model_config or {}).get("model") or llm_type or "default"
+        
+        # 语义答案缓存：相似问题直接复用回答（仅用于默认向量检索）
+        if answer_cache is None and os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true":
+            answer_cache = semantic_cache
+        self.answer_cache = answer_cache
+        
+        # 请求合并：相同文档、问题、模型和k的并发请求只执行一次
+        if coalescer is None and os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true":
+            coalescer = single_flight
+        self.coalescer = coalescer
         
         # 使用模型工厂创建LLM
         self.llm = ModelFactory.create_llm(
@@ -96,24 +142,61 @@ class DocumentAnalysisAgent:
 
 摘要：
 """)
+        
+        # 全文摘要（map-reduce）：先并发摘要各分段，再合并分段摘要
+        self.section_summary_prompt = ChatPromptTemplate.from_template("""
+请概括以下文档片段的要点，保留关键概念、数据和结论，200字以内：
+
+文档片段：
+{content}
+
+要点：
+""")
+        
+        self.combine_summary_prompt = ChatPromptTemplate.from_template("""
+以下是同一文档各部分按顺序排列的要点摘要，请将它们整合为一份完整的文档摘要：
+
+各部分摘要：
+{content}
+
+摘要要求：
+1. 覆盖文档的整体结构、核心观点和主要结论
+2. 合并重复内容，保持逻辑连贯
+3. 长度控制在300-600字之间
+
+摘要：
+""")
+        
+        self.summary_mode = os.getenv("SUMMARY_MODE", SUMMARY_MODE_MAP_REDUCE)
+        self.summary_section_tokens = int(os.getenv("SUMMARY_SECTION_TOKENS", 6000))
+        self.summary_concurrency = int(os.getenv("SUMMARY_MAX_CONCURRENCY", 4))
+        self.summary_cache_ttl = int(os.getenv("SUMMARY_CACHE_TTL", 7 * 24 * 3600))
     
-    def answer_question(
+    def retrieve(
         self, 
         document_id: str, 
         question: str, 
-        max_results: int = 5
+        max_results: int = 5,
+        where: Optional[Dict] = None,
+        retriever: Optional[Callable[..., List[Dict]]] = None
+    ) -> List[Dict]:
+        """检索阶段：默认使用向量检索，可传入自定义检索器
+        
+        检索器签名为 retriever(document_id, query, k, where)，返回检索结果列表。
+        """
+        retriever = retriever or self.vector_store.search_similar_chunks
+        return retriever(document_id, question, max_results, where)
+    
+    def generate_answer(
+        self, 
+        question: str, 
+        search_results: List[Dict],
+        start_time: Optional[float] = None
     ) -> Dict:
-        """回答基于文档的问题"""
-        start_time = time.time()
+        """生成阶段：基于检索结果生成回答"""
+        start_time = start_time or time.time()
         
         try:
-            # 1. 向量搜索相关内容
-            search_results = self.vector_store.search_similar_chunks(
-                document_id=document_id,
-                query=question,
-                k=max_results
-            )
-            
             if not search_results:
                 return {
                     "answer": "抱歉，在该文档中未找到与您问题相关的内容。",
@@ -123,10 +206,10 @@ class DocumentAnalysisAgent:
                     "success": True
                 }
             
-            # 2. 构建上下文
+            # 1. 构建上下文
             context = self._build_context(search_results)
             
-            # 3. 生成回答 - 兼容不同模型接口
+            # 2. 生成回答 - 兼容不同模型接口
             try:
                 # 尝试使用LangChain链式调用
                 chain = self.qa_prompt | self.llm | StrOutputParser()
@@ -140,10 +223,10 @@ class DocumentAnalysisAgent:
                 prompt_text = self.qa_prompt.format(context=context, question=question)
                 answer = self.llm.predict(prompt_text)
             
-            # 4. 计算置信度
+            # 3. 计算置信度
             confidence = self._calculate_confidence(search_results)
             
-            # 5. 准备源信息
+            # 4. 准备源信息
             sources = self._prepare_sources(search_results)
             
             processing_time = time.time() - start_time
@@ -168,34 +251,90 @@ class DocumentAnalysisAgent:
                 "error": str(e)
             }
     
-    def generate_summary(self, document_id: str) -> Dict:
-        """生成文档摘要"""
+    def answer_question(
+        self, 
+        document_id: str, 
+        question: str, 
+        max_results: int = 5,
+        where: Optional[Dict] = None,
+        retriever: Optional[Callable[..., List[Dict]]] = None
+    ) -> Dict:
+        """回答基于文档的问题（检索 + 生成），where可限定页码范围或章节"""
+        start_time = time.time()
+        use_answer_cache = self.answer_cache is not None and retriever is None
+        
         try:
-            # 获取文档的所有块（用于生成摘要）
-            search_results = self.vector_store.search_similar_chunks(
-                document_id=document_id,
-                query="文档主要内容 核心观点 关键信息",
-                k=10
-            )
+            if use_answer_cache:
+                scope = SemanticAnswerCache.scope_key(max_results, where)
+                question_embedding = self.vector_store.embeddings.embed_query(question)
+                cached, cache_version = self.answer_cache.lookup(document_id, scope, question_embedding)
+                if cached is not None:
+                    return {**cached, "processing_time": time.time() - start_time}
             
-            if not search_results:
+            search_results = self.retrieve(document_id, question, max_results, where, retriever)
+        except Exception as e:
+            logger.error(f"检索失败: {str(e)}")
+            return {
+                "answer": "处理问题时发生错误，请稍后重试。",
+                "confidence": 0.0,
+                "sources": [],
+                "processing_time": time.time() - start_time,
+                "success": False,
+                "error": str(e)
+            }
+        
+        result = self.generate_answer(question, search_results, start_time)
+        if use_answer_cache and result["success"] and result["sources"]:
+            self.answer_cache.store(document_id, scope, question_embedding, result, cache_version)
+        return result
+    
+    def generate_summary(self, document_id: str, mode: Optional[str] = None) -> Dict:
+        """生成文档摘要，成功的结果按文档缓存（文档重新入库或删除时失效）"""
+        mode = mode or self.summary_mode
+        cache_key = cache_manager.summary_cache_key(document_id)
+        
+        cached = cache_manager.get(cache_key)
+        if cached and cached.get("mode") == mode:
+            logger.info(f"命中摘要缓存: {document_id}")
+            return cached
+        
+        try:
+            if mode == SUMMARY_MODE_MAP_REDUCE:
+                chunks = self.vector_store.get_document_chunks(document_id)
+                sections = group_by_tokens([chunk["content"] for chunk in chunks], self.summary_section_tokens)
+            else:
+                # 获取与文档主旨最相关的块
+                search_results = self.vector_store.search_similar_chunks(
+                    document_id=document_id,
+                    query="文档主要内容 核心观点 关键信息",
+                    k=10
+                )
+                sections = ["\n\n".join([result["content"] for result in search_results[:5]])] if search_results else []
+            
+            if not sections:
                 return {
                     "summary": "无法生成摘要：文档内容为空或未找到。",
                     "success": False
                 }
             
-            # 构建内容
-            content = "\n\n".join([result["content"] for result in search_results[:5]])
-            
             # 生成摘要
-            chain = self.summary_prompt | self.llm | StrOutputParser()
-            summary = chain.invoke({"content": content})
+            if len(sections) == 1:
+                summary = self._invoke_llm(self.summary_prompt, {"content": sections[0]})
+            else:
+                summary = self._map_reduce(sections)
             
-            return {
+            result = {
                 "summary": summary.strip(),
                 "success": True,
-                "error": None
+                "error": None,
+                "mode": mode,
+                "sections": len(sections)
             }
+            cache_manager.set(
+                cache_key, result, expire=self.summary_cache_ttl,
+                tags=[cache_manager.document_tag(document_id)]
+            )
+            return result
             
         except Exception as e:
             logger.error(f"摘要生成失败: {str(e)}")
@@ -205,13 +344,426 @@ class DocumentAnalysisAgent:
                 "error": str(e)
             }
     
+    async def aretrieve(
+        self, 
+        document_id: str, 
+        question: str, 
+        max_results: int = 5,
+        where: Optional[Dict] = None,
+        retriever: Optional[Callable[..., Awaitable[List[Dict]]]] = None
+    ) -> List[Dict]:
+        """异步检索阶段：默认使用向量检索，可传入自定义异步检索器（如混合检索）
+        
+        检索器签名为 await retriever(document_id, query, k, where)。
+        """
+        retriever = retriever or self.vector_store.asearch_similar_chunks
+        return await retriever(document_id, question, max_results, where)
+    
+    async def agenerate_answer(
+        self, 
+        question: str, 
+        search_results: List[Dict],
+        start_time: Optional[float] = None
+    ) -> Dict:
+        """异步生成阶段：基于检索结果生成回答，不再重复检索"""
+        start_time = start_time or time.time()
+        
+        try:
+            if not search_results:
+                return {
+                    "answer": "抱歉，在该文档中未找到与您问题相关的内容。",
+                    "confidence": 0.0,
+                    "sources": [],
+                    "processing_time": time.time() - start_time,
+                    "success": True
+                }
+            
+            # 构建上下文并生成回答
+            context = self._build_context(search_results)
+            answer = await self._ainvoke_llm(
+                self.qa_prompt, {"context": context, "question": question}
+            )
+            
+            return {
+                "answer": answer.strip(),
+                "confidence": self._calculate_confidence(search_results),
+                "sources": self._prepare_sources(search_results),
+                "processing_time": time.time() - start_time,
+                "success": True,
+                "error": None
+            }
+            
+        except Exception as e:
+            logger.error(f"异步问答处理失败: {str(e)}")
+            return {
+                "answer": "处理问题时发生错误，请稍后重试。",
+                "confidence": 0.0,
+                "sources": [],
+                "processing_time": time.time() - start_time,
+                "success": False,
+                "error": str(e)
+            }
+    
+    async def aanswer_question(
+        self, 
+        document_id: str, 
+        question: str, 
+        max_results: int = 5,
+        where: Optional[Dict] = None,
+        retriever: Optional[Callable[..., Awaitable[List[Dict]]]] = None
+    ) -> Dict:
+        """异步回答基于文档的问题（检索 + 生成），检索和LLM调用均不阻塞事件循环
+        
+        使用默认检索器时，相同问题的并发请求合并为一次执行，并先查语义答案缓存。
+        """
+        if self.coalescer is None or retriever is not None:
+            return await self._aanswer_question(document_id, question, max_results, where, retriever)
+        
+        key = SingleFlight.key(
+            "answer", document_id, SingleFlight.normalize_question(question),
+            self.model_name, max_results, where
+        )
+        return await self.coalescer.run(
+            key,
+            lambda: self._aanswer_question(document_id, question, max_results, where),
+            shareable=lambda result: result["success"]
+        )
+    
+    async def _aanswer_question(
+        self, 
+        document_id: str, 
+        question: str, 
+        max_results: int = 5,
+        where: Optional[Dict] = None,
+        retriever: Optional[Callable[..., Awaitable[List[Dict]]]] = None
+    ) -> Dict:
+        start_time = time.time()
+        use_answer_cache = self.answer_cache is not None and retriever is None
+        
+        try:
+            if use_answer_cache:
+                # 查询向量会进入嵌入缓存，后续检索不会重复调用嵌入API
+                scope = SemanticAnswerCache.scope_key(max_results, where)
+                question_embedding = await self.vector_store.embeddings.aembed_query(question)
+                cached, cache_version = await self.vector_store.run_blocking(
+                    self.answer_cache.lookup, document_id, scope, question_embedding
+                )
+                if cached is not None:
+                    return {**cached, "processing_time": time.time() - start_time}
+            
+            search_results = await self.aretrieve(document_id, question, max_results, where, retriever)
+        except Exception as e:
+            logger.error(f"异步检索失败: {str(e)}")
+            return {
+                "answer": "处理问题时发生错误，请稍后重试。",
+                "confidence": 0.0,
+                "sources": [],
+                "processing_time": time.time() - start_time,
+                "success": False,
+                "error": str(e)
+            }
+        
+        result = await self.agenerate_answer(question, search_results, start_time)
+        if use_answer_cache and result["success"] and result["sources"]:
+            await self.vector_store.run_blocking(
+                self.answer_cache.store, document_id, scope, question_embedding, result, cache_version
+            )
+        return result
+    
+    async def aanswer_multi_document(
+        self,
+        document_ids: List[str],
+        question: str,
+        max_results: int = 5,
+        where: Optional[Dict] = None,
+        document_names: Optional[Dict[str, str]] = None
+    ) -> Dict:
+        """跨多个文档回答问题：查询向量只计算一次，并行检索各文档后合并全局top-k
+        
+        document_names为向量文档ID到文件名的映射，用于上下文和来源标注。
+        返回结果额外包含各文档命中数（documents）和分阶段耗时（timings）。
+        """
+        start_time = time.time()
+        document_names = document_names or {}
+        timings = {}
+        
+        try:
+            # 1. 计算查询向量（所有文档共用）
+            stage_start = time.time()
+            query_embedding = await self.vector_store.embeddings.aembed_query(question)
+            timings["embedding"] = time.time() - stage_start
+            
+            # 2. 并行检索并合并
+            stage_start = time.time()
+            search_results = await self.vector_store.asearch_documents_by_vector(
+                document_ids=document_ids,
+                query_embedding=query_embedding,
+                k=max_results,
+                where=where
+            )
+            timings["retrieval"] = time.time() - stage_start
+            
+            for result in search_results:
+                result["document_name"] = document_names.get(result["document_id"])
+            
+            if not search_results:
+                timings["generation"] = 0.0
+                return {
+                    "answer": "抱歉，在所选文档中未找到与您问题相关的内容。",
+                    "confidence": 0.0,
+                    "sources": [],
+                    "documents": [],
+                    "timings": timings,
+                    "processing_time": time.time() - start_time,
+                    "success": True,
+                    "error": None
+                }
+            
+            # 3. 基于合并后的上下文生成回答
+            stage_start = time.time()
+            context = self._build_context(search_results)
+            answer = await self._ainvoke_llm(
+                self.qa_prompt, {"context": context, "question": question}
+            )
+            timings["generation"] = time.time() - stage_start
+            
+            # 各文档命中数，按命中数降序
+            hits = {}
+            for result in search_results:
+                hits[result["document_id"]] = hits.get(result["document_id"], 0) + 1
+            documents = [
+                {"document_id": document_id, "filename": document_names.get(document_id), "hits": count}
+                for document_id, count in sorted(hits.items(), key=lambda item: -item[1])
+            ]
+            
+            return {
+                "answer": answer.strip(),
+                "confidence": self._calculate_confidence(search_results),
+                "sources": self._prepare_sources(search_results),
+                "documents": documents,
+                "timings": timings,
+                "processing_time": time.time() - start_time,
+                "success": True,
+                "error": None
+            }
+        
+        except Exception as e:
+            logger.error(f"多文档问答处理失败: {str(e)}")
+            return {
+                "answer": "处理问题时发生错误，请稍后重试。",
+                "confidence": 0.0,
+                "sources": [],
+                "documents": [],
+                "timings": timings,
+                "processing_time": time.time() - start_time,
+                "success": False,
+                "error": str(e)
+            }
+    
+    async def agenerate_summary(self, document_id: str, mode: Optional[str] = None) -> Dict:
+        """异步生成文档摘要（优先读取缓存），同一文档的并发请求合并为一次执行"""
+        if self.coalescer is None:
+            return await self._agenerate_summary(document_id, mode)
+        
+        return await self.coalescer.run(
+            SingleFlight.key("summary", document_id, self.model_name, mode or self.summary_mode),
+            lambda: self._agenerate_summary(document_id, mode),
+            shareable=lambda result: result["success"]
+        )
+    
+    async def _agenerate_summary(self, document_id: str, mode: Optional[str] = None) -> Dict:
+        mode = mode or self.summary_mode
+        cache_key = cache_manager.summary_cache_key(document_id)
+        
+        cached = await self.vector_store.run_blocking(cache_manager.get, cache_key)
+        if cached and cached.get("mode") == mode:
+            logger.info(f"命中摘要缓存: {document_id}")
+            return cached
+        
+        try:
+            if mode == SUMMARY_MODE_MAP_REDUCE:
+                chunks = await self.vector_store.run_blocking(self.vector_store.get_document_chunks, document_id)
+                sections = group_by_tokens([chunk["content"] for chunk in chunks], self.summary_section_tokens)
+            else:
+                search_results = await self.vector_store.asearch_similar_chunks(
+                    document_id=document_id,
+                    query="文档主要内容 核心观点 关键信息",
+                    k=10
+                )
+                sections = ["\n\n".join([result["content"] for result in search_results[:5]])] if search_results else []
+            
+            if not sections:
+                return {
+                    "summary": "无法生成摘要：文档内容为空或未找到。",
+                    "success": False
+                }
+            
+            if len(sections) == 1:
+                summary = await self._ainvoke_llm(self.summary_prompt, {"content": sections[0]})
+            else:
+                summary = await self._amap_reduce(sections)
+            
+            result = {
+                "summary": summary.strip(),
+                "success": True,
+                "error": None,
+                "mode": mode,
+                "sections": len(sections)
+            }
+            await self.vector_store.run_blocking(
+                cache_manager.set, cache_key, result, self.summary_cache_ttl,
+                [cache_manager.document_tag(document_id)]
+            )
+            return result
+            
+        except Exception as e:
+            logger.error(f"异步摘要生成失败: {str(e)}")
+            return {
+                "summary": "生成摘要时发生错误。",
+                "success": False,
+                "error": str(e)
+            }
+    
+    async def astream_answer(
+        self, 
+        document_id: str, 
+        question: str, 
+        max_results: int = 5,
+        where: Optional[Dict] = None,
+        retriever: Optional[Callable[..., Awaitable[List[Dict]]]] = None
+    ) -> AsyncIterator[Dict]:
+        """流式回答：先返回检索到的来源，再逐段返回回答文本
+        
+        依次产出sources、token（多个）、done事件；出错时产出error事件。
+        """
+        start_time = time.time()
+        
+        try:
+            search_results = await self.aretrieve(document_id, question, max_results, where, retriever)
+            
+            confidence = self._calculate_confidence(search_results)
+            sources = self._prepare_sources(search_results)
+            
+            yield {
+                "event": "sources",
+                "data": {"sources": sources, "confidence": confidence}
+            }
+            
+            if not search_results:
+                answer = "抱歉，在该文档中未找到与您问题相关的内容。"
+                yield {"event": "token", "data": {"text": answer}}
+            else:
+                context = self._build_context(search_results)
+                answer_parts = []
+                time_to_first_token = None
+                
+                async for text in self._astream_llm(
+                    self.qa_prompt, {"context": context, "question": question}
+                ):
+                    if time_to_first_token is None:
+                        time_to_first_token = time.time() - start_time
+                        logger.info(f"首个token耗时: {time_to_first_token:.3f}s")
+                    answer_parts.append(text)
+                    yield {"event": "token", "data": {"text": text}}
+                
+                answer = "".join(answer_parts)
+            
+            yield {
+                "event": "done",
+                "data": {
+                    "answer": answer.strip(),
+                    "confidence": confidence,
+                    "sources": sources,
+                    "processing_time": time.time() - start_time
+                }
+            }
+            
+        except Exception as e:
+            logger.error(f"流式问答处理失败: {str(e)}")
+            yield {"event": "error", "data": {"error": str(e)}}
+    
+    async def _astream_llm(self, prompt: ChatPromptTemplate, variables: Dict) -> AsyncIterator[str]:
+        """流式调用LLM - 兼容不同模型接口"""
+        try:
+            chain = prompt | self.llm | StrOutputParser()
+        except Exception as e:
+            # 非LangChain模型（如通义千问适配器）直接调用其流式接口
+            logger.debug(f"无法构建链式调用，使用模型流式接口: {str(e)}")
+            chain = None
+        
+        if chain is not None:
+            async for text in chain.astream(variables):
+                yield text
+        else:
+            async for text in self.llm.astream(prompt.format(**variables)):
+                yield text
+    
+    def _map_reduce(self, sections: List[str]) -> str:
+        """并发摘要各分段（受summary_concurrency限制），再逐层合并为最终摘要"""
+        with ThreadPoolExecutor(max_workers=self.summary_concurrency) as executor:
+            partials = list(executor.map(
+                lambda section: self._invoke_llm(self.section_summary_prompt, {"content": section}),
+                sections
+            ))
+            
+            # 分段摘要合计仍超出预算时继续分组合并
+            groups = group_by_tokens(partials, self.summary_section_tokens)
+            while 1 < len(groups) < len(partials):
+                partials = list(executor.map(
+                    lambda group: self._invoke_llm(self.section_summary_prompt, {"content": group}),
+                    groups
+                ))
+                groups = group_by_tokens(partials, self.summary_section_tokens)
+        
+        return self._invoke_llm(self.combine_summary_prompt, {"content": "\n\n".join(partials)})
+    
+    async def _amap_reduce(self, sections: List[str]) -> str:
+        """异步map-reduce摘要，同时进行的LLM调用不超过summary_concurrency个"""
+        semaphore = asyncio.Semaphore(self.summary_concurrency)
+        
+        async def summarize(content: str) -> str:
+            async with semaphore:
+                return await self._ainvoke_llm(self.section_summary_prompt, {"content": content})
+        
+        partials = await asyncio.gather(*[summarize(section) for section in sections])
+        
+        # 分段摘要合计仍超出预算时继续分组合并
+        groups = group_by_tokens(partials, self.summary_section_tokens)
+        while 1 < len(groups) < len(partials):
+            partials = await asyncio.gather(*[summarize(group) for group in groups])
+            groups = group_by_tokens(partials, self.summary_section_tokens)
+        
+        return await self._ainvoke_llm(self.combine_summary_prompt, {"content": "\n\n".join(partials)})
+    
+    def _invoke_llm(self, prompt: ChatPromptTemplate, variables: Dict) -> str:
+        """调用LLM - 兼容不同模型接口"""
+        try:
+            chain = prompt | self.llm | StrOutputParser()
+            return chain.invoke(variables)
+        except Exception as e:
+            logger.warning(f"链式调用失败，使用直接调用: {str(e)}")
+            return self.llm.predict(prompt.format(**variables))
+    
+    async def _ainvoke_llm(self, prompt: ChatPromptTemplate, variables: Dict) -> str:
+        """异步调用LLM - 兼容不同模型接口"""
+        try:
+            # 尝试使用LangChain链式调用
+            chain = prompt | self.llm | StrOutputParser()
+            return await chain.ainvoke(variables)
+        except Exception as e:
+            # 降级到直接调用模型
+            logger.warning(f"异步链式调用失败，使用直接调用: {str(e)}")
+            return await self.llm.apredict(prompt.format(**variables))
+    
     def _build_context(self, search_results: List[Dict]) -> str:
         """构建问答上下文"""
         context_parts = []
         
         for i, result in enumerate(search_results, 1):
+            # 多文档查询时标注段落来源
+            source = f"，来源: {result['document_name']}" if result.get("document_name") else ""
             context_parts.append(
-                f"段落 {i} (相似度: {result['similarity_score']:.3f}):\n"
+                f"段落 {i} (相似度: {result['similarity_score']:.3f}{source}):\n"
                 f"{result['content']}\n"
             )
         
@@ -236,10 +788,16 @@ class DocumentAnalysisAgent:
         sources = []
         
         for result in search_results:
+            metadata = result.get("metadata") or {}
             sources.append({
+                "document_id": result.get("document_id") or metadata.get("document_id"),
+                "filename": result.get("document_name"),
                 "chunk_id": result["chunk_id"],
                 "chunk_index": result["chunk_index"],
                 "similarity_score": result["similarity_score"],
+                "page_start": metadata.get("page_start"),
+                "page_end": metadata.get("page_end"),
+                "section": metadata.get("section") or None,
                 "content_preview": result["content"][:200] + "..." if len(result["content"]) > 200 else result["content"]
             })
         
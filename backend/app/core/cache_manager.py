@@ -1,20 +1,168 @@
 import redis
 import json
+import sys
+import time
+import uuid
 import hashlib
+import threading
 import logging
+from collections import OrderedDict
 from typing import Any, Optional, Dict, List
 from datetime import timedelta
 import os
 
 logger = logging.getLogger(__name__)
 
+# 只延长不缩短标签集合的过期时间：同一标签下的条目TTL不同（摘要7天、检索1小时），
+# 标签集合必须活得和其中最长的条目一样久，否则按标签失效会漏掉长TTL条目
+_EXTEND_TTL_SCRIPT = """
+local ttl = redis.call("ttl", KEYS[1])
+if ttl < tonumber(ARGV[1]) then
+    return redis.call("expire", KEYS[1], ARGV[1])
+end
+return 0
+"""
+
+class MemoryCache:
+    """进程内缓存 - LRU淘汰、逐条过期时间、按字节数限制容量，线程安全
+    
+    值以JSON字符串保存：既能准确计算占用，又避免调用方修改返回对象污染缓存。
+    条目可带标签，标签索引随条目的淘汰、过期和删除同步清理，并计入容量。
+    """
+    
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entries: int = 10000):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        
+        # key -> (JSON字符串, 过期时间戳, 占用字节数, 标签)
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        # 标签索引：tag -> keys
+        self.tags: Dict[str, set] = {}
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def _remove(self, key: str) -> Optional[tuple]:
+        """删除条目并从标签索引中移除（调用方需持有锁）"""
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return None
+        
+        self.current_bytes -= entry[2]
+        for tag in entry[3]:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+        return entry
+    
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存值，过期条目视为未命中并删除"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            payload, expires_at = entry[0], entry[1]
+            if expires_at <= time.time():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            
+            self.entries.move_to_end(key)
+            self.hits += 1
+        
+        return json.loads(payload)
+    
+    def set(self, key: str, value: Any, expire: int = 3600, tags: Optional[List[str]] = None) -> bool:
+        """设置缓存值，超出容量时淘汰最久未使用的条目"""
+        payload = json.dumps(value, ensure_ascii=False)
+        tags = tuple(tags or ())
+        size = sys.getsizeof(payload) + sys.getsizeof(key) + sum(sys.getsizeof(tag) for tag in tags)
+        if size > self.max_bytes:
+            return False
+        
+        with self.lock:
+            self._remove(key)
+            
+            self.entries[key] = (payload, time.time() + expire, size, tags)
+            self.current_bytes += size
+            for tag in tags:
+                self.tags.setdefault(tag, set()).add(key)
+            
+            while self.current_bytes > self.max_bytes or len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+        
+        return True
+    
+    def delete(self, key: str) -> bool:
+        """删除缓存"""
+        with self.lock:
+            return self._remove(key) is not None
+    
+    def invalidate_tag(self, tag: str) -> List[str]:
+        """删除标签下的全部条目，返回被删除的键"""
+        with self.lock:
+            keys = list(self.tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            return keys
+    
+    def clear(self) -> None:
+        """清空缓存"""
+        with self.lock:
+            self.entries.clear()
+            self.tags.clear()
+            self.current_bytes = 0
+    
+    def stats(self) -> Dict:
+        """缓存统计信息"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "tags": len(self.tags),
+                "size_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
 class CacheManager:
-    """缓存管理器 - 支持Redis和内存缓存"""
+    """两级缓存管理器 - 进程内L1（MemoryCache）+ Redis L2
+    
+    读取先查L1，未命中再查Redis并回填L1。条目可带标签（如 doc:{document_id}），
+    按标签失效时删除该标签下的全部条目，并通过Redis发布/订阅通知其他节点清理各自的L1。
+    Redis不可用时只使用L1。
+    """
+    
+    INVALIDATION_CHANNEL = "cache:invalidate"
+    TAG_PREFIX = "tag:"
     
     def __init__(self, redis_url: str = None, use_redis: bool = True):
         self.use_redis = use_redis
-        self.memory_cache = {}
-        self.memory_cache_maxsize = 1000
+        self.memory_cache = MemoryCache(
+            max_bytes=int(os.getenv("MEMORY_CACHE_MAX_MB", 64)) * 1024 * 1024,
+            max_entries=int(os.getenv("MEMORY_CACHE_MAX_ENTRIES", 10000))
+        )
+        # 有Redis时L1条目的最长存活时间，限制跨节点失效消息丢失时的不一致窗口
+        self.l1_ttl = int(os.getenv("L1_CACHE_TTL", 60))
+        
+        self.instance_id = uuid.uuid4().hex
+        self._subscriber = None
+        self._subscriber_pid = None
         
         if use_redis and redis_url:
             try:
@@ -35,55 +183,156 @@ class CacheManager:
         hash_value = hashlib.md5(data.encode('utf-8')).hexdigest()
         return f"{prefix}:{hash_value}"
     
+    @staticmethod
+    def document_tag(document_id: str) -> str:
+        """文档相关缓存条目的标签"""
+        return f"doc:{document_id}"
+    
+    def _ensure_subscriber(self) -> None:
+        """在当前进程中订阅失效通知（Celery等fork出的子进程需要各自订阅）"""
+        if not (self.use_redis and self.redis_client) or self._subscriber_pid == os.getpid():
+            return
+        
+        self._subscriber_pid = os.getpid()
+        try:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.INVALIDATION_CHANNEL: self._on_invalidation})
+            self._subscriber = pubsub.run_in_thread(
+                sleep_time=1,
+                daemon=True,
+                exception_handler=lambda error, pubsub, thread: logger.error(f"缓存失效通知订阅异常: {error}")
+            )
+        except Exception as e:
+            logger.error(f"订阅缓存失效通知失败: {e}")
+    
+    def _on_invalidation(self, message: Dict) -> None:
+        """处理其他节点发布的失效通知，清理本地L1"""
+        try:
+            data = json.loads(message["data"])
+            if data.get("origin") == self.instance_id:
+                return
+            for key in data.get("keys", []):
+                self.memory_cache.delete(key)
+        except Exception as e:
+            logger.error(f"处理缓存失效通知失败: {e}")
+    
+    def _publish_invalidation(self, keys: List[str]) -> None:
+        """通知其他节点删除L1中的条目"""
+        if keys and self.use_redis and self.redis_client:
+            self.redis_client.publish(
+                self.INVALIDATION_CHANNEL,
+                json.dumps({"origin": self.instance_id, "keys": keys})
+            )
+    
     def get(self, key: str) -> Optional[Any]:
-        """获取缓存值"""
+        """获取缓存值：先查L1，再查Redis并回填L1"""
         try:
+            self._ensure_subscriber()
+            
+            value = self.memory_cache.get(key)
+            if value is not None:
+                return value
+            
             if self.use_redis and self.redis_client:
-                value = self.redis_client.get(key)
-                if value:
-                    return json.loads(value)
-            else:
-                return self.memory_cache.get(key)
+                raw = self.redis_client.get(key)
+                if raw:
+                    value = json.loads(raw)
+                    self.memory_cache.set(key, value, self.l1_ttl)
+                    return value
         except Exception as e:
             logger.error(f"缓存获取失败: {e}")
         return None
     
-    def set(self, key: str, value: Any, expire: int = 3600) -> bool:
-        """设置缓存值"""
+    def set(self, key: str, value: Any, expire: int = 3600, tags: Optional[List[str]] = None) -> bool:
+        """设置缓存值，tags用于按标签批量失效"""
         try:
+            self._ensure_subscriber()
+            
             if self.use_redis and self.redis_client:
-                return self.redis_client.setex(
-                    key, expire, json.dumps(value, ensure_ascii=False)
-                )
-            else:
-                # 内存缓存简单LRU实现
-                if len(self.memory_cache) >= self.memory_cache_maxsize:
-                    # 删除最旧的项
-                    oldest_key = next(iter(self.memory_cache))
-                    del self.memory_cache[oldest_key]
+                pipe = self.redis_client.pipeline()
+                pipe.setex(key, expire, json.dumps(value, ensure_ascii=False))
+                for tag in tags or []:
+                    pipe.sadd(f"{self.TAG_PREFIX}{tag}", key)
+                    pipe.eval(_EXTEND_TTL_SCRIPT, 1, f"{self.TAG_PREFIX}{tag}", expire)
+                pipe.execute()
                 
-                self.memory_cache[key] = value
+                self.memory_cache.set(key, value, min(expire, self.l1_ttl))
                 return True
+            
+            # 仅内存模式下由L1维护标签索引
+            return self.memory_cache.set(key, value, expire, tags)
         except Exception as e:
             logger.error(f"缓存设置失败: {e}")
         return False
     
     def delete(self, key: str) -> bool:
-        """删除缓存"""
+        """删除缓存（L1、Redis以及其他节点的L1）"""
         try:
+            deleted = self.memory_cache.delete(key)
             if self.use_redis and self.redis_client:
-                return bool(self.redis_client.delete(key))
-            else:
-                if key in self.memory_cache:
-                    del self.memory_cache[key]
-                    return True
+                deleted = bool(self.redis_client.delete(key)) or deleted
+                self._publish_invalidation([key])
+            return deleted
         except Exception as e:
             logger.error(f"缓存删除失败: {e}")
         return False
     
-    def search_cache_key(self, document_id: str, query: str, k: int) -> str:
+    def invalidate_tag(self, tag: str) -> int:
+        """删除标签下的全部缓存条目，返回删除的条目数"""
+        try:
+            if self.use_redis and self.redis_client:
+                tag_key = f"{self.TAG_PREFIX}{tag}"
+                pipe = self.redis_client.pipeline()
+                pipe.smembers(tag_key)
+                pipe.delete(tag_key)
+                keys = list(pipe.execute()[0])
+                
+                if keys:
+                    self.redis_client.delete(*keys)
+                self._publish_invalidation(keys)
+                
+                for key in keys:
+                    self.memory_cache.delete(key)
+            else:
+                keys = self.memory_cache.invalidate_tag(tag)
+            
+            if keys:
+                logger.info(f"缓存标签 {tag} 失效: {len(keys)} 个条目")
+            return len(keys)
+        except Exception as e:
+            logger.error(f"缓存标签失效失败: {e}")
+        return 0
+    
+    def invalidate_document(self, document_id: str) -> int:
+        """删除文档相关的全部缓存条目"""
+        return self.invalidate_tag(self.document_tag(document_id))
+    
+    def stats(self) -> Dict:
+        """缓存统计信息"""
+        stats = {
+            "backend": "memory+redis" if self.use_redis and self.redis_client else "memory",
+            "memory": self.memory_cache.stats()
+        }
+        
+        if self.use_redis and self.redis_client:
+            try:
+                info = self.redis_client.info()
+                stats["redis"] = {
+                    "used_memory": info.get("used_memory"),
+                    "keys": self.redis_client.dbsize(),
+                    "hits": info.get("keyspace_hits"),
+                    "misses": info.get("keyspace_misses")
+                }
+            except Exception as e:
+                logger.error(f"获取Redis统计信息失败: {e}")
+        
+        return stats
+    
+    def search_cache_key(self, document_id: str, query: str, k: int, where: Optional[Dict] = None) -> str:
         """生成搜索缓存键"""
         cache_data = f"{document_id}:{query}:{k}"
+        if where:
+            cache_data += f":{json.dumps(where, sort_keys=True, ensure_ascii=False)}"
         return self._generate_key("search", cache_data)
     
     def summary_cache_key(self, document_id: str) -> str:
@@ -1,24 +1,236 @@
 import fitz  # PyMuPDF
 import os
 import hashlib
-from typing import List, Dict, Optional
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from bisect import bisect_right
+from typing import List, Dict, Optional, Iterator, Iterable, Tuple
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+# 章级标题：第三章 / 第3章 / Chapter 3
+SECTION_HEADING_PATTERN = re.compile(
+    r"^[ \t]*(?:第([零〇一二两三四五六七八九十百\d]+)章|(?:Chapter|CHAPTER)[ \t]+(\d+))[^\n]*",
+    re.MULTILINE
+)
+
+_CHINESE_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4,
+                   "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+
+def _parse_chinese_number(text: str) -> int:
+    """解析中文或阿拉伯数字（支持到百位）"""
+    if text.isdigit():
+        return int(text)
+    
+    total, current = 0, 0
+    for char in text:
+        if char in _CHINESE_DIGITS:
+            current = _CHINESE_DIGITS[char]
+        elif char == "十":
+            total += (current or 1) * 10
+            current = 0
+        elif char == "百":
+            total += (current or 1) * 100
+            current = 0
+    return total + current
+
+def _parse_section_heading(match: re.Match) -> Dict[str, any]:
+    """将章节标题匹配结果转换为块元数据"""
+    number = match.group(1) or match.group(2)
+    return {
+        "section": match.group(0).strip()[:100],
+        "chapter": _parse_chinese_number(number)
+    }
+
+def _locate_chunks(buffer: str, chunks: List[str]) -> List[int]:
+    """按顺序定位每个块在缓冲区中的起始偏移"""
+    positions = []
+    search_from = 0
+    for chunk in chunks:
+        position = buffer.find(chunk, search_from)
+        if position < 0:
+            position = search_from
+        positions.append(position)
+        search_from = position + 1
+    return positions
+
+def _rebase_marks(marks: List[Tuple[int, any]], start: int) -> List[Tuple[int, any]]:
+    """将偏移标记平移到以start为起点的新缓冲区，保留start处生效的标记"""
+    index = max(bisect_right([offset for offset, _ in marks], start) - 1, 0)
+    return [(max(offset - start, 0), value) for offset, value in marks[index:]]
+
+def _mark_at(marks: List[Tuple[int, any]], position: int):
+    """返回position处生效的标记值"""
+    index = max(bisect_right([offset for offset, _ in marks], position) - 1, 0)
+    return marks[index][1] if marks else None
+
+def _page_span(page_marks: List[Tuple[int, int]], position: int, length: int) -> Optional[Tuple[int, int]]:
+    """计算块覆盖的起止页码"""
+    if not page_marks:
+        return None
+    return _mark_at(page_marks, position), _mark_at(page_marks, position + max(length - 1, 0))
+
+def _section_at(section_marks: List[Tuple[int, Dict]], position: int) -> Dict[str, any]:
+    """块结束位置之前最近的章节标题"""
+    return _mark_at(section_marks, max(position - 1, 0))
+
+def _is_daemon_process() -> bool:
+    """当前进程是否为守护进程（如Celery prefork池的子进程），守护进程不能创建子进程"""
+    if multiprocessing.current_process().daemon:
+        return True
+    try:
+        import billiard
+        return bool(billiard.current_process().daemon)
+    except ImportError:
+        return False
+
+_daemon_warning_logged = False
+
+def _can_use_process_pool() -> bool:
+    """能否创建进程池；不能时每个进程只提示一次"""
+    global _daemon_warning_logged
+    if not _is_daemon_process():
+        return True
+    
+    if not _daemon_warning_logged:
+        logger.warning(
+            "当前进程为守护进程（Celery prefork工作进程），无法创建子进程，PDF将串行提取；"
+            "需要并行提取时以 --pool threads 或 --pool solo 启动工作进程"
+        )
+        _daemon_warning_logged = True
+    return False
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[str]:
+    """在子进程中提取[start, end)页的文本，每个进程使用独立的fitz句柄"""
+    doc = fitz.open(file_path)
+    try:
+        return [doc[page_num].get_text() for page_num in range(start, end)]
+    finally:
+        doc.close()
+
 class DocumentProcessor:
     """PDF文档处理器"""
     
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(
+        self, 
+        chunk_size: int = 1000, 
+        chunk_overlap: int = 200,
+        extract_workers: int = None,
+        parallel_min_pages: int = None
+    ):
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             length_function=len
         )
+        
+        # 并行提取配置：页数达到阈值时按页范围拆分到进程池（在守护进程中自动退化为串行）
+        self.extract_workers = extract_workers or int(
+            os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 1)
+        )
+        self.parallel_min_pages = parallel_min_pages or int(
+            os.getenv("PDF_PARALLEL_MIN_PAGES", 50)
+        )
+        
+        # 流式处理时每个窗口包含的页数
+        self.window_pages = int(os.getenv("INGEST_WINDOW_PAGES", 20))
+    
+    @staticmethod
+    def _format_page(page_number: int, page_text: str) -> str:
+        """生成带页码标记的页面文本"""
+        return f"\n\n--- 第{page_number}页 ---\n\n{page_text}"
+    
+    @staticmethod
+    def _build_chunk(
+        content: str, 
+        chunk_index: int, 
+        page_span: Optional[Tuple[int, int]] = None,
+        section: Optional[Dict[str, any]] = None
+    ) -> Dict[str, any]:
+        """构建文本块记录"""
+        chunk = {
+            # 生成块的唯一ID
+            "chunk_id": hashlib.md5(f"{content}_{chunk_index}".encode()).hexdigest(),
+            "content": content,
+            "chunk_index": chunk_index,
+            "chunk_length": len(content)
+        }
+        
+        if page_span:
+            chunk["page_start"], chunk["page_end"] = page_span
+        if section:
+            chunk.update(section)
+        
+        return chunk
     
-    def extract_text_from_pdf(self, file_path: str) -> Dict[str, any]:
-        """从PDF文件中提取文本和元数据"""
+    @classmethod
+    def renumber_chunks(cls, chunks: List[Dict[str, any]], start_index: int) -> List[Dict[str, any]]:
+        """从start_index开始重新编号文本块（分片入库合并时使用），chunk_id随编号重新生成"""
+        renumbered = []
+        for offset, chunk in enumerate(chunks):
+            page_span = (chunk["page_start"], chunk["page_end"]) if "page_start" in chunk else None
+            section = {key: chunk[key] for key in ("section", "chapter") if key in chunk}
+            renumbered.append(cls._build_chunk(chunk["content"], start_index + offset, page_span, section))
+        return renumbered
+    
+    def get_pdf_info(self, file_path: str) -> Dict[str, any]:
+        """读取PDF页数和元数据（不提取文本）"""
+        doc = fitz.open(file_path)
+        try:
+            return {
+                "pages": len(doc),
+                "title": doc.metadata.get("title", ""),
+                "author": doc.metadata.get("author", ""),
+                "subject": doc.metadata.get("subject", ""),
+                "keywords": doc.metadata.get("keywords", "")
+            }
+        finally:
+            doc.close()
+    
+    def _extract_pages_parallel(self, file_path: str, page_count: int) -> List[str]:
+        """将页范围拆分到进程池并行提取，按原始页序返回"""
+        workers = min(self.extract_workers, page_count)
+        step = (page_count + workers - 1) // workers
+        ranges = [
+            (start, min(start + step, page_count))
+            for start in range(0, page_count, step)
+        ]
+        
+        with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = [
+                executor.submit(_extract_page_range, file_path, start, end)
+                for start, end in ranges
+            ]
+            texts = []
+            for future in futures:
+                texts.extend(future.result())
+        
+        return texts
+    
+    def _extract_pages(self, file_path: str, doc: fitz.Document, parallel: Optional[bool]) -> List[str]:
+        """提取全部页面文本，必要时使用并行模式"""
+        page_count = len(doc)
+        
+        if parallel is None:
+            parallel = self.extract_workers > 1 and page_count >= self.parallel_min_pages
+        
+        if parallel and page_count > 1 and _can_use_process_pool():
+            try:
+                return self._extract_pages_parallel(file_path, page_count)
+            except Exception as e:
+                logger.warning(f"并行提取失败，回退到串行模式（{page_count}页）: {str(e)}")
+        
+        return [doc[page_num].get_text() for page_num in range(page_count)]
+    
+    def extract_text_from_pdf(self, file_path: str, parallel: Optional[bool] = None) -> Dict[str, any]:
+        """从PDF文件中提取文本和元数据
+        
+        parallel为None时按页数自动选择；True/False强制开启或关闭并行提取。
+        """
         try:
             doc = fitz.open(file_path)
             
@@ -32,19 +244,21 @@ class DocumentProcessor:
             }
             
             # 提取文本内容
-            full_text = ""
+            texts = self._extract_pages(file_path, doc, parallel)
+            doc.close()
+            
             page_texts = []
+            text_parts = []
             
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                page_text = page.get_text()
+            for page_num, page_text in enumerate(texts):
                 page_texts.append({
                     "page_number": page_num + 1,
                     "text": page_text
                 })
-                full_text += f"\n\n--- 第{page_num + 1}页 ---\n\n{page_text}"
+                text_parts.append(self._format_page(page_num + 1, page_text))
             
-            doc.close()
+            # 最后一次性拼接，避免逐页字符串复制
+            full_text = "".join(text_parts)
             
             return {
                 "metadata": metadata,
@@ -69,34 +283,177 @@ class DocumentProcessor:
         try:
             chunks = self.text_splitter.split_text(text)
             
-            processed_chunks = []
-            for i, chunk in enumerate(chunks):
-                # 生成块的唯一ID
-                chunk_id = hashlib.md5(f"{chunk}_{i}".encode()).hexdigest()
-                
-                processed_chunks.append({
-                    "chunk_id": chunk_id,
-                    "content": chunk,
-                    "chunk_index": i,
-                    "chunk_length": len(chunk)
-                })
-            
-            return processed_chunks
+            return [self._build_chunk(chunk, i) for i, chunk in enumerate(chunks)]
             
         except Exception as e:
             logger.error(f"文本分块失败: {str(e)}")
             return []
     
-    def process_document(self, file_path: str) -> Dict[str, any]:
+    def iter_page_windows(
+        self, 
+        file_path: str, 
+        window_pages: int = None,
+        start_page: int = 0,
+        end_page: int = None,
+        parallel: Optional[bool] = None
+    ) -> Iterator[List[Dict[str, any]]]:
+        """按页窗口逐批提取[start_page, end_page)的页面文本
+        
+        并行模式下最多只有extract_workers个窗口在途，内存占用与窗口大小相关。
+        """
+        window_pages = window_pages or self.window_pages
+        
+        doc = fitz.open(file_path)
+        page_count = len(doc)
+        end_page = page_count if end_page is None else min(end_page, page_count)
+        ranges = [
+            (start, min(start + window_pages, end_page))
+            for start in range(start_page, end_page, window_pages)
+        ]
+        
+        def to_pages(start: int, texts: List[str]) -> List[Dict[str, any]]:
+            return [
+                {"page_number": start + offset + 1, "text": text}
+                for offset, text in enumerate(texts)
+            ]
+        
+        if parallel is None:
+            parallel = self.extract_workers > 1 and (end_page - start_page) >= self.parallel_min_pages
+        
+        executor = None
+        pending = deque()
+        remaining = iter(ranges)
+        
+        if parallel and len(ranges) > 1 and _can_use_process_pool():
+            workers = min(self.extract_workers, len(ranges))
+            try:
+                executor = ProcessPoolExecutor(max_workers=workers)
+                for _ in range(workers):
+                    start, end = next(remaining)
+                    pending.append((start, executor.submit(_extract_page_range, file_path, start, end)))
+            except Exception as e:
+                logger.warning(f"并行提取失败，回退到串行模式（第{start_page + 1}-{end_page}页）: {str(e)}")
+                if executor is not None:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                executor = None
+        
+        try:
+            if executor is None:
+                for start, end in ranges:
+                    yield to_pages(start, [doc[page_num].get_text() for page_num in range(start, end)])
+                return
+            
+            doc.close()
+            while pending:
+                start, future = pending.popleft()
+                next_range = next(remaining, None)
+                if next_range:
+                    pending.append((next_range[0], executor.submit(_extract_page_range, file_path, *next_range)))
+                yield to_pages(start, future.result())
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+            if not doc.is_closed:
+                doc.close()
+    
+    def iter_chunk_batches(
+        self, 
+        file_path: str, 
+        window_pages: int = None,
+        start_page: int = 0,
+        end_page: int = None,
+        parallel: Optional[bool] = None
+    ) -> Iterator[Dict[str, any]]:
+        """流式分块：逐窗口提取并切分文本"""
+        windows = self.iter_page_windows(file_path, window_pages, start_page, end_page, parallel)
+        yield from self.split_page_windows(windows)
+    
+    def split_page_windows(self, windows: Iterable[List[Dict[str, any]]]) -> Iterator[Dict[str, any]]:
+        """将逐窗口到达的页面切分成带页码和章节信息的文本块
+        
+        每个窗口的最后一个块可能被窗口边界截断，因此不立即输出，
+        而是与下一窗口的文本拼接后重新切分，保证跨窗口的块边界正确。
+        """
+        carry = ""
+        # 缓冲区内各页、各章节标题的起始偏移，用于确定块所在页码和章节
+        page_marks = []
+        section_marks = [(0, {"section": "", "chapter": 0})]
+        chunk_index = 0
+        pages_processed = 0
+        
+        for pages in windows:
+            pages_processed += len(pages)
+            parts = [carry]
+            offset = len(carry)
+            
+            for page in pages:
+                page_part = self._format_page(page["page_number"], page["text"])
+                page_marks.append((offset, page["page_number"]))
+                
+                for match in SECTION_HEADING_PATTERN.finditer(page_part):
+                    section_marks.append((offset + match.start(), _parse_section_heading(match)))
+                
+                parts.append(page_part)
+                offset += len(page_part)
+            
+            buffer = "".join(parts)
+            chunks = self.text_splitter.split_text(buffer)
+            
+            if not chunks:
+                carry = ""
+                page_marks = _rebase_marks(page_marks, len(buffer))
+                section_marks = _rebase_marks(section_marks, len(buffer))
+                continue
+            
+            positions = _locate_chunks(buffer, chunks)
+            
+            batch = []
+            for content, position in zip(chunks[:-1], positions[:-1]):
+                batch.append(self._build_chunk(
+                    content, chunk_index, 
+                    _page_span(page_marks, position, len(content)),
+                    _section_at(section_marks, position + len(content))
+                ))
+                chunk_index += 1
+            
+            # 保留最后一个块的起始位置之后的文本，留到下一窗口
+            last_start = positions[-1]
+            carry = buffer[last_start:]
+            page_marks = _rebase_marks(page_marks, last_start)
+            section_marks = _rebase_marks(section_marks, last_start)
+            
+            if batch:
+                yield {"chunks": batch, "pages_processed": pages_processed}
+        
+        # 输出最后剩余的文本
+        if carry.strip():
+            chunks = self.text_splitter.split_text(carry)
+            batch = []
+            for content, position in zip(chunks, _locate_chunks(carry, chunks)):
+                batch.append(self._build_chunk(
+                    content, chunk_index,
+                    _page_span(page_marks, position, len(content)),
+                    _section_at(section_marks, position + len(content))
+                ))
+                chunk_index += 1
+            
+            if batch:
+                yield {"chunks": batch, "pages_processed": pages_processed}
+    
+    def process_document(self, file_path: str, parallel: Optional[bool] = None) -> Dict[str, any]:
         """处理文档的完整流程"""
         # 提取文本
-        extraction_result = self.extract_text_from_pdf(file_path)
+        extraction_result = self.extract_text_from_pdf(file_path, parallel=parallel)
         
         if not extraction_result["success"]:
             return extraction_result
         
-        # 分割文本
-        chunks = self.split_text_into_chunks(extraction_result["full_text"])
+        # 分割文本（所有页面作为一个窗口，块带页码信息）
+        chunks = [
+            chunk
+            for batch in self.split_page_windows([extraction_result["page_texts"]])
+            for chunk in batch["chunks"]
+        ]
         
         return {
             "metadata": extraction_result["metadata"],
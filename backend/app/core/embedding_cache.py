@@ -0,0 +1,264 @@
+import os
+import asyncio
+import sqlite3
+import hashlib
+import threading
+import time
+import logging
+from array import array
+from typing import List, Dict, Optional
+from langchain.embeddings.base import Embeddings
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """嵌入向量磁盘缓存 - 基于SQLite，按(模型, 文本哈希)存储，超出容量时按最近访问时间淘汰"""
+    
+    # SQLite单条语句的参数数量有限，批量查询时分段
+    LOOKUP_BATCH_SIZE = 500
+    
+    def __init__(self, path: str, max_bytes: int = 1024 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        # INSERT OR REPLACE替换旧行时也触发删除触发器，保证总量统计准确
+        self.conn.execute("PRAGMA recursive_triggers=ON")
+        
+        # 多个进程共用同一缓存文件，建表和初始化统计放在一个写事务中
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)"
+        )
+        
+        # 条目数和总字节数保存在单行统计表中，由触发器随插入/删除更新，避免每次写入都全表求和
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_stats (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                entries INTEGER NOT NULL,
+                total_bytes INTEGER NOT NULL
+            )
+        """)
+        if self.conn.execute("SELECT 1 FROM embedding_stats WHERE id = 0").fetchone() is None:
+            # 首次创建统计表（包括旧版本留下的缓存文件）时统计一次现有数据
+            self.conn.execute(
+                "INSERT INTO embedding_stats (id, entries, total_bytes) "
+                "SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM embeddings"
+            )
+        self.conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS embeddings_stats_insert AFTER INSERT ON embeddings
+            BEGIN
+                UPDATE embedding_stats SET entries = entries + 1, total_bytes = total_bytes + NEW.size WHERE id = 0;
+            END
+        """)
+        self.conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS embeddings_stats_delete AFTER DELETE ON embeddings
+            BEGIN
+                UPDATE embedding_stats SET entries = entries - 1, total_bytes = total_bytes - OLD.size WHERE id = 0;
+            END
+        """)
+        self.conn.commit()
+    
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        """生成缓存键"""
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+    
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """批量查询缓存，返回命中的键到向量的映射"""
+        found = {}
+        now = time.time()
+        
+        with self.lock:
+            for i in range(0, len(keys), self.LOOKUP_BATCH_SIZE):
+                batch = keys[i:i + self.LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+            
+            # 更新访问时间，供LRU淘汰使用
+            if found:
+                self.conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self.conn.commit()
+            
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        
+        return found
+    
+    def set_many(self, model_name: str, items: Dict[str, List[float]]) -> None:
+        """批量写入缓存"""
+        if not items:
+            return
+        
+        now = time.time()
+        rows = []
+        for key, vector in items.items():
+            blob = array("f", vector).tobytes()
+            rows.append((key, model_name, blob, len(blob), now))
+        
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self.conn.commit()
+            self._evict_if_needed()
+    
+    def _evict_if_needed(self) -> None:
+        """超出容量时删除最久未访问的条目，直到降到容量的90%"""
+        total = self.conn.execute("SELECT total_bytes FROM embedding_stats WHERE id = 0").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        cursor = self.conn.execute("SELECT key, size FROM embeddings ORDER BY last_access ASC")
+        
+        to_delete = []
+        for key, size in cursor:
+            if total <= target:
+                break
+            to_delete.append((key,))
+            total -= size
+            evicted += 1
+        
+        self.conn.executemany("DELETE FROM embeddings WHERE key = ?", to_delete)
+        self.conn.commit()
+        self.evictions += evicted
+        logger.info(f"嵌入缓存淘汰 {evicted} 条记录")
+    
+    def stats(self) -> Dict:
+        """缓存统计信息"""
+        with self.lock:
+            entries, total = self.conn.execute(
+                "SELECT entries, total_bytes FROM embedding_stats WHERE id = 0"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            
+            return {
+                "path": self.path,
+                "entries": entries,
+                "size_bytes": total,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+    
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self.lock:
+            self.conn.close()
+
+class CachedEmbeddings(Embeddings):
+    """带磁盘缓存的嵌入模型包装器，只有未命中的文本才会调用底层模型"""
+    
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model_name: str = None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name or (
+            getattr(embeddings, "model_name", None)
+            or getattr(embeddings, "model", None)
+            or type(embeddings).__name__
+        )
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """嵌入多个文档，批量查缓存后只发送未命中的文本"""
+        keys = [EmbeddingCache.make_key(self.model_name, text) for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+        
+        vectors = self.cache.get_many(unique_keys)
+        
+        # 去重后的未命中文本，保持原有顺序
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        
+        if missing:
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), new_vectors))
+            self.cache.set_many(self.model_name, computed)
+            vectors.update(computed)
+        
+        return [vectors[key] for key in keys]
+    
+    def embed_query(self, text: str) -> List[float]:
+        """嵌入单个查询"""
+        key = EmbeddingCache.make_key(self.model_name, text)
+        cached = self.cache.get_many([key])
+        if key in cached:
+            return cached[key]
+        
+        vector = self.embeddings.embed_query(text)
+        self.cache.set_many(self.model_name, {key: vector})
+        return vector
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """异步嵌入多个文档"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.embed_documents, texts)
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        """异步嵌入单个查询，缓存读写放入线程池，未命中时使用底层模型的异步接口"""
+        loop = asyncio.get_running_loop()
+        key = EmbeddingCache.make_key(self.model_name, text)
+        
+        cached = await loop.run_in_executor(None, self.cache.get_many, [key])
+        if key in cached:
+            return cached[key]
+        
+        vector = await self.embeddings.aembed_query(text)
+        await loop.run_in_executor(None, self.cache.set_many, self.model_name, {key: vector})
+        return vector
+
+# 按路径共享的缓存实例
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+def get_embedding_cache(path: str = None, max_bytes: int = None) -> EmbeddingCache:
+    """获取（或创建）指定路径的嵌入缓存"""
+    path = path or os.getenv("EMBEDDING_CACHE_PATH", "./vector_db/embedding_cache.db")
+    max_bytes = max_bytes or int(os.getenv("EMBEDDING_CACHE_MAX_MB", 1024)) * 1024 * 1024
+    
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = EmbeddingCache(path, max_bytes=max_bytes)
+        return _caches[path]
+
+def get_embedding_cache_stats() -> List[Dict]:
+    """所有已打开的嵌入缓存的统计信息"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return [cache.stats() for cache in caches]
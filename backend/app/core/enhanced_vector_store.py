@@ -1,8 +1,9 @@
-import jieba
+import asyncio
 import re
 from typing import List, Dict, Any, Optional
-from .vector_store import VectorStoreManager
+from .vector_store import VectorStoreManager, _vector_store_executor
 from .cache_manager import cache_manager
+from .keyword_index import get_keyword_index
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,17 +14,51 @@ class EnhancedVectorStore(VectorStoreManager):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.cache_manager = cache_manager
+        self.keyword_index = get_keyword_index()
+    
+    def add_document_chunks(
+        self, 
+        document_id: str, 
+        chunks: List[Dict], 
+        embeddings: Optional[List[List[float]]] = None
+    ) -> bool:
+        """写入向量存储，同时建立关键词倒排索引"""
+        if not super().add_document_chunks(document_id, chunks, embeddings):
+            return False
+        
+        try:
+            self.keyword_index.add_chunks(document_id, chunks)
+        except Exception as e:
+            # 索引缺失时查询会按需重建，不影响入库
+            logger.error(f"建立关键词索引失败: {e}")
+        
+        # 文档内容有变化（流式入库或重新入库），之前缓存的检索结果失效
+        self.cache_manager.invalidate_document(document_id)
+        
+        return True
+    
+    def delete_document_collection(self, document_id: str) -> bool:
+        """删除向量数据和关键词索引"""
+        try:
+            self.keyword_index.delete_document(document_id)
+        except Exception as e:
+            logger.error(f"删除关键词索引失败: {e}")
+        
+        self.cache_manager.invalidate_document(document_id)
+        
+        return super().delete_document_collection(document_id)
     
     def search_similar_chunks_with_cache(
         self, 
         document_id: str, 
         query: str, 
-        k: int = 5
+        k: int = 5,
+        where: Optional[Dict] = None
     ) -> List[Dict]:
         """带缓存的向量搜索"""
         
         # 检查缓存
-        cache_key = self.cache_manager.search_cache_key(document_id, query, k)
+        cache_key = self.cache_manager.search_cache_key(document_id, query, k, where)
         cached_result = self.cache_manager.get(cache_key)
         
         if cached_result:
@@ -31,10 +66,39 @@ class EnhancedVectorStore(VectorStoreManager):
             return cached_result
         
         # 执行搜索
-        results = self.search_similar_chunks(document_id, query, k)
+        results = self.search_similar_chunks(document_id, query, k, where)
         
         # 缓存结果（1小时）
-        self.cache_manager.set(cache_key, results, expire=3600)
+        self.cache_manager.set(
+            cache_key, results, expire=3600, tags=[self.cache_manager.document_tag(document_id)]
+        )
+        
+        return results
+    
+    async def asearch_similar_chunks_with_cache(
+        self, 
+        document_id: str, 
+        query: str, 
+        k: int = 5,
+        where: Optional[Dict] = None
+    ) -> List[Dict]:
+        """带缓存的异步向量搜索"""
+        
+        # 检查缓存
+        cache_key = self.cache_manager.search_cache_key(document_id, query, k, where)
+        cached_result = await self.run_blocking(self.cache_manager.get, cache_key)
+        
+        if cached_result:
+            logger.info(f"命中搜索缓存: {document_id}")
+            return cached_result
+        
+        # 执行搜索
+        results = await self.asearch_similar_chunks(document_id, query, k, where)
+        
+        # 缓存结果（1小时）
+        await self.run_blocking(
+            self.cache_manager.set, cache_key, results, 3600, [self.cache_manager.document_tag(document_id)]
+        )
         
         return results
     
@@ -43,18 +107,23 @@ class EnhancedVectorStore(VectorStoreManager):
         document_id: str, 
         query: str, 
         k: int = 5,
-        alpha: float = 0.7
+        alpha: float = 0.7,
+        where: Optional[Dict] = None
     ) -> List[Dict]:
-        """混合检索：向量搜索 + 关键词搜索"""
+        """混合检索：向量搜索 + 关键词搜索，两路检索并发执行"""
         
         try:
+            # 关键词搜索放入线程池，与向量搜索并行
+            keyword_future = _vector_store_executor.submit(
+                self._keyword_search, document_id, query, k * 2, where
+            )
+            
             # 向量搜索
             vector_results = self.search_similar_chunks_with_cache(
-                document_id, query, k * 2
+                document_id, query, k * 2, where
             )
             
-            # 关键词搜索
-            keyword_results = self._keyword_search(document_id, query, k * 2)
+            keyword_results = keyword_future.result()
             
             # 融合结果
             combined_results = self._combine_search_results(
@@ -66,39 +135,79 @@ class EnhancedVectorStore(VectorStoreManager):
         except Exception as e:
             logger.error(f"混合搜索失败: {e}")
             # 降级到普通向量搜索
-            return self.search_similar_chunks_with_cache(document_id, query, k)
+            return self.search_similar_chunks_with_cache(document_id, query, k, where)
     
-    def _keyword_search(self, document_id: str, query: str, k: int) -> List[Dict]:
-        """关键词搜索实现"""
+    async def ahybrid_search(
+        self, 
+        document_id: str, 
+        query: str, 
+        k: int = 5,
+        alpha: float = 0.7,
+        where: Optional[Dict] = None
+    ) -> List[Dict]:
+        """异步混合检索：向量检索和关键词检索并发执行"""
+        
         try:
-            collection_name = f"doc_{document_id}"
+            vector_results, keyword_results = await asyncio.gather(
+                self.asearch_similar_chunks_with_cache(document_id, query, k * 2, where),
+                self.run_blocking(self._keyword_search, document_id, query, k * 2, where)
+            )
             
-            # 检查集合是否存在
-            existing_collections = [col.name for col in self.client.list_collections()]
-            if collection_name not in existing_collections:
-                return []
+            # 融合结果
+            combined_results = self._combine_search_results(
+                vector_results, keyword_results, alpha
+            )
+            
+            return combined_results[:k]
             
+        except Exception as e:
+            logger.error(f"异步混合搜索失败: {e}")
+            # 降级到普通向量搜索
+            return await self.asearch_similar_chunks_with_cache(document_id, query, k, where)
+    
+    def _keyword_search(
+        self, 
+        document_id: str, 
+        query: str, 
+        k: int, 
+        where: Optional[Dict] = None
+    ) -> List[Dict]:
+        """关键词搜索：基于BM25倒排索引，只读取查询词的倒排列表"""
+        try:
             # 获取集合
-            collection = self.client.get_collection(name=collection_name)
+            collection = self._get_collection(self._collection_name(document_id))
+            if collection is None:
+                return []
             
-            # 获取所有文档
-            all_docs = collection.get()
+            # 旧文档没有索引时按需构建一次
+            if not self.keyword_index.has_document(document_id):
+                self._build_keyword_index(document_id)
             
-            if not all_docs['documents']:
+            ranked = self.keyword_index.search(document_id, query)
+            if not ranked:
                 return []
             
-            # 计算关键词匹配分数
+            # 按分数顺序分页取回文本块，同时应用元数据过滤条件
             results = []
-            for i, content in enumerate(all_docs['documents']):
-                score = self._calculate_keyword_score(content, query)
-                if score > 0:
+            page_size = k if not where else k * 4
+            for offset in range(0, len(ranked), page_size):
+                page = dict(ranked[offset:offset + page_size])
+                chunks = collection.get(
+                    ids=self._chunk_ids(document_id, [{"chunk_id": chunk_id} for chunk_id in page]),
+                    where=self._scope_where(document_id, where)
+                )
+                
+                for content, metadata in zip(chunks['documents'], chunks['metadatas']):
                     results.append({
                         "content": content,
-                        "metadata": all_docs['metadatas'][i],
-                        "similarity_score": score,
-                        "chunk_id": all_docs['metadatas'][i].get("chunk_id", ""),
-                        "chunk_index": all_docs['metadatas'][i].get("chunk_index", 0)
+                        "metadata": metadata,
+                        "similarity_score": page[metadata.get("chunk_id", "")],
+                        "chunk_id": metadata.get("chunk_id", ""),
+                        "chunk_index": metadata.get("chunk_index", 0)
                     })
+                
+                if len(results) >= k:
+                    break
             
             # 按分数排序
             results.sort(key=lambda x: x['similarity_score'], reverse=True)
@@ -108,39 +217,11 @@ class EnhancedVectorStore(VectorStoreManager):
             logger.error(f"关键词搜索失败: {e}")
             return []
     
-    def _calculate_keyword_score(self, content: str, query: str) -> float:
-        """计算关键词匹配分数"""
-        try:
-            # 分词
-            query_words = set(jieba.cut(query.lower()))
-            content_words = set(jieba.cut(content.lower()))
-            
-            # 移除停用词和单字符
-            stop_words = {'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个'}
-            query_words = {w for w in query_words if len(w) > 1 and w not in stop_words}
-            content_words = {w for w in content_words if len(w) > 1 and w not in stop_words}
-            
-            if not query_words:
-                return 0.0
-            
-            # 计算交集和并集
-            intersection = query_words & content_words
-            
-            if not intersection:
-                return 0.0
-            
-            # 计算Jaccard相似度，并添加词频权重
-            jaccard_score = len(intersection) / len(query_words | content_words)
-            
-            # 添加完全匹配奖励
-            exact_matches = sum(1 for word in query_words if word in content.lower())
-            exact_match_bonus = exact_matches / len(query_words) * 0.5
-            
-            return min(jaccard_score + exact_match_bonus, 1.0)
-            
-        except Exception as e:
-            logger.error(f"关键词分数计算失败: {e}")
-            return 0.0
+    def _build_keyword_index(self, document_id: str) -> None:
+        """从向量库读取文档的全部文本块建立关键词索引（用于索引上线前入库的文档）"""
+        chunks = self.get_document_chunks(document_id)
+        self.keyword_index.add_chunks(document_id, chunks)
+        logger.info(f"为文档 {document_id} 建立关键词索引: {len(chunks)} 个文本块")
     
     def _combine_search_results(
         self, 
@@ -151,27 +232,27 @@ class EnhancedVectorStore(VectorStoreManager):
         """融合搜索结果"""
         
         def normalize_scores(results):
-            """归一化分数"""
+            """归一化分数，返回新的结果字典，不修改传入的（可能来自缓存的）结果"""
             if not results:
-                return results
+                return []
             
             scores = [r['similarity_score'] for r in results]
             max_score = max(scores) if scores else 1.0
             min_score = min(scores) if scores else 0.0
             
             if max_score == min_score:
-                for r in results:
-                    r['similarity_score'] = 1.0
-                return results
-            
-            for r in results:
-                r['similarity_score'] = (r['similarity_score'] - min_score) / (max_score - min_score)
+                return [{**r, 'similarity_score': 1.0} for r in results]
             
-            return results
+            return [
+                {**r, 'similarity_score': (r['similarity_score'] - min_score) / (max_score - min_score)}
+                for r in results
+            ]
         
-        # 归一化分数
-        vector_results = normalize_scores(vector_results.copy())
-        keyword_results = normalize_scores(keyword_results.copy())
+        # 向量检索的similarity_score是距离（越小越相似），先转换为越大越相似的分数再归一化
+        vector_results = normalize_scores([
+            {**r, 'similarity_score': 1.0 / (1.0 + r['similarity_score'])} for r in vector_results
+        ])
+        keyword_results = normalize_scores(keyword_results)
         
         # 创建内容到结果的映射
         content_map = {}
@@ -0,0 +1,155 @@
+import os
+import math
+import sqlite3
+import threading
+import logging
+from collections import Counter
+from typing import List, Dict, Tuple
+import jieba
+
+logger = logging.getLogger(__name__)
+
+# 停用词（分词后过滤，单字符词同样过滤）
+STOP_WORDS = frozenset({'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个'})
+
+def tokenize(text: str) -> List[str]:
+    """jieba分词，去掉停用词、单字符词和纯标点/空白"""
+    return [
+        word for word in jieba.cut(text.lower())
+        if len(word) > 1 and word not in STOP_WORDS and any(ch.isalnum() for ch in word)
+    ]
+
+class KeywordIndex:
+    """BM25倒排索引 - 基于SQLite，按文档分区，入库时构建
+    
+    查询只读取查询词的倒排列表，不再遍历文档的全部文本块。
+    """
+    
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                document_id TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                length INTEGER NOT NULL,
+                PRIMARY KEY (document_id, chunk_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS postings (
+                document_id TEXT NOT NULL,
+                term TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (document_id, term, chunk_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings (document_id, chunk_id);
+        """)
+        self.conn.commit()
+    
+    def has_document(self, document_id: str) -> bool:
+        """文档是否已建立索引"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM chunks WHERE document_id = ? LIMIT 1", (document_id,)
+            ).fetchone()
+        return row is not None
+    
+    def add_chunks(self, document_id: str, chunks: List[Dict]) -> None:
+        """索引文本块（chunk_id相同时覆盖），chunks需包含chunk_id和content"""
+        if not chunks:
+            return
+        
+        chunk_rows = []
+        posting_rows = []
+        for chunk in chunks:
+            terms = Counter(tokenize(chunk["content"]))
+            chunk_rows.append((document_id, chunk["chunk_id"], sum(terms.values())))
+            posting_rows.extend(
+                (document_id, term, chunk["chunk_id"], tf) for term, tf in terms.items()
+            )
+        
+        with self.lock:
+            self.conn.executemany(
+                "DELETE FROM postings WHERE document_id = ? AND chunk_id = ?",
+                [(document_id, chunk_id) for _, chunk_id, _ in chunk_rows]
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO chunks (document_id, chunk_id, length) VALUES (?, ?, ?)",
+                chunk_rows
+            )
+            self.conn.executemany(
+                "INSERT INTO postings (document_id, term, chunk_id, tf) VALUES (?, ?, ?, ?)",
+                posting_rows
+            )
+            self.conn.commit()
+    
+    def search(self, document_id: str, query: str, limit: int = None) -> List[Tuple[str, float]]:
+        """BM25检索，返回按分数降序的 (chunk_id, score) 列表"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        
+        with self.lock:
+            chunk_count, total_length = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks WHERE document_id = ?",
+                (document_id,)
+            ).fetchone()
+            if not chunk_count:
+                return []
+            
+            placeholders = ",".join("?" * len(terms))
+            rows = self.conn.execute(
+                f"""
+                SELECT p.term, p.chunk_id, p.tf, c.length
+                FROM postings p
+                JOIN chunks c ON c.document_id = p.document_id AND c.chunk_id = p.chunk_id
+                WHERE p.document_id = ? AND p.term IN ({placeholders})
+                """,
+                [document_id, *terms]
+            ).fetchall()
+        
+        average_length = total_length / chunk_count or 1.0
+        document_frequency = Counter(term for term, _, _, _ in rows)
+        
+        scores = {}
+        for term, chunk_id, tf, length in rows:
+            df = document_frequency[term]
+            idf = math.log(1 + (chunk_count - df + 0.5) / (df + 0.5))
+            norm = tf + self.k1 * (1 - self.b + self.b * length / average_length)
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit] if limit else ranked
+    
+    def delete_document(self, document_id: str) -> None:
+        """删除文档的全部索引"""
+        with self.lock:
+            self.conn.execute("DELETE FROM postings WHERE document_id = ?", (document_id,))
+            self.conn.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+            self.conn.commit()
+    
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self.lock:
+            self.conn.close()
+
+# 按路径共享的索引实例
+_indexes: Dict[str, KeywordIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_keyword_index(path: str = None) -> KeywordIndex:
+    """获取（或创建）指定路径的关键词索引"""
+    path = path or os.getenv("KEYWORD_INDEX_PATH", "./vector_db/keyword_index.db")
+    
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = KeywordIndex(path)
+        return _indexes[path]
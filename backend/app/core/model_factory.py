@@ -2,6 +2,7 @@ import os
 from typing import Optional, Any
 from langchain.embeddings.base import Embeddings
 from langchain.llms.base import BaseLLM
+from .embedding_cache import CachedEmbeddings, get_embedding_cache
 
 # 导入不同的模型适配器
 try:
@@ -49,27 +50,41 @@ class ModelFactory:
             raise ValueError(f"不支持的模型类型: {model_type}")
     
     @staticmethod
-    def create_embeddings(model_type: str = None, **kwargs) -> Embeddings:
-        """创建嵌入模型"""
+    def create_embeddings(model_type: str = None, use_cache: bool = None, **kwargs) -> Embeddings:
+        """创建嵌入模型，默认包装本地磁盘缓存（EMBEDDING_CACHE_ENABLED=false可关闭）"""
         if model_type is None:
             model_type = os.getenv("EMBEDDING_TYPE", "openai")
         
+        if use_cache is None:
+            use_cache = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+        
         if model_type.lower() == "openai":
             if not OPENAI_AVAILABLE:
                 raise ImportError("OpenAI依赖未安装")
             
-            return OpenAIEmbeddings()
+            embeddings = OpenAIEmbeddings()
+            model_name = getattr(embeddings, "model", "text-embedding-ada-002")
         
         elif model_type.lower() == "qwen":
             if not QWEN_AVAILABLE:
                 raise ImportError("通义千问依赖未安装")
             
-            return QwenEmbeddings(
+            embeddings = QwenEmbeddings(
                 model_name=kwargs.get("model", "text-embedding-v1")
             )
+            model_name = embeddings.model_name
         
         else:
             raise ValueError(f"不支持的嵌入模型类型: {model_type}")
+        
+        if not use_cache:
+            return embeddings
+        
+        return CachedEmbeddings(
+            embeddings,
+            cache=get_embedding_cache(),
+            model_name=f"{model_type.lower()}:{model_name}"
+        )
     
     @staticmethod
     def get_available_models() -> dict:
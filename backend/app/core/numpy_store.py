@@ -0,0 +1,675 @@
+import os
+import json
+import fcntl
+import uuid
+import shutil
+import threading
+import logging
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Any, Set, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def _match_condition(value: Any, condition: Any) -> bool:
+    """判断单个元数据值是否满足条件（支持Chroma的比较运算符）"""
+    if not isinstance(condition, dict):
+        return value == condition
+    
+    for operator, operand in condition.items():
+        if operator == "$eq":
+            ok = value == operand
+        elif operator == "$ne":
+            ok = value != operand
+        elif operator == "$in":
+            ok = value in operand
+        elif operator == "$nin":
+            ok = value not in operand
+        elif value is None:
+            ok = False
+        elif operator == "$gt":
+            ok = value > operand
+        elif operator == "$gte":
+            ok = value >= operand
+        elif operator == "$lt":
+            ok = value < operand
+        elif operator == "$lte":
+            ok = value <= operand
+        else:
+            raise ValueError(f"不支持的过滤运算符: {operator}")
+        if not ok:
+            return False
+    return True
+
+def match_where(metadata: Dict, where: Optional[Dict]) -> bool:
+    """按Chroma where语法判断元数据是否满足过滤条件"""
+    if not where:
+        return True
+    
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(match_where(metadata, item) for item in condition):
+                return False
+        elif key == "$or":
+            if not any(match_where(metadata, item) for item in condition):
+                return False
+        elif not _match_condition(metadata.get(key), condition):
+            return False
+    return True
+
+# 量化存储模式：float16，或按维度缩放的int8标量量化
+QUANTIZATION_NONE = "none"
+QUANTIZATION_FLOAT16 = "float16"
+QUANTIZATION_INT8 = "int8"
+
+def fit_quantization(vectors: np.ndarray, mode: str) -> Dict[str, np.ndarray]:
+    """按已有向量拟合量化参数（int8为每个维度的缩放和偏移，float16无参数）"""
+    if mode == QUANTIZATION_FLOAT16:
+        return {}
+    
+    if mode == QUANTIZATION_INT8:
+        # 每个维度按[min, max]线性映射到[-128, 127]
+        offset = vectors.min(axis=0)
+        scale = (vectors.max(axis=0) - offset) / 255.0
+        scale[scale == 0] = 1.0
+        return {"scale": scale.astype(np.float32), "offset": offset.astype(np.float32)}
+    
+    raise ValueError(f"不支持的量化模式: {mode}")
+
+def encode(vectors: np.ndarray, mode: str, params: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """按量化参数压缩向量，返回压缩后的行（codes）和反量化向量的平方范数
+    
+    超出拟合范围的int8分量被截断，误差由精确重排弥补。
+    """
+    if mode == QUANTIZATION_FLOAT16:
+        codes = vectors.astype(np.float16)
+        reconstructed = codes.astype(np.float32)
+    elif mode == QUANTIZATION_INT8:
+        scale, offset = params["scale"], params["offset"]
+        codes = (np.rint((vectors - offset) / scale) - 128).clip(-128, 127).astype(np.int8)
+        reconstructed = (codes.astype(np.float32) + 128) * scale + offset
+    else:
+        raise ValueError(f"不支持的量化模式: {mode}")
+    return codes, np.einsum("ij,ij->i", reconstructed, reconstructed).astype(np.float32)
+
+# 压缩空间打分时每块的行数：矩阵乘法会把压缩行提升为float32，分块后临时内存与集合大小无关
+SCORE_BLOCK_ROWS = int(os.getenv("VECTOR_STORE_SCORE_BLOCK_ROWS", 4096))
+
+def approximate_dot(
+    query: np.ndarray,
+    codes: np.ndarray,
+    params: Dict[str, np.ndarray],
+    rows: Optional[np.ndarray] = None,
+    block_rows: int = SCORE_BLOCK_ROWS
+) -> np.ndarray:
+    """在压缩空间中计算查询向量与各行（反量化后）的内积，rows为None时计算全部行
+    
+    按block_rows分块计算，每次只有一块被转换为float32。
+    """
+    if codes.dtype == np.int8:
+        # q·x̂ = (q*scale)·code + 128*sum(q*scale) + q·offset，无需反量化整个矩阵
+        weights = (query * params["scale"]).astype(np.float32)
+        bias = 128.0 * float(weights.sum()) + float(query @ params["offset"])
+    else:
+        weights, bias = query, 0.0
+    
+    count = len(codes) if rows is None else len(rows)
+    scores = np.empty(count, dtype=np.float32)
+    for start in range(0, count, block_rows):
+        end = min(start + block_rows, count)
+        block = codes[start:end] if rows is None else codes[rows[start:end]]
+        scores[start:end] = block.astype(np.float32) @ weights
+    return scores + bias
+
+def _generation_files(generation: str) -> Dict[str, str]:
+    """一代存储的文件名：float32向量、精确平方范数、记录日志"""
+    return {
+        "vectors": f"vectors-{generation}.f32",
+        "norms": f"norms-{generation}.f32",
+        "log": f"records-{generation}.jsonl"
+    }
+
+def _empty_manifest(metadata: Optional[Dict] = None) -> Dict:
+    generation = uuid.uuid4().hex
+    return {
+        "metadata": metadata,
+        "generation": generation,
+        "dim": None,
+        "rows": 0,
+        "log_bytes": 0,
+        "files": _generation_files(generation),
+        "quantized": None,
+        "previous": []
+    }
+
+def _write_manifest(directory: str, manifest: Dict) -> None:
+    """原子替换清单文件，清单中的行数和日志长度即已提交的数据范围"""
+    path = os.path.join(directory, NumpyCollection.MANIFEST)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+def _referenced_files(manifest: Dict) -> Set[str]:
+    """清单引用的数据文件"""
+    files = set(manifest["files"].values())
+    quantized = manifest.get("quantized")
+    if quantized:
+        files.update(name for key, name in quantized.items() if key in ("codes", "norms", "params") and name)
+    return files
+
+class NumpyCollection:
+    """基于NumPy的向量集合 - 与Chroma集合接口兼容的精确（暴力）检索
+    
+    每个集合一个目录，数据文件只追加写入：
+    - vectors-*.f32：连续float32矩阵（内存映射读取），norms-*.f32为各行的平方范数
+    - records-*.jsonl：每行一条记录（ID、文本、元数据）或一条删除记录
+    - manifest.json：已提交的行数和日志长度，写入方追加数据后原子替换
+    
+    读取方只读取清单范围内的数据，清单变化后增量加载新增的日志。重复写入的ID
+    和删除的记录在原位置留下失效行，失效行多于有效行时压缩为新一代文件；
+    上一代文件保留到下一次写入再删除，正在读取旧清单的其他进程不受影响。
+    距离为平方L2，与Chroma默认度量一致。
+    
+    启用量化（float16/int8）时另存一份压缩矩阵：先在压缩空间中取
+    k * rescore_factor 个候选，再读取候选行的float32向量精确重排。
+    int8参数在行数每翻一倍时重新拟合。量化减少的是检索时读取的内存和页缓存，
+    float32矩阵仍保留在磁盘上用于重排，磁盘占用会增加压缩矩阵的大小。
+    """
+    
+    MANIFEST = "manifest.json"
+    
+    def __init__(
+        self,
+        directory: str,
+        name: str,
+        quantization: str = None,
+        rescore_factor: int = None
+    ):
+        self.directory = directory
+        self.name = name
+        self.lock = threading.RLock()
+        
+        # 写入时使用的量化模式；读取时以磁盘上的实际格式为准
+        self.quantization = (quantization or os.getenv("VECTOR_STORE_QUANTIZATION", QUANTIZATION_NONE)).lower()
+        if self.quantization not in (QUANTIZATION_NONE, QUANTIZATION_FLOAT16, QUANTIZATION_INT8):
+            raise ValueError(f"不支持的量化模式: {self.quantization}")
+        self.rescore_factor = rescore_factor or int(os.getenv("VECTOR_STORE_RESCORE_FACTOR", 4))
+        
+        self._manifest = None
+        self._generation = None
+        self._log_offset = 0
+        # 按行保存，失效行的ID/文本/元数据为None
+        self._ids: List[Optional[str]] = []
+        self._documents: List[Optional[str]] = []
+        self._metadatas: List[Optional[Dict]] = []
+        self._positions: Dict[str, int] = {}
+        self._live_rows = None
+        self._vectors = None
+        self._norms = None
+        self._codes = None
+        self._params = None
+        self._loaded_stamp = None
+        
+        self._reload_if_changed()
+    
+    @property
+    def metadata(self) -> Optional[Dict]:
+        return self._manifest.get("metadata") if self._manifest else None
+    
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.directory, self.MANIFEST)
+    
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+    
+    def _reload_if_changed(self) -> None:
+        """清单有变化（包括其他进程写入）时加载新增的数据"""
+        for _ in range(3):
+            try:
+                stat = os.stat(self._manifest_path)
+            except FileNotFoundError:
+                raise ValueError(f"集合 {self.name} 不存在")
+            
+            stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if stamp == self._loaded_stamp:
+                return
+            
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            try:
+                self._load(manifest)
+            except FileNotFoundError:
+                # 读到清单后写入方又压缩了两次，这一代文件已被清理，重新读取清单
+                self._generation = None
+                continue
+            
+            self._loaded_stamp = stamp
+            return
+        
+        raise RuntimeError(f"集合 {self.name} 加载失败：数据文件持续变化")
+    
+    def _load(self, manifest: Dict) -> None:
+        if manifest["generation"] != self._generation:
+            self._log_offset = 0
+            self._ids, self._documents, self._metadatas = [], [], []
+            self._positions = {}
+        
+        files = manifest["files"]
+        if manifest["log_bytes"] > self._log_offset:
+            with open(self._path(files["log"]), "rb") as f:
+                f.seek(self._log_offset)
+                data = f.read(manifest["log_bytes"] - self._log_offset)
+            for line in data.splitlines():
+                self._apply(json.loads(line))
+        self._log_offset = manifest["log_bytes"]
+        self._generation = manifest["generation"]
+        self._live_rows = None
+        
+        rows, dim = manifest["rows"], manifest["dim"]
+        self._vectors = self._norms = self._codes = self._params = None
+        if rows:
+            self._vectors = np.memmap(self._path(files["vectors"]), dtype=np.float32, mode="r", shape=(rows, dim))
+            self._norms = np.memmap(self._path(files["norms"]), dtype=np.float32, mode="r", shape=(rows,))
+            
+            quantized = manifest.get("quantized")
+            if quantized:
+                # 检索只读取压缩矩阵和近似范数，float32矩阵仅在重排时按候选行读取
+                dtype = np.int8 if quantized["mode"] == QUANTIZATION_INT8 else np.float16
+                self._codes = np.memmap(self._path(quantized["codes"]), dtype=dtype, mode="r", shape=(rows, dim))
+                self._norms = np.memmap(self._path(quantized["norms"]), dtype=np.float32, mode="r", shape=(rows,))
+                self._params = {}
+                if quantized.get("params"):
+                    with np.load(self._path(quantized["params"])) as params:
+                        self._params = {key: params[key] for key in params.files}
+        
+        self._manifest = manifest
+    
+    def _apply(self, record: Dict) -> None:
+        """应用一条日志记录：追加一行（同ID的旧行失效）或删除"""
+        if "delete" in record:
+            for chunk_id in record["delete"]:
+                row = self._positions.pop(chunk_id, None)
+                if row is not None:
+                    self._ids[row] = self._documents[row] = self._metadatas[row] = None
+            return
+        
+        previous = self._positions.get(record["id"])
+        if previous is not None:
+            self._ids[previous] = self._documents[previous] = self._metadatas[previous] = None
+        self._positions[record["id"]] = len(self._ids)
+        self._ids.append(record["id"])
+        self._documents.append(record["document"])
+        self._metadatas.append(record["metadata"])
+    
+    def _dead_rows(self) -> int:
+        return len(self._ids) - len(self._positions)
+    
+    def _live(self) -> np.ndarray:
+        if self._live_rows is None:
+            self._live_rows = np.fromiter(sorted(self._positions.values()), dtype=np.int64, count=len(self._positions))
+        return self._live_rows
+    
+    @contextmanager
+    def _write_lock(self):
+        """跨进程写锁，防止多个写入方互相覆盖"""
+        with open(os.path.join(self.directory, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _append_bytes(self, filename: str, committed: int, data: bytes) -> None:
+        """在已提交长度之后追加数据（先截掉上次写入失败留下的未提交部分）"""
+        with open(self._path(filename), "ab") as f:
+            f.truncate(committed)
+            f.write(data)
+    
+    @staticmethod
+    def _encode_records(records: List[Tuple[str, str, Dict]]) -> bytes:
+        return "".join(
+            json.dumps({"id": chunk_id, "document": document, "metadata": metadata}, ensure_ascii=False) + "\n"
+            for chunk_id, document, metadata in records
+        ).encode("utf-8")
+    
+    def _write_codes(self, vectors: np.ndarray) -> Dict:
+        """按当前量化模式重新拟合参数并编码全部行，写入新的压缩文件"""
+        version = uuid.uuid4().hex
+        params = fit_quantization(vectors, self.quantization)
+        codes, norms = encode(vectors, self.quantization, params)
+        quantized = {
+            "mode": self.quantization,
+            "codes": f"codes-{version}.bin",
+            "norms": f"qnorms-{version}.f32",
+            "params": f"params-{version}.npz" if params else None,
+            "fitted_rows": len(vectors)
+        }
+        self._append_bytes(quantized["codes"], 0, codes.tobytes())
+        self._append_bytes(quantized["norms"], 0, norms.tobytes())
+        if params:
+            np.savez(self._path(quantized["params"]), **params)
+        return quantized
+    
+    def _write_generation(
+        self,
+        manifest: Dict,
+        vectors: Optional[np.ndarray],
+        records: List[Tuple[str, str, Dict]]
+    ) -> Dict:
+        """把给定的行写成新一代文件，返回新清单（未提交）"""
+        generation = uuid.uuid4().hex
+        files = _generation_files(generation)
+        log = self._encode_records(records)
+        
+        dim = manifest["dim"]
+        if records:
+            vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+            dim = vectors.shape[1]
+        else:
+            vectors = np.empty((0, dim or 0), dtype=np.float32)
+        
+        self._append_bytes(files["vectors"], 0, vectors.tobytes())
+        self._append_bytes(files["norms"], 0, np.einsum("ij,ij->i", vectors, vectors).tobytes())
+        self._append_bytes(files["log"], 0, log)
+        
+        return {
+            **manifest,
+            "generation": generation,
+            "dim": dim,
+            "rows": len(records),
+            "log_bytes": len(log),
+            "files": files,
+            "quantized": self._write_codes(vectors) if records and self.quantization != QUANTIZATION_NONE else None
+        }
+    
+    def _commit(self, manifest: Dict) -> None:
+        """提交新清单；本次不再引用的文件作为上一代保留到下一次写入"""
+        manifest["previous"] = sorted(_referenced_files(self._manifest) - _referenced_files(manifest))
+        _write_manifest(self.directory, manifest)
+        
+        self._reload_if_changed()
+        if self._dead_rows() > len(self._positions):
+            self._compact()
+    
+    def _compact(self) -> None:
+        """失效行多于有效行时，只保留有效行写成新一代文件"""
+        live = self._live()
+        vectors = np.asarray(self._vectors[live]) if len(live) else None
+        records = [(self._ids[row], self._documents[row], self._metadatas[row]) for row in live]
+        self._commit(self._write_generation(self._manifest, vectors, records))
+    
+    def _cleanup(self) -> None:
+        """删除既不属于当前一代也不属于上一代的文件（在写锁内调用）"""
+        keep = {self.MANIFEST, ".lock"} | _referenced_files(self._manifest) | set(self._manifest.get("previous", []))
+        for filename in os.listdir(self.directory):
+            if filename not in keep:
+                try:
+                    os.remove(self._path(filename))
+                except FileNotFoundError:
+                    pass
+    
+    def _append(self, vectors: np.ndarray, records: List[Tuple[str, str, Dict]]) -> None:
+        """追加行：只写入新增的向量、范数、压缩行和日志，再提交清单"""
+        manifest = dict(self._manifest)
+        rows = manifest["rows"]
+        dim = manifest["dim"] or vectors.shape[1]
+        if vectors.shape[1] != dim:
+            raise ValueError(f"向量维度不一致: {vectors.shape[1]} != {dim}")
+        
+        files = manifest["files"]
+        log = self._encode_records(records)
+        self._append_bytes(files["vectors"], rows * dim * 4, vectors.tobytes())
+        self._append_bytes(files["norms"], rows * 4, np.einsum("ij,ij->i", vectors, vectors).tobytes())
+        self._append_bytes(files["log"], manifest["log_bytes"], log)
+        
+        total = rows + len(vectors)
+        quantized = manifest.get("quantized") if rows else None
+        if self.quantization == QUANTIZATION_NONE:
+            quantized = None
+        elif (
+            quantized is None
+            or quantized["mode"] != self.quantization
+            or (self.quantization == QUANTIZATION_INT8 and total > 2 * quantized["fitted_rows"])
+        ):
+            # 模式变化或int8行数翻倍时重新拟合并编码全部行（摊还后每行常数次）
+            existing = np.asarray(self._vectors) if rows else np.empty((0, dim), dtype=np.float32)
+            quantized = self._write_codes(np.vstack([existing, vectors]))
+        else:
+            codes, norms = encode(vectors, quantized["mode"], self._params)
+            self._append_bytes(quantized["codes"], rows * dim * codes.itemsize, codes.tobytes())
+            self._append_bytes(quantized["norms"], rows * 4, norms.tobytes())
+        
+        manifest.update(dim=dim, rows=total, log_bytes=manifest["log_bytes"] + len(log), quantized=quantized)
+        self._commit(manifest)
+    
+    def _select(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None) -> List[int]:
+        """按ID和过滤条件选出有效行号"""
+        if ids is not None:
+            rows = [self._positions[chunk_id] for chunk_id in ids if chunk_id in self._positions]
+        elif self._dead_rows():
+            rows = self._live().tolist()
+        else:
+            rows = range(len(self._ids))
+        
+        if where:
+            rows = [row for row in rows if match_where(self._metadatas[row], where)]
+        return list(rows)
+    
+    def count(self) -> int:
+        with self.lock:
+            self._reload_if_changed()
+            return len(self._positions)
+    
+    def storage_stats(self) -> Dict:
+        """向量存储占用：检索时常驻读取的字节数与全精度矩阵的对比，以及当前一代文件的磁盘占用
+        
+        saved_ratio只针对检索内存；量化后磁盘占用（disk_bytes）比全精度更大。
+        """
+        with self.lock:
+            self._reload_if_changed()
+            disk_bytes = 0
+            for filename in _referenced_files(self._manifest):
+                try:
+                    disk_bytes += os.path.getsize(self._path(filename))
+                except FileNotFoundError:
+                    pass
+            
+            if self._vectors is None:
+                return {
+                    "quantization": QUANTIZATION_NONE,
+                    "full_precision_bytes": 0,
+                    "search_bytes": 0,
+                    "disk_bytes": disk_bytes
+                }
+            
+            full_bytes = int(self._vectors.nbytes)
+            if self._codes is None:
+                return {
+                    "quantization": QUANTIZATION_NONE,
+                    "full_precision_bytes": full_bytes,
+                    "search_bytes": full_bytes,
+                    "disk_bytes": disk_bytes
+                }
+            
+            search_bytes = int(
+                self._codes.nbytes + self._norms.nbytes + sum(value.nbytes for value in self._params.values())
+            )
+            return {
+                "quantization": str(self._codes.dtype),
+                "full_precision_bytes": full_bytes,
+                "search_bytes": search_bytes,
+                "saved_ratio": round(1 - search_bytes / full_bytes, 4),
+                "disk_bytes": disk_bytes
+            }
+    
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[Dict]] = None,
+        documents: Optional[List[str]] = None
+    ) -> None:
+        metadatas = metadatas or [{} for _ in ids]
+        documents = documents or ["" for _ in ids]
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        
+        with self.lock, self._write_lock():
+            self._reload_if_changed()
+            self._cleanup()
+            self._append(vectors, list(zip(ids, documents, metadatas)))
+    
+    def add(self, ids: List[str], embeddings: List[List[float]], metadatas=None, documents=None) -> None:
+        self.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+    
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None) -> None:
+        with self.lock, self._write_lock():
+            self._reload_if_changed()
+            removed = [self._ids[row] for row in self._select(ids, where)]
+            if not removed:
+                return
+            
+            self._cleanup()
+            manifest = dict(self._manifest)
+            log = (json.dumps({"delete": removed}, ensure_ascii=False) + "\n").encode("utf-8")
+            self._append_bytes(manifest["files"]["log"], manifest["log_bytes"], log)
+            manifest["log_bytes"] += len(log)
+            self._commit(manifest)
+    
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict:
+        include = ["documents", "metadatas"] if include is None else include
+        
+        with self.lock:
+            self._reload_if_changed()
+            rows = self._select(ids, where)
+            rows = rows[offset or 0:]
+            if limit is not None:
+                rows = rows[:limit]
+            
+            return {
+                "ids": [self._ids[row] for row in rows],
+                "documents": [self._documents[row] for row in rows] if "documents" in include else None,
+                "metadatas": [self._metadatas[row] for row in rows] if "metadatas" in include else None,
+                "embeddings": (
+                    self._vectors[rows].tolist() if self._vectors is not None else []
+                ) if "embeddings" in include else None
+            }
+    
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 10,
+        where: Optional[Dict] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict:
+        """精确检索：一次矩阵乘法计算所有距离，argpartition取top-k
+        
+        量化存储时先在压缩空间中取候选，再用float32向量精确重排。
+        """
+        include = ["documents", "metadatas", "distances"] if include is None else include
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        
+        with self.lock:
+            self._reload_if_changed()
+            vectors, norms, codes, params = self._vectors, self._norms, self._codes, self._params
+            ids, documents, metadatas = self._ids, self._documents, self._metadatas
+            rows = np.asarray(self._select(where=where), dtype=np.int64) if where or self._dead_rows() else None
+        
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query in queries:
+            if vectors is None or (rows is not None and not len(rows)):
+                top = np.empty(0, dtype=np.int64)
+                distances = np.empty(0, dtype=np.float32)
+            else:
+                candidate_norms = norms if rows is None else norms[rows]
+                k = min(n_results, len(candidate_norms))
+                
+                # 平方L2距离 = |q|^2 + |x|^2 - 2 q·x
+                if codes is None:
+                    candidate_vectors = vectors if rows is None else vectors[rows]
+                    scores = candidate_norms - 2.0 * (candidate_vectors @ query) + float(query @ query)
+                    top = np.argpartition(scores, k - 1)[:k]
+                    top = top[np.argsort(scores[top])]
+                    distances = np.maximum(scores[top], 0.0)
+                    if rows is not None:
+                        top = rows[top]
+                else:
+                    scores = candidate_norms - 2.0 * approximate_dot(query, codes, params, rows)
+                    
+                    # 压缩空间中取候选，再读取候选行的原始向量精确计算距离
+                    candidates = min(k * self.rescore_factor, len(scores))
+                    shortlist = np.argpartition(scores, candidates - 1)[:candidates]
+                    if rows is not None:
+                        shortlist = rows[shortlist]
+                    shortlist = np.sort(shortlist)
+                    
+                    differences = np.asarray(vectors[shortlist]) - query
+                    exact = np.einsum("ij,ij->i", differences, differences)
+                    order = np.argsort(exact)[:k]
+                    top = shortlist[order]
+                    distances = exact[order]
+            
+            # 检索期间被同一进程删除的行跳过
+            keep = [i for i, row in enumerate(top) if ids[row] is not None]
+            top, distances = top[keep], distances[keep]
+            
+            result["ids"].append([ids[row] for row in top])
+            result["documents"].append([documents[row] for row in top] if "documents" in include else None)
+            result["metadatas"].append([metadatas[row] for row in top] if "metadatas" in include else None)
+            result["distances"].append(distances.tolist() if "distances" in include else None)
+        
+        return result
+
+class NumpyClient:
+    """NumPy向量集合的客户端，接口与chromadb.PersistentClient的常用部分一致"""
+    
+    def __init__(self, path: str, quantization: str = None, rescore_factor: int = None):
+        self.path = os.path.join(path, "numpy")
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        os.makedirs(self.path, exist_ok=True)
+    
+    def _open(self, name: str) -> NumpyCollection:
+        return NumpyCollection(
+            self._directory(name),
+            name,
+            quantization=self.quantization,
+            rescore_factor=self.rescore_factor
+        )
+    
+    def _directory(self, name: str) -> str:
+        return os.path.join(self.path, name)
+    
+    def _exists(self, name: str) -> bool:
+        return os.path.exists(os.path.join(self._directory(name), NumpyCollection.MANIFEST))
+    
+    def get_collection(self, name: str) -> NumpyCollection:
+        """集合不存在时抛出ValueError（与Chroma一致）"""
+        return self._open(name)
+    
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None) -> NumpyCollection:
+        if not self._exists(name):
+            directory = self._directory(name)
+            os.makedirs(directory, exist_ok=True)
+            _write_manifest(directory, _empty_manifest(metadata))
+        return self._open(name)
+    
+    def create_collection(self, name: str, metadata: Optional[Dict] = None) -> NumpyCollection:
+        return self.get_or_create_collection(name, metadata)
+    
+    def delete_collection(self, name: str) -> None:
+        directory = self._directory(name)
+        if not os.path.exists(directory):
+            raise ValueError(f"集合 {name} 不存在")
+        shutil.rmtree(directory)
+    
+    def list_collections(self) -> List[NumpyCollection]:
+        return [self._open(name) for name in sorted(os.listdir(self.path)) if self._exists(name)]
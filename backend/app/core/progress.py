@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, Optional, Set
+import redis.asyncio as aioredis
+from .cache_manager import cache_manager, CacheManager
+
+logger = logging.getLogger(__name__)
+
+# 进度事件频道 progress:{document_id}，最新一条事件同时保存在同名键中，供晚连接的客户端读取
+PROGRESS_PREFIX = "progress:"
+PROGRESS_TTL = int(os.getenv("PROGRESS_TTL", 3600))
+# 同一文档两次发布之间的最小间隔（秒），终态事件不受限制
+PROGRESS_MIN_INTERVAL = float(os.getenv("PROGRESS_MIN_INTERVAL", 0.5))
+
+# 文档处理结束的状态，客户端收到后关闭连接
+TERMINAL_STATUSES = ("completed", "failed")
+
+# 跨子任务共享的进度计数器，保存在 progress:{document_id}:{counter} 键中
+PROGRESS_COUNTERS = ("pages_processed", "chunks_embedded")
+
+class ProgressReporter:
+    """入库进度发布器（工作进程使用）- 发布到Redis pub/sub并保存最新快照
+    
+    Redis不可用时静默跳过，不影响入库。
+    """
+    
+    def __init__(self, document_id: str, cache: CacheManager = None, min_interval: float = None):
+        self.document_id = document_id
+        self.cache = cache or cache_manager
+        self.min_interval = PROGRESS_MIN_INTERVAL if min_interval is None else min_interval
+        self.channel = f"{PROGRESS_PREFIX}{document_id}"
+        self.start_time = time.time()
+        self.last_publish = 0.0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.cache.use_redis and self.cache.redis_client is not None
+    
+    def publish(self, stage: str, status: str = "processing", progress: Optional[int] = None, **data) -> None:
+        """发布进度事件，非终态事件按min_interval节流"""
+        if not self.enabled:
+            return
+        
+        now = time.time()
+        if status not in TERMINAL_STATUSES and now - self.last_publish < self.min_interval:
+            return
+        self.last_publish = now
+        
+        event = {
+            "document_id": self.document_id,
+            "stage": stage,
+            "status": status,
+            "progress": progress,
+            "elapsed": round(now - self.start_time, 2),
+            "timestamp": now,
+            **data
+        }
+        payload = json.dumps(event, ensure_ascii=False)
+        
+        try:
+            pipe = self.cache.redis_client.pipeline()
+            pipe.setex(self.channel, PROGRESS_TTL, payload)
+            pipe.publish(self.channel, payload)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"发布入库进度失败: {e}")
+    
+    def increment(self, counter: str, amount: int) -> int:
+        """累加跨子任务共享的计数器（如分片入库已完成的页数），返回累加后的值"""
+        if not self.enabled:
+            return amount
+        
+        key = f"{self.channel}:{counter}"
+        try:
+            pipe = self.cache.redis_client.pipeline()
+            pipe.incrby(key, amount)
+            pipe.expire(key, PROGRESS_TTL)
+            return int(pipe.execute()[0])
+        except Exception as e:
+            logger.error(f"更新入库进度计数失败: {e}")
+            return amount
+    
+    def reset(self) -> None:
+        """清除上一次入库留下的计数器和快照（重新入库时调用）"""
+        if not self.enabled:
+            return
+        
+        try:
+            keys = [f"{self.channel}:{counter}" for counter in PROGRESS_COUNTERS]
+            self.cache.redis_client.delete(self.channel, *keys)
+        except Exception as e:
+            logger.error(f"清除入库进度失败: {e}")
+
+class ProgressBroker:
+    """进度事件分发（API进程使用）- 整个进程共用一个Redis模式订阅，按文档分发给各SSE连接"""
+    
+    def __init__(self, redis_url: str = None, queue_size: int = 100):
+        self.redis_url = redis_url or os.getenv("REDIS_URL")
+        self.queue_size = queue_size
+        self.client = None
+        self.listener = None
+        self.lock = asyncio.Lock()
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+    
+    @property
+    def available(self) -> bool:
+        return bool(self.redis_url) and cache_manager.use_redis and cache_manager.redis_client is not None
+    
+    async def _ensure_listener(self) -> None:
+        async with self.lock:
+            if self.listener is not None and not self.listener.done():
+                return
+            
+            if self.client is None:
+                self.client = aioredis.from_url(self.redis_url, decode_responses=True)
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            await pubsub.psubscribe(f"{PROGRESS_PREFIX}*")
+            self.listener = asyncio.create_task(self._listen(pubsub))
+    
+    async def _listen(self, pubsub) -> None:
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                
+                document_id = message["channel"][len(PROGRESS_PREFIX):]
+                queues = self.subscribers.get(document_id)
+                if not queues:
+                    continue
+                
+                event = json.loads(message["data"])
+                for queue in list(queues):
+                    # 客户端消费过慢时丢弃最旧的事件，只保证最新进度送达
+                    if queue.full():
+                        queue.get_nowait()
+                    queue.put_nowait(event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 下一个订阅者连接时重新建立监听
+            logger.error(f"进度订阅中断: {e}")
+        finally:
+            await pubsub.reset()
+    
+    async def events(self, document_id: str, heartbeat: float = 15) -> AsyncIterator[Optional[Dict]]:
+        """订阅文档的进度事件：先返回最新快照，之后逐条返回新事件，超时无事件时返回None作为心跳"""
+        await self._ensure_listener()
+        
+        # 先注册再读快照，避免两者之间发布的事件丢失
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.setdefault(document_id, set()).add(queue)
+        
+        try:
+            snapshot = await self.client.get(f"{PROGRESS_PREFIX}{document_id}")
+            if snapshot:
+                event = json.loads(snapshot)
+                yield event
+                if event["status"] in TERMINAL_STATUSES:
+                    return
+            
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                
+                yield event
+                if event["status"] in TERMINAL_STATUSES:
+                    return
+        
+        finally:
+            queues = self.subscribers.get(document_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self.subscribers[document_id]
+    
+    async def close(self) -> None:
+        """停止监听并关闭连接"""
+        if self.listener is not None:
+            self.listener.cancel()
+        if self.client is not None:
+            await self.client.close()
+
+# 全局进度分发实例（API进程）
+progress_broker = ProgressBroker()
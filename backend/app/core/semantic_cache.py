@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import uuid
+import threading
+import logging
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+from .cache_manager import cache_manager, CacheManager
+
+logger = logging.getLogger(__name__)
+
+class SemanticAnswerCache:
+    """语义答案缓存 - 按文档保存问题向量及最终回答，相似问题直接复用回答
+    
+    条目保存在进程内。每个文档在CacheManager中有一个带 doc:{document_id} 标签的版本标记，
+    文档删除或重新入库时标签失效，标记消失，各节点的本地条目随之作废。
+    """
+    
+    def __init__(
+        self,
+        threshold: float = None,
+        ttl: int = None,
+        max_entries: int = None,
+        max_documents: int = None,
+        cache: CacheManager = None
+    ):
+        self.threshold = threshold or float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95))
+        self.ttl = ttl or int(os.getenv("SEMANTIC_CACHE_TTL", 3600))
+        self.max_entries = max_entries or int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 200))
+        self.max_documents = max_documents or int(os.getenv("SEMANTIC_CACHE_MAX_DOCUMENTS", 1000))
+        self.cache = cache or cache_manager
+        self.lock = threading.Lock()
+        
+        # document_id -> {"version": 版本标记, "entries": [(范围, 单位向量, 过期时间, 结果)]}
+        self.documents = OrderedDict()
+        
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+    
+    @staticmethod
+    def scope_key(max_results: int, where: Optional[Dict] = None) -> str:
+        """检索范围（k和过滤条件）不同的问题不能互相复用回答"""
+        return json.dumps({"k": max_results, "where": where}, sort_keys=True, ensure_ascii=False)
+    
+    def _marker_key(self, document_id: str) -> str:
+        return f"semantic:{document_id}"
+    
+    def _version(self, document_id: str) -> str:
+        """读取文档的版本标记，不存在时创建
+        
+        已存在的标记不再重写，避免在失效之后把旧版本写回。
+        """
+        version = self.cache.get(self._marker_key(document_id))
+        if version is None:
+            version = uuid.uuid4().hex
+            self.cache.set(
+                self._marker_key(document_id),
+                version,
+                expire=self.ttl,
+                tags=[self.cache.document_tag(document_id)]
+            )
+        return version
+    
+    def lookup(self, document_id: str, scope: str, embedding: List[float]) -> Tuple[Optional[Dict], str]:
+        """查找相似问题的缓存回答
+        
+        返回 (缓存回答或None, 版本标记)。未命中时需把版本标记原样传给store，
+        期间文档失效的话回答不会被缓存。
+        """
+        version = self._version(document_id)
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        now = time.time()
+        
+        with self.lock:
+            bucket = self.documents.get(document_id)
+            if bucket is None or bucket["version"] != version:
+                self.documents.pop(document_id, None)
+                self.misses += 1
+                return None, version
+            
+            bucket["entries"] = [entry for entry in bucket["entries"] if entry[2] > now]
+            candidates = [entry for entry in bucket["entries"] if entry[0] == scope]
+            if not candidates:
+                self.misses += 1
+                return None, version
+            
+            similarities = np.stack([entry[1] for entry in candidates]) @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None, version
+            
+            self.documents.move_to_end(document_id)
+            self.hits += 1
+            result = candidates[best][3]
+        
+        logger.info(f"命中语义答案缓存: {document_id}，相似度 {similarities[best]:.3f}")
+        return {**result, "sources": list(result["sources"]), "semantic_cache_hit": True}, version
+    
+    def store(self, document_id: str, scope: str, embedding: List[float], result: Dict, version: str) -> None:
+        """保存问题向量和回答；version为lookup时的版本标记，标记已变化或消失时丢弃"""
+        if self.cache.get(self._marker_key(document_id)) != version:
+            logger.info(f"文档 {document_id} 在生成回答期间已失效，跳过语义缓存")
+            return
+        
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        
+        with self.lock:
+            bucket = self.documents.get(document_id)
+            if bucket is None or bucket["version"] != version:
+                bucket = {"version": version, "entries": []}
+                self.documents[document_id] = bucket
+            
+            bucket["entries"].append((scope, vector, time.time() + self.ttl, result))
+            del bucket["entries"][:-self.max_entries]
+            self.documents.move_to_end(document_id)
+            self.stores += 1
+            
+            while len(self.documents) > self.max_documents:
+                self.documents.popitem(last=False)
+    
+    def stats(self) -> Dict:
+        """缓存统计信息"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "documents": len(self.documents),
+                "entries": sum(len(bucket["entries"]) for bucket in self.documents.values()),
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+# 全局语义答案缓存实例
+semantic_cache = SemanticAnswerCache()
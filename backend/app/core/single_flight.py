@@ -0,0 +1,167 @@
+import os
+import json
+import uuid
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict
+from .cache_manager import cache_manager, CacheManager
+
+logger = logging.getLogger(__name__)
+
+# 仅当锁仍归自己持有时才释放，避免误删其他节点在锁过期后获得的锁
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+class SingleFlight:
+    """请求合并 - 相同键的并发请求只执行一次，其余请求等待并共享结果
+    
+    进程内用asyncio任务合并；启用Redis锁后，多个API副本之间也只有持锁者执行，
+    其他副本轮询等待持锁者写入的结果（等待超时或持锁者失败时自行执行）。
+    """
+    
+    def __init__(
+        self,
+        cache: CacheManager = None,
+        use_redis: bool = None,
+        lock_ttl: int = None,
+        result_ttl: int = None,
+        wait_timeout: float = None,
+        poll_interval: float = 0.2
+    ):
+        self.cache = cache or cache_manager
+        if use_redis is None:
+            use_redis = os.getenv("SINGLE_FLIGHT_REDIS", "false").lower() == "true"
+        self.use_redis = use_redis
+        self.lock_ttl = lock_ttl or int(os.getenv("SINGLE_FLIGHT_LOCK_TTL", 120))
+        self.result_ttl = result_ttl or int(os.getenv("SINGLE_FLIGHT_RESULT_TTL", 10))
+        self.wait_timeout = wait_timeout or float(os.getenv("SINGLE_FLIGHT_WAIT_TIMEOUT", 120))
+        self.poll_interval = poll_interval
+        
+        # 键 -> 正在执行的任务
+        self.inflight: Dict[str, asyncio.Task] = {}
+        
+        self.executions = 0
+        self.coalesced = 0
+        self.remote_hits = 0
+    
+    @staticmethod
+    def key(*parts: Any) -> str:
+        """由各组成部分生成合并键"""
+        data = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.md5(data.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """归一化问题文本：忽略大小写、多余空白和结尾标点"""
+        return " ".join(question.lower().split()).rstrip("?？.。!！ ")
+    
+    def _redis_enabled(self) -> bool:
+        return self.use_redis and self.cache.use_redis and self.cache.redis_client is not None
+    
+    async def run(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Any]],
+        shareable: Callable[[Any], bool] = None
+    ) -> Any:
+        """执行func，相同key的并发调用共享同一次执行的结果
+        
+        shareable判断结果能否通过Redis共享给其他副本（失败结果不共享）。
+        共享结果只保留result_ttl秒，仅用于合并同一时段的请求，不作为缓存。
+        """
+        task = self.inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            # 独立任务执行，发起者断开连接不会取消其他等待者的计算
+            task = asyncio.ensure_future(self._execute(key, func, shareable))
+            task.add_done_callback(lambda finished: self._finish(key, finished))
+            self.inflight[key] = task
+        
+        return await asyncio.shield(task)
+    
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        # 所有等待者都已取消时也要取走异常，避免"exception was never retrieved"日志
+        if not task.cancelled():
+            task.exception()
+    
+    async def _execute(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Any]],
+        shareable: Callable[[Any], bool] = None
+    ) -> Any:
+        if not self._redis_enabled():
+            self.executions += 1
+            return await func()
+        
+        loop = asyncio.get_running_loop()
+        redis_client = self.cache.redis_client
+        lock_key = f"flight:lock:{key}"
+        result_key = f"flight:result:{key}"
+        token = uuid.uuid4().hex
+        acquired = False
+        deadline = loop.time() + self.wait_timeout
+        
+        try:
+            while True:
+                # 先查结果：持锁者可能刚写入结果并释放了锁
+                raw = await loop.run_in_executor(None, redis_client.get, result_key)
+                if raw:
+                    self.remote_hits += 1
+                    return json.loads(raw)
+                
+                acquired = await loop.run_in_executor(
+                    None,
+                    lambda: redis_client.set(lock_key, token, nx=True, px=self.lock_ttl * 1000)
+                )
+                if acquired or loop.time() >= deadline:
+                    break
+                
+                await asyncio.sleep(self.poll_interval)
+        except Exception as e:
+            # Redis不可用时退化为仅进程内合并
+            logger.error(f"请求合并Redis锁失败: {e}")
+        
+        try:
+            self.executions += 1
+            result = await func()
+            
+            if acquired and (shareable is None or shareable(result)):
+                try:
+                    await loop.run_in_executor(
+                        None, redis_client.setex, result_key, self.result_ttl,
+                        json.dumps(result, ensure_ascii=False)
+                    )
+                except Exception as e:
+                    logger.error(f"共享请求合并结果失败: {e}")
+            return result
+        
+        finally:
+            if acquired:
+                try:
+                    await loop.run_in_executor(
+                        None, redis_client.eval, _RELEASE_SCRIPT, 1, lock_key, token
+                    )
+                except Exception as e:
+                    logger.error(f"释放请求合并锁失败: {e}")
+    
+    def stats(self) -> Dict:
+        """合并统计信息"""
+        return {
+            "redis": self._redis_enabled(),
+            "inflight": len(self.inflight),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "remote_hits": self.remote_hits
+        }
+
+# 全局请求合并实例
+single_flight = SingleFlight()
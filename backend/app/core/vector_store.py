@@ -1,13 +1,56 @@
 import os
+import asyncio
+import hashlib
+import threading
 import chromadb
 from chromadb.config import Settings
-from langchain.vectorstores import Chroma
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 import logging
 from .model_factory import ModelFactory
+from .numpy_store import NumpyClient
 
 logger = logging.getLogger(__name__)
 
+# 异步接口中执行阻塞向量库调用的有界线程池
+_vector_store_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("VECTOR_STORE_EXECUTOR_WORKERS", 8)),
+    thread_name_prefix="vector-store"
+)
+
+# 文本块的位置元数据，可作为检索时的过滤条件
+CHUNK_LOCATION_FIELDS = ("page_start", "page_end", "section", "chapter")
+
+# 存储布局：每个文档一个集合，或所有文档共享（按哈希分片的）少量集合
+LAYOUT_PER_DOCUMENT = "per_document"
+LAYOUT_SHARED = "shared"
+SHARED_COLLECTION_PREFIX = "chunks_"
+
+# 存储后端：Chroma（HNSW近似检索），或NumPy（内存映射矩阵上的精确暴力检索，适合中小文档）
+BACKEND_CHROMA = "chroma"
+BACKEND_NUMPY = "numpy"
+
+def shared_collection_name(document_id: str, shards: int) -> str:
+    """共享布局下文档所在的分片集合名称"""
+    shard = int(hashlib.md5(document_id.encode()).hexdigest()[:8], 16) % max(shards, 1)
+    return f"{SHARED_COLLECTION_PREFIX}{shard:03d}"
+
+def merge_where(*conditions: Optional[Dict]) -> Optional[Dict]:
+    """用$and合并多个过滤条件，忽略空条件"""
+    merged = []
+    for condition in conditions:
+        if not condition:
+            continue
+        if list(condition.keys()) == ["$and"]:
+            merged.extend(condition["$and"])
+        else:
+            merged.append(condition)
+    
+    if not merged:
+        return None
+    return merged[0] if len(merged) == 1 else {"$and": merged}
+
 class VectorStoreManager:
     """向量存储管理器 - 支持多种嵌入模型"""
     
@@ -15,10 +58,19 @@ class VectorStoreManager:
         self, 
         persist_directory: str = "./vector_db",
         embedding_type: str = None,
-        embedding_config: dict = None
+        embedding_config: dict = None,
+        layout: str = None,
+        shards: int = None,
+        backend: str = None
     ):
         self.persist_directory = persist_directory
         
+        # 存储布局，shared布局下所有检索都按document_id过滤
+        self.layout = (layout or os.getenv("VECTOR_STORE_LAYOUT", LAYOUT_PER_DOCUMENT)).lower()
+        self.shards = shards or int(os.getenv("VECTOR_STORE_SHARDS", 1))
+        if self.layout not in (LAYOUT_PER_DOCUMENT, LAYOUT_SHARED):
+            raise ValueError(f"不支持的向量存储布局: {self.layout}")
+        
         # 使用模型工厂创建嵌入模型
         self.embeddings = ModelFactory.create_embeddings(
             model_type=embedding_type,
@@ -28,37 +80,132 @@ class VectorStoreManager:
         # 确保目录存在
         os.makedirs(persist_directory, exist_ok=True)
         
-        # 初始化ChromaDB客户端
-        self.client = chromadb.PersistentClient(path=persist_directory)
+        # 初始化向量库客户端，NumPy后端提供与Chroma一致的集合接口
+        self.backend = (backend or os.getenv("VECTOR_STORE_BACKEND", BACKEND_CHROMA)).lower()
+        if self.backend == BACKEND_NUMPY:
+            # VECTOR_STORE_QUANTIZATION可选float16/int8压缩存储
+            self.client = NumpyClient(path=persist_directory)
+        elif self.backend == BACKEND_CHROMA:
+            self.client = chromadb.PersistentClient(path=persist_directory)
+        else:
+            raise ValueError(f"不支持的向量存储后端: {self.backend}")
+        
+        # 集合句柄的LRU缓存，避免每次请求都遍历list_collections()
+        self._collection_cache = OrderedDict()
+        self._collection_cache_size = int(os.getenv("COLLECTION_CACHE_SIZE", 256))
+        self._collection_lock = threading.Lock()
+    
+    @staticmethod
+    def build_where(
+        page_start: Optional[int] = None,
+        page_end: Optional[int] = None,
+        chapter: Optional[int] = None,
+        section: Optional[str] = None
+    ) -> Optional[Dict]:
+        """根据页码范围和章节构建Chroma元数据过滤条件"""
+        conditions = []
+        
+        # 块的页码区间与查询区间有交集即可
+        if page_start is not None:
+            conditions.append({"page_end": {"$gte": page_start}})
+        if page_end is not None:
+            conditions.append({"page_start": {"$lte": page_end}})
+        if chapter is not None:
+            conditions.append({"chapter": chapter})
+        if section:
+            conditions.append({"section": section})
+        
+        return merge_where(*conditions)
+        
+    def _collection_name(self, document_id: str) -> str:
+        """文档对应的集合名称"""
+        if self.layout == LAYOUT_SHARED:
+            return shared_collection_name(document_id, self.shards)
+        return f"doc_{document_id}"
+    
+    def _scope_where(self, document_id: str, where: Optional[Dict] = None) -> Optional[Dict]:
+        """共享布局下为过滤条件加上document_id分区"""
+        if self.layout == LAYOUT_SHARED:
+            return merge_where({"document_id": document_id}, where)
+        return where
+    
+    def _chunk_ids(self, document_id: str, chunks: List[Dict]) -> List[str]:
+        """向量库中的记录ID，共享布局下加上文档ID前缀以保证全局唯一"""
+        if self.layout == LAYOUT_SHARED:
+            return [f"{document_id}:{chunk['chunk_id']}" for chunk in chunks]
+        return [chunk["chunk_id"] for chunk in chunks]
+    
+    def _remember_collection(self, collection_name: str, collection) -> None:
+        """记录集合句柄，超出容量时淘汰最久未使用的句柄"""
+        with self._collection_lock:
+            self._collection_cache[collection_name] = collection
+            self._collection_cache.move_to_end(collection_name)
+            while len(self._collection_cache) > self._collection_cache_size:
+                self._collection_cache.popitem(last=False)
+    
+    def _forget_collection(self, collection_name: str) -> None:
+        """移除集合句柄（集合被删除或句柄失效时调用）"""
+        with self._collection_lock:
+            self._collection_cache.pop(collection_name, None)
+    
+    def _get_collection(self, collection_name: str):
+        """获取集合句柄，不存在时返回None
+        
+        优先命中进程内LRU缓存；未命中时按名称直接获取，不再遍历list_collections()。
+        """
+        with self._collection_lock:
+            collection = self._collection_cache.get(collection_name)
+            if collection is not None:
+                self._collection_cache.move_to_end(collection_name)
+                return collection
+        
+        try:
+            collection = self.client.get_collection(name=collection_name)
+        except ValueError:
+            # Chroma在集合不存在时抛出ValueError
+            return None
         
+        self._remember_collection(collection_name, collection)
+        return collection
+    
     def create_document_collection(self, document_id: str) -> bool:
         """为文档创建向量集合"""
         try:
-            collection_name = f"doc_{document_id}"
+            collection_name = self._collection_name(document_id)
             
-            # 检查集合是否已存在
-            existing_collections = [col.name for col in self.client.list_collections()]
-            if collection_name in existing_collections:
-                logger.info(f"集合 {collection_name} 已存在")
-                return True
+            # 已存在时直接返回已有集合
+            if self.layout == LAYOUT_SHARED:
+                metadata = {"layout": LAYOUT_SHARED}
+            else:
+                metadata = {"document_id": document_id}
             
-            # 创建新集合
-            self.client.create_collection(
+            collection = self.client.get_or_create_collection(
                 name=collection_name,
-                metadata={"document_id": document_id}
+                metadata=metadata
             )
+            self._remember_collection(collection_name, collection)
             
-            logger.info(f"成功创建集合: {collection_name}")
+            logger.info(f"向量集合已就绪: {collection_name}")
             return True
             
         except Exception as e:
             logger.error(f"创建向量集合失败: {str(e)}")
             return False
     
-    def add_document_chunks(self, document_id: str, chunks: List[Dict]) -> bool:
-        """将文档块添加到向量存储"""
+    def add_document_chunks(
+        self, 
+        document_id: str, 
+        chunks: List[Dict], 
+        embeddings: Optional[List[List[float]]] = None
+    ) -> bool:
+        """将文档块添加到向量存储，embeddings为空时自动计算"""
         try:
-            collection_name = f"doc_{document_id}"
+            collection_name = self._collection_name(document_id)
+            collection = self._get_collection(collection_name)
+            if collection is None:
+                if not self.create_document_collection(document_id):
+                    return False
+                collection = self._get_collection(collection_name)
             
             # 准备数据
             texts = [chunk["content"] for chunk in chunks]
@@ -67,24 +214,27 @@ class VectorStoreManager:
                     "chunk_id": chunk["chunk_id"],
                     "chunk_index": chunk["chunk_index"],
                     "document_id": document_id,
-                    "chunk_length": chunk["chunk_length"]
+                    "chunk_length": chunk["chunk_length"],
+                    # 页码和章节信息（旧版分块结果可能没有）
+                    **{
+                        key: chunk[key]
+                        for key in CHUNK_LOCATION_FIELDS
+                        if chunk.get(key) is not None
+                    }
                 }
                 for chunk in chunks
             ]
-            ids = [chunk["chunk_id"] for chunk in chunks]
+            ids = self._chunk_ids(document_id, chunks)
             
-            # 创建LangChain向量存储
-            vector_store = Chroma(
-                collection_name=collection_name,
-                embedding_function=self.embeddings,
-                client=self.client
-            )
+            if embeddings is None:
+                embeddings = self.embeddings.embed_documents(texts)
             
-            # 添加文档
-            vector_store.add_texts(
-                texts=texts,
+            # 按ID写入，重复执行时覆盖已有数据
+            collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
                 metadatas=metadatas,
-                ids=ids
+                documents=texts
             )
             
             logger.info(f"成功添加 {len(chunks)} 个文档块到向量存储")
@@ -92,67 +242,198 @@ class VectorStoreManager:
             
         except Exception as e:
             logger.error(f"添加文档块到向量存储失败: {str(e)}")
+            self._forget_collection(self._collection_name(document_id))
             return False
     
     def search_similar_chunks(
         self, 
         document_id: str, 
         query: str, 
-        k: int = 5
+        k: int = 5,
+        where: Optional[Dict] = None
     ) -> List[Dict]:
-        """搜索相似的文档块"""
+        """搜索相似的文档块，where为元数据过滤条件（见build_where）"""
         try:
-            collection_name = f"doc_{document_id}"
+            query_embedding = self.embeddings.embed_query(query)
+            return self.search_by_vector(document_id, query_embedding, k, where)
+            
+        except Exception as e:
+            logger.error(f"向量搜索失败: {str(e)}")
+            return []
+    
+    def search_by_vector(
+        self, 
+        document_id: str, 
+        query_embedding: List[float], 
+        k: int = 5,
+        where: Optional[Dict] = None
+    ) -> List[Dict]:
+        """使用已计算好的查询向量搜索相似的文档块"""
+        try:
+            collection_name = self._collection_name(document_id)
             
             # 检查集合是否存在
-            existing_collections = [col.name for col in self.client.list_collections()]
-            if collection_name not in existing_collections:
+            collection = self._get_collection(collection_name)
+            if collection is None:
                 logger.warning(f"集合 {collection_name} 不存在")
                 return []
             
-            # 创建向量存储实例
-            vector_store = Chroma(
-                collection_name=collection_name,
-                embedding_function=self.embeddings,
-                client=self.client
-            )
-            
             # 执行相似性搜索
-            results = vector_store.similarity_search_with_score(
-                query=query,
-                k=k
+            results = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=k,
+                where=self._scope_where(document_id, where),
+                include=["documents", "metadatas", "distances"]
             )
             
-            # 格式化结果
-            formatted_results = []
-            for doc, score in results:
-                formatted_results.append({
-                    "content": doc.page_content,
-                    "metadata": doc.metadata,
-                    "similarity_score": float(score),
-                    "chunk_id": doc.metadata.get("chunk_id", ""),
-                    "chunk_index": doc.metadata.get("chunk_index", 0)
-                })
+            return self._format_results(results)
+        
+        except Exception as e:
+            logger.error(f"向量搜索失败: {str(e)}")
+            # 句柄可能已失效（例如集合被其他进程删除重建），下次重新获取
+            self._forget_collection(self._collection_name(document_id))
+            return []
+    
+    @staticmethod
+    def _format_results(results: Dict) -> List[Dict]:
+        """将Chroma查询结果格式化为检索结果列表"""
+        formatted_results = []
+        for content, metadata, distance in zip(
+            results["documents"][0], results["metadatas"][0], results["distances"][0]
+        ):
+            metadata = metadata or {}
+            formatted_results.append({
+                "content": content,
+                "metadata": metadata,
+                "similarity_score": float(distance),
+                "chunk_id": metadata.get("chunk_id", ""),
+                "chunk_index": metadata.get("chunk_index", 0)
+            })
+        
+        return formatted_results
+    
+    async def run_blocking(self, func, *args):
+        """在有界线程池中执行阻塞的向量库调用，避免阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_vector_store_executor, func, *args)
+    
+    async def asearch_similar_chunks(
+        self, 
+        document_id: str, 
+        query: str, 
+        k: int = 5,
+        where: Optional[Dict] = None
+    ) -> List[Dict]:
+        """异步搜索相似的文档块：异步计算查询向量，Chroma查询放入线程池"""
+        try:
+            query_embedding = await self.embeddings.aembed_query(query)
+            return await self.run_blocking(self.search_by_vector, document_id, query_embedding, k, where)
+            
+        except Exception as e:
+            logger.error(f"异步向量搜索失败: {str(e)}")
+            return []
+    
+    def search_collection_by_vector(
+        self,
+        collection_name: str,
+        document_ids: List[str],
+        query_embedding: List[float],
+        k: int = 5,
+        where: Optional[Dict] = None
+    ) -> List[Dict]:
+        """在一个共享集合中一次检索多个文档（按document_id的$in过滤）"""
+        try:
+            collection = self._get_collection(collection_name)
+            if collection is None:
+                logger.warning(f"集合 {collection_name} 不存在")
+                return []
             
-            return formatted_results
+            results = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=k,
+                where=merge_where({"document_id": {"$in": document_ids}}, where),
+                include=["documents", "metadatas", "distances"]
+            )
             
+            return self._format_results(results)
+        
         except Exception as e:
-            logger.error(f"向量搜索失败: {str(e)}")
+            logger.error(f"多文档向量搜索失败: {str(e)}")
+            self._forget_collection(collection_name)
             return []
     
+    async def asearch_documents_by_vector(
+        self,
+        document_ids: List[str],
+        query_embedding: List[float],
+        k: int = 5,
+        where: Optional[Dict] = None,
+        max_concurrency: int = None
+    ) -> List[Dict]:
+        """使用同一个查询向量并行检索多个文档，合并后返回全局top-k
+        
+        所有文档使用同一嵌入模型和距离度量，距离可以直接比较（越小越相似）。
+        每条结果带有document_id。共享布局下同一分片内的文档合并为一次查询。
+        """
+        if not document_ids:
+            return []
+        
+        max_concurrency = max_concurrency or int(os.getenv("MULTI_QUERY_CONCURRENCY", 16))
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        # 按集合分组：每文档布局下每组一个文档，共享布局下每组一个分片
+        groups = OrderedDict()
+        for document_id in dict.fromkeys(document_ids):
+            groups.setdefault(self._collection_name(document_id), []).append(document_id)
+        
+        async def search_group(collection_name: str, group: List[str]) -> List[Dict]:
+            async with semaphore:
+                if len(group) == 1:
+                    results = await self.run_blocking(
+                        self.search_by_vector, group[0], query_embedding, k, where
+                    )
+                    for result in results:
+                        result["metadata"].setdefault("document_id", group[0])
+                    return results
+                
+                return await self.run_blocking(
+                    self.search_collection_by_vector, collection_name, group, query_embedding, k, where
+                )
+        
+        grouped_results = await asyncio.gather(*[
+            search_group(collection_name, group) for collection_name, group in groups.items()
+        ])
+        
+        merged = []
+        for results in grouped_results:
+            for result in results:
+                result["document_id"] = result["metadata"].get("document_id")
+                merged.append(result)
+        
+        merged.sort(key=lambda result: result["similarity_score"])
+        return merged[:k]
+    
     def delete_document_collection(self, document_id: str) -> bool:
         """删除文档的向量集合"""
         try:
-            collection_name = f"doc_{document_id}"
+            collection_name = self._collection_name(document_id)
             
-            # 检查集合是否存在
-            existing_collections = [col.name for col in self.client.list_collections()]
-            if collection_name not in existing_collections:
+            if self.layout == LAYOUT_SHARED:
+                # 共享集合只删除该文档的记录
+                collection = self._get_collection(collection_name)
+                if collection is not None:
+                    collection.delete(where={"document_id": document_id})
+                logger.info(f"成功删除文档 {document_id} 在 {collection_name} 中的向量")
+                return True
+            
+            self._forget_collection(collection_name)
+            
+            try:
+                self.client.delete_collection(name=collection_name)
+            except ValueError:
                 logger.info(f"集合 {collection_name} 不存在，无需删除")
                 return True
             
-            # 删除集合
-            self.client.delete_collection(name=collection_name)
             logger.info(f"成功删除集合: {collection_name}")
             return True
             
@@ -160,18 +441,54 @@ class VectorStoreManager:
             logger.error(f"删除向量集合失败: {str(e)}")
             return False
     
+    def get_document_chunks(self, document_id: str) -> List[Dict]:
+        """按chunk_index顺序读取文档的全部文本块（用于全文摘要、重建索引等）"""
+        collection = self._get_collection(self._collection_name(document_id))
+        if collection is None:
+            return []
+        
+        all_docs = collection.get(
+            where=self._scope_where(document_id),
+            include=["documents", "metadatas"]
+        )
+        
+        chunks = [
+            {
+                "content": content,
+                "metadata": metadata,
+                "chunk_id": metadata.get("chunk_id", ""),
+                "chunk_index": metadata.get("chunk_index", 0)
+            }
+            for content, metadata in zip(all_docs['documents'], all_docs['metadatas'])
+        ]
+        chunks.sort(key=lambda chunk: chunk["chunk_index"])
+        return chunks
+    
     def get_collection_stats(self, document_id: str) -> Dict:
         """获取集合统计信息"""
         try:
-            collection_name = f"doc_{document_id}"
-            collection = self.client.get_collection(name=collection_name)
+            collection_name = self._collection_name(document_id)
+            collection = self._get_collection(collection_name)
+            if collection is None:
+                return {}
+            
+            if self.layout == LAYOUT_SHARED:
+                document_count = len(collection.get(where=self._scope_where(document_id), include=[])["ids"])
+            else:
+                document_count = collection.count()
             
-            return {
+            stats = {
                 "collection_name": collection_name,
-                "document_count": collection.count(),
+                "document_count": document_count,
                 "metadata": collection.metadata
             }
             
+            # NumPy后端报告量化存储节省的空间
+            if hasattr(collection, "storage_stats"):
+                stats["storage"] = collection.storage_stats()
+            
+            return stats
+            
         except Exception as e:
             logger.error(f"获取集合统计信息失败: {str(e)}")
-            return {} 
\ No newline at end of file
+            return {}
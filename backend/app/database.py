@@ -1,12 +1,15 @@
-from sqlalchemy import create_engine, Column, String, Integer, DateTime, Text, Float
+from sqlalchemy import create_engine, inspect, text, Column, String, Integer, DateTime, Text, Float
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql import func
 import os
+import logging
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # 使用SQLite作为默认数据库（避免PostgreSQL依赖问题）
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./document_analysis.db")
 
@@ -25,6 +28,19 @@ class Document(Base):
     upload_time = Column(DateTime(timezone=True), server_default=func.now())
     status = Column(String, default="pending")
     chunk_count = Column(Integer, default=0)
+    # 文件内容SHA-256，用于上传去重
+    content_hash = Column(String, index=True)
+    # 向量数据所属文档ID，重复上传的文档共享原始文档的向量集合
+    vector_document_id = Column(String, index=True)
+    # 上传租户（X-Tenant-ID），用于准入控制和公平调度
+    tenant_id = Column(String, index=True, default="default")
+    # 处理通道：interactive（小文档）或 bulk（大文档）
+    lane = Column(String, default="bulk")
+    
+    @property
+    def vector_id(self) -> str:
+        """实际存放向量数据的文档ID"""
+        return self.vector_document_id or self.id
 
 class QueryHistory(Base):
     __tablename__ = "query_history"
@@ -44,5 +60,41 @@ def get_db():
     finally:
         db.close()
 
+# create_all不会修改已存在的表，旧数据库启动时补齐后续版本新增的列和索引
+# 表名 -> [(列名, 列定义)]，列定义中的DEFAULT会回填已有记录
+ADDED_COLUMNS = {
+    "documents": [
+        ("content_hash", "VARCHAR"),
+        ("vector_document_id", "VARCHAR"),
+        ("tenant_id", "VARCHAR DEFAULT 'default'"),
+        ("lane", "VARCHAR DEFAULT 'bulk'"),
+    ],
+}
+# (索引名, 表名, 列名)，与index=True生成的索引同名
+ADDED_INDEXES = [
+    ("ix_documents_content_hash", "documents", "content_hash"),
+    ("ix_documents_vector_document_id", "documents", "vector_document_id"),
+    ("ix_documents_tenant_id", "documents", "tenant_id"),
+]
+
+def migrate_schema():
+    """为已存在的表补齐新增列和索引（ALTER TABLE ... ADD COLUMN）"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, columns in ADDED_COLUMNS.items():
+            if not inspector.has_table(table):
+                continue
+            
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for name, definition in columns:
+                if name in existing:
+                    continue
+                logger.info(f"数据库迁移: {table} 新增列 {name}")
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {definition}"))
+        
+        for index, table, column in ADDED_INDEXES:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({column})"))
+
 def create_tables():
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    migrate_schema()
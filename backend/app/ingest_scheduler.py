@@ -0,0 +1,170 @@
+import os
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .database import Document
+from .core.cache_manager import cache_manager
+
+logger = logging.getLogger(__name__)
+
+# 优先级通道：小文档走interactive队列（由专用工作进程消费），大文档走bulk队列
+LANE_INTERACTIVE = "interactive"
+LANE_BULK = "bulk"
+LANE_QUEUES = {
+    LANE_INTERACTIVE: "document_interactive",
+    LANE_BULK: "document_processing",
+}
+
+# 同时满足页数和大小上限的文档进入interactive通道
+INTERACTIVE_MAX_PAGES = int(os.getenv("INTERACTIVE_MAX_PAGES", 30))
+INTERACTIVE_MAX_BYTES = int(os.getenv("INTERACTIVE_MAX_BYTES", 5 * 1024 * 1024))
+
+# 准入控制：bulk通道的全局积压页数上限，以及每个租户（所有通道）的积压页数上限
+INGEST_MAX_BACKLOG_PAGES = int(os.getenv("INGEST_MAX_BACKLOG_PAGES", 20000))
+INGEST_TENANT_MAX_BACKLOG_PAGES = int(os.getenv("INGEST_TENANT_MAX_BACKLOG_PAGES", 5000))
+# 超出上限时的处理方式：defer（排队，资源空闲时自动提交）或 reject（返回429）
+INGEST_ADMISSION_MODE = os.getenv("INGEST_ADMISSION_MODE", "defer").lower()
+# 估算积压处理时间（用于Retry-After）
+INGEST_SECONDS_PER_PAGE = float(os.getenv("INGEST_SECONDS_PER_PAGE", 0.5))
+
+# 同一租户准入判断的锁：最长持有时间和最长等待时间（秒）
+INGEST_ADMISSION_LOCK_TIMEOUT = int(os.getenv("INGEST_ADMISSION_LOCK_TIMEOUT", 30))
+INGEST_ADMISSION_LOCK_WAIT = int(os.getenv("INGEST_ADMISSION_LOCK_WAIT", 10))
+
+DEFAULT_TENANT = "default"
+
+# 已提交、尚未处理完成的文档状态
+ACTIVE_STATUSES = ("pending", "processing")
+DEFERRED_STATUS = "deferred"
+
+def classify_lane(pages: int, file_size: int) -> str:
+    """按页数和文件大小选择优先级通道"""
+    if pages <= INTERACTIVE_MAX_PAGES and file_size <= INTERACTIVE_MAX_BYTES:
+        return LANE_INTERACTIVE
+    return LANE_BULK
+
+def backlog_pages(db: Session, lane: Optional[str] = None, tenant_id: Optional[str] = None) -> int:
+    """已提交、尚未完成的文档总页数"""
+    query = db.query(func.coalesce(func.sum(Document.pages), 0)).filter(
+        Document.status.in_(ACTIVE_STATUSES)
+    )
+    if lane is not None:
+        query = query.filter(Document.lane == lane)
+    if tenant_id is not None:
+        query = query.filter(Document.tenant_id == tenant_id)
+    return int(query.scalar())
+
+_local_admission_locks: Dict[str, threading.Lock] = {}
+_local_admission_locks_guard = threading.Lock()
+
+@contextmanager
+def admission_lock(tenant_id: str):
+    """串行化同一租户的准入判断和文档记录写入，避免并发上传同时通过积压检查
+    
+    有Redis时使用跨进程的Redis锁，否则退化为进程内锁。
+    """
+    if cache_manager.use_redis and cache_manager.redis_client is not None:
+        with cache_manager.redis_client.lock(
+            f"ingest:admission:{tenant_id}",
+            timeout=INGEST_ADMISSION_LOCK_TIMEOUT,
+            blocking_timeout=INGEST_ADMISSION_LOCK_WAIT
+        ):
+            yield
+        return
+    
+    with _local_admission_locks_guard:
+        lock = _local_admission_locks.setdefault(tenant_id, threading.Lock())
+    with lock:
+        yield
+
+def check_admission(db: Session, tenant_id: str, lane: str, pages: int) -> Dict:
+    """判断新文档能否立即提交处理，返回是否准入、原因和预计等待秒数"""
+    tenant_backlog = backlog_pages(db, tenant_id=tenant_id)
+    if tenant_backlog > 0 and tenant_backlog + pages > INGEST_TENANT_MAX_BACKLOG_PAGES:
+        return {
+            "admitted": False,
+            "reason": f"租户 {tenant_id} 待处理页数已达上限",
+            "retry_after": int(tenant_backlog * INGEST_SECONDS_PER_PAGE) + 1
+        }
+    
+    # 同一队列已有排队文档时新文档也排队，由调度任务按租户轮转提交，避免插队；
+    # bulk通道全局排队，interactive通道只看该租户自己的小文档，不会排在大文档之后
+    deferred = db.query(Document.id).filter(
+        Document.status == DEFERRED_STATUS,
+        Document.lane == lane
+    )
+    if lane == LANE_INTERACTIVE:
+        deferred = deferred.filter(Document.tenant_id == tenant_id)
+    if deferred.first() is not None:
+        return {
+            "admitted": False,
+            "reason": "已有文档在排队",
+            "retry_after": int(backlog_pages(db, lane=lane) * INGEST_SECONDS_PER_PAGE) + 1
+        }
+    
+    if lane == LANE_BULK:
+        lane_backlog = backlog_pages(db, lane=LANE_BULK)
+        # 队列为空时总是准入，避免超大文档永远无法提交
+        if lane_backlog > 0 and lane_backlog + pages > INGEST_MAX_BACKLOG_PAGES:
+            return {
+                "admitted": False,
+                "reason": "大文档处理队列积压已达上限",
+                "retry_after": int(lane_backlog * INGEST_SECONDS_PER_PAGE) + 1
+            }
+    
+    return {"admitted": True, "reason": None, "retry_after": 0}
+
+def select_deferred(db: Session, limit: int = 100) -> List[Document]:
+    """按租户轮转挑选可以提交的排队文档
+    
+    每个租户的两个通道各自排队：每轮每个队列最多一个，队列内先到先处理。
+    bulk队首文档被积压上限挡住时，同一租户的interactive文档照常提交。
+    """
+    deferred = (
+        db.query(Document)
+        .filter(Document.status == DEFERRED_STATUS)
+        .order_by(Document.upload_time)
+        .limit(limit * 10)
+        .all()
+    )
+    
+    # (租户, 通道) -> 排队文档
+    queues = {}
+    for document in deferred:
+        key = (document.tenant_id or DEFAULT_TENANT, document.lane or LANE_BULK)
+        queues.setdefault(key, []).append(document)
+    
+    # 已选中文档计入积压，保证同一批次内的准入判断一致
+    tenant_backlog = {tenant_id: backlog_pages(db, tenant_id=tenant_id) for tenant_id, _ in queues}
+    lane_backlog = backlog_pages(db, lane=LANE_BULK)
+    
+    selected = []
+    while queues and len(selected) < limit:
+        for key in list(queues):
+            tenant_id, lane = key
+            document = queues[key][0]
+            pages = document.pages or 0
+            
+            tenant_full = tenant_backlog[tenant_id] > 0 and tenant_backlog[tenant_id] + pages > INGEST_TENANT_MAX_BACKLOG_PAGES
+            lane_full = lane == LANE_BULK and lane_backlog > 0 and lane_backlog + pages > INGEST_MAX_BACKLOG_PAGES
+            if tenant_full or lane_full:
+                # 该队列的队首文档暂时无法提交，本次不再处理该队列
+                del queues[key]
+                continue
+            
+            selected.append(document)
+            tenant_backlog[tenant_id] += pages
+            if lane == LANE_BULK:
+                lane_backlog += pages
+            
+            queues[key].pop(0)
+            if not queues[key]:
+                del queues[key]
+            if len(selected) >= limit:
+                break
+    
+    return selected
@@ -1,6 +1,9 @@
 import os
+import asyncio
+import threading
 import dashscope
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator
 from langchain.llms.base import LLM
 from langchain.callbacks.manager import CallbackManagerForLLMRun
 from langchain.schema import Generation, LLMResult
@@ -8,6 +11,12 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# SDK不提供异步接口时，用于执行同步调用的有界线程池
+_qwen_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("QWEN_ASYNC_WORKERS", 16)),
+    thread_name_prefix="qwen"
+)
+
 class QwenLLM(LLM):
     """通义千问大模型适配器"""
     
@@ -112,6 +121,104 @@ class QwenChatModel:
         """调用方法，支持消息格式"""
         return self._call_chat(messages)
     
+    async def apredict(self, text: str) -> str:
+        """异步预测方法，兼容LangChain接口"""
+        return await self._acall_chat([{"role": "user", "content": text}])
+    
+    async def ainvoke(self, messages: List[Dict[str, str]]) -> str:
+        """异步调用方法，支持消息格式"""
+        return await self._acall_chat(messages)
+    
+    async def _acall_chat(self, messages: List[Dict[str, str]]) -> str:
+        """异步调用通义千问聊天API
+        
+        SDK提供dashscope.AGeneration时直接使用，否则在有界线程池中执行同步调用。
+        """
+        async_generation = getattr(dashscope, "AGeneration", None)
+        if async_generation is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_qwen_executor, self._call_chat, messages)
+        
+        try:
+            response = await async_generation.call(
+                model=self.model_name,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                top_p=self.top_p,
+                result_format='message'
+            )
+            
+            if response.status_code == 200:
+                return response.output.choices[0].message.content
+            else:
+                logger.error(f"通义千问异步聊天API调用失败: {response.message}")
+                raise Exception(f"异步聊天API调用失败: {response.message}")
+                
+        except Exception as e:
+            logger.error(f"通义千问异步聊天调用异常: {str(e)}")
+            raise e
+    
+    def stream(self, messages: List[Dict[str, str]], stop_event: threading.Event = None) -> Iterator[str]:
+        """流式调用通义千问聊天API，逐段返回增量文本"""
+        try:
+            responses = dashscope.Generation.call(
+                model=self.model_name,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                top_p=self.top_p,
+                result_format='message',
+                stream=True,
+                incremental_output=True
+            )
+            
+            for response in responses:
+                if stop_event is not None and stop_event.is_set():
+                    break
+                
+                if response.status_code != 200:
+                    logger.error(f"通义千问流式API调用失败: {response.message}")
+                    raise Exception(f"流式API调用失败: {response.message}")
+                
+                content = response.output.choices[0].message.content
+                if content:
+                    yield content
+                    
+        except Exception as e:
+            logger.error(f"通义千问流式调用异常: {str(e)}")
+            raise e
+    
+    async def astream(self, text: str) -> AsyncIterator[str]:
+        """异步流式预测：在线程池中消费同步流，通过队列转交给事件循环"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stop_event = threading.Event()
+        finished = object()
+        
+        def produce():
+            try:
+                for content in self.stream([{"role": "user", "content": text}], stop_event):
+                    loop.call_soon_threadsafe(queue.put_nowait, content)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, finished)
+        
+        loop.run_in_executor(_qwen_executor, produce)
+        
+        try:
+            while True:
+                item = await queue.get()
+                if item is finished:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # 客户端断开时通知生产线程停止读取
+            stop_event.set()
+    
     def _call_chat(self, messages: List[Dict[str, str]]) -> str:
         """调用通义千问聊天API"""
         try:
@@ -1,17 +1,43 @@
 import os
+import time
+import heapq
+import threading
 import dashscope
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import List
 from langchain.embeddings.base import Embeddings
 import logging
 
 logger = logging.getLogger(__name__)
 
+class EmbeddingThrottledError(Exception):
+    """嵌入API触发限流"""
+
 class QwenEmbeddings(Embeddings):
-    """通义千问嵌入模型适配器"""
+    """通义千问嵌入模型适配器 - 并发批量请求，遇到限流自动降低批大小和并发数"""
     
-    def __init__(self, model_name: str = "text-embedding-v1"):
+    def __init__(
+        self,
+        model_name: str = "text-embedding-v1",
+        max_batch_size: int = None,
+        max_concurrency: int = None,
+        max_retries: int = None
+    ):
         self.model_name = model_name
         
+        # 并发批处理配置
+        self.max_batch_size = max_batch_size or int(os.getenv("QWEN_EMBEDDING_BATCH_SIZE", 10))
+        self.max_concurrency = max_concurrency or int(os.getenv("QWEN_EMBEDDING_CONCURRENCY", 4))
+        self.max_retries = max_retries or int(os.getenv("QWEN_EMBEDDING_MAX_RETRIES", 5))
+        
+        # 自适应状态（加性增、乘性减），跨调用保留
+        self._batch_size = self.max_batch_size
+        self._concurrency = self.max_concurrency
+        self._success_streak = 0
+        self._epoch = 0
+        self._state_lock = threading.Lock()
+        
         # 设置API密钥
         api_key = os.getenv("DASHSCOPE_API_KEY")
         if not api_key:
@@ -20,15 +46,68 @@ class QwenEmbeddings(Embeddings):
         dashscope.api_key = api_key
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """嵌入多个文档"""
-        embeddings = []
+        """嵌入多个文档，多个批次并发请求，结果保持输入顺序"""
+        if not texts:
+            return []
         
-        # 批量处理，避免单次请求过大
-        batch_size = 10
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i + batch_size]
-            batch_embeddings = self._get_embeddings(batch_texts)
-            embeddings.extend(batch_embeddings)
+        embeddings = [None] * len(texts)
+        # 可立即发送的区间 (start, end)
+        ready = deque([(0, len(texts))])
+        # 限流退避中的区间，按可发送时间排序的堆 (可发送时间, start, end)，不阻塞ready中的区间
+        delayed = []
+        in_flight = {}
+        retries = {}
+        
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            while ready or delayed or in_flight:
+                now = time.time()
+                while delayed and delayed[0][0] <= now:
+                    _, start, end = heapq.heappop(delayed)
+                    ready.appendleft((start, end))
+                
+                # 按当前批大小切分并提交，在途请求数不超过当前并发上限
+                while ready and len(in_flight) < self._concurrency:
+                    start, end = ready.popleft()
+                    if end - start > self._batch_size:
+                        ready.appendleft((start + self._batch_size, end))
+                        end = start + self._batch_size
+                    
+                    future = executor.submit(self._get_embeddings, texts[start:end])
+                    in_flight[future] = (start, end, self._epoch)
+                
+                # 没有可发送的区间时，最多等到下一个退避区间就绪
+                timeout = None
+                if delayed and len(in_flight) < self._concurrency:
+                    timeout = max(delayed[0][0] - now, 0.0)
+                
+                if not in_flight:
+                    time.sleep(timeout or 0.0)
+                    continue
+                
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    start, end, epoch = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except EmbeddingThrottledError:
+                        retries[start] = retries.get(start, 0) + 1
+                        if retries[start] > self.max_retries:
+                            raise
+                        
+                        self._on_throttle(epoch)
+                        # 指数退避后重新排队，不阻塞其他区间
+                        delay = min(0.5 * 2 ** (retries[start] - 1), 8.0)
+                        heapq.heappush(delayed, (time.time() + delay, start, end))
+                        continue
+                    
+                    # 返回数量不符时直接报错，否则后续区间的向量会错位
+                    if len(result) != end - start:
+                        raise ValueError(
+                            f"嵌入API返回 {len(result)} 个向量，请求了 {end - start} 个文本"
+                        )
+                    embeddings[start:end] = result
+                    self._on_success()
         
         return embeddings
     
@@ -37,6 +116,34 @@ class QwenEmbeddings(Embeddings):
         embeddings = self._get_embeddings([text])
         return embeddings[0] if embeddings else []
     
+    def _on_success(self) -> None:
+        """连续成功后逐步恢复并发数和批大小"""
+        with self._state_lock:
+            self._success_streak += 1
+            if self._success_streak < self._concurrency * 2:
+                return
+            
+            self._success_streak = 0
+            self._concurrency = min(self._concurrency + 1, self.max_concurrency)
+            self._batch_size = min(
+                self._batch_size + max(self.max_batch_size // 4, 1),
+                self.max_batch_size
+            )
+    
+    def _on_throttle(self, epoch: int) -> None:
+        """触发限流时减半并发数和批大小，同一轮调整前发出的请求只触发一次"""
+        with self._state_lock:
+            if epoch != self._epoch:
+                return
+            
+            self._epoch += 1
+            self._success_streak = 0
+            self._concurrency = max(self._concurrency // 2, 1)
+            self._batch_size = max(self._batch_size // 2, 1)
+            logger.warning(
+                f"通义千问嵌入API限流，调整为并发 {self._concurrency}、批大小 {self._batch_size}"
+            )
+    
     def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
         """调用通义千问嵌入API"""
         try:
@@ -46,14 +153,20 @@ class QwenEmbeddings(Embeddings):
             )
             
             if response.status_code == 200:
-                embeddings = []
-                for output in response.output['embeddings']:
-                    embeddings.append(output['embedding'])
-                return embeddings
+                # 按text_index排序，保证与输入顺序一致
+                outputs = sorted(
+                    response.output['embeddings'],
+                    key=lambda output: output.get('text_index', 0)
+                )
+                return [output['embedding'] for output in outputs]
+            elif response.status_code == 429 or str(response.code).startswith("Throttling"):
+                raise EmbeddingThrottledError(f"嵌入API限流: {response.message}")
             else:
                 logger.error(f"通义千问嵌入API调用失败: {response.message}")
                 raise Exception(f"嵌入API调用失败: {response.message}")
-                
+        
+        except EmbeddingThrottledError:
+            raise
         except Exception as e:
             logger.error(f"通义千问嵌入调用异常: {str(e)}")
-            raise e 
\ No newline at end of file
+            raise e
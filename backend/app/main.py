@@ -1,23 +1,35 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, BackgroundTasks, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from sqlalchemy import or_
+from typing import Dict, Optional
 import os
 import uuid
 import shutil
+import hashlib
+import json
+import asyncio
 from datetime import datetime
 import logging
 import time
 
-from .database import get_db, create_tables, Document, QueryHistory
+from .database import get_db, create_tables, Document, QueryHistory, SessionLocal
 from .schemas import *
 from .core.document_processor import DocumentProcessor
 from .core.vector_store import VectorStoreManager
 from .core.agent_core import DocumentAnalysisAgent
 from .core.model_factory import ModelFactory
-from .celery_app import process_document_task, generate_summary_task
+from .celery_app import celery_app, process_document_task, generate_summary_task, enqueue_document
+from .ingest_scheduler import (
+    DEFAULT_TENANT, DEFERRED_STATUS, INGEST_ADMISSION_MODE, classify_lane, check_admission, admission_lock
+)
 from .logging_config import setup_logging, RequestLoggingMiddleware
 from .core.enhanced_vector_store import EnhancedVectorStore
 from .core.cache_manager import cache_manager
+from .core.embedding_cache import get_embedding_cache_stats
+from .core.progress import progress_broker, TERMINAL_STATUSES
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -44,6 +56,13 @@ os.makedirs("uploads", exist_ok=True)
 os.makedirs("vector_db", exist_ok=True)
 os.makedirs("logs", exist_ok=True)
 
+# 上传配置
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024  # 50MB
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))  # 每次读取1MB
+
+# 多文档查询未指定文档时最多检索的文档数
+MULTI_QUERY_MAX_DOCUMENTS = int(os.getenv("MULTI_QUERY_MAX_DOCUMENTS", 500))
+
 # 在应用初始化时检查可用模型
 available_models = ModelFactory.get_available_models()
 logger.info(f"可用模型: {available_models}")
@@ -94,6 +113,49 @@ async def startup_event():
     logger.info("正在初始化数据库...")
     create_tables()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时释放进度订阅连接"""
+    await progress_broker.close()
+
+def build_query_filter(request: QueryRequest) -> Optional[Dict]:
+    """将请求中的页码范围/章节转换为向量检索过滤条件"""
+    return VectorStoreManager.build_where(
+        page_start=request.page_start,
+        page_end=request.page_end,
+        chapter=request.chapter,
+        section=request.section
+    )
+
+async def get_document_or_404(db: Session, document_id: str) -> Document:
+    """在线程池中查询文档记录，不存在时返回404"""
+    document = await run_in_threadpool(
+        lambda: db.query(Document).filter(Document.id == document_id).first()
+    )
+    if not document:
+        raise HTTPException(status_code=404, detail="文档不存在")
+    return document
+
+async def save_query_history(db: Session, document_id: str, question: str, result: Dict) -> None:
+    """在线程池中保存查询历史"""
+    def _save():
+        db.add(QueryHistory(
+            document_id=document_id,
+            question=question,
+            answer=result["answer"],
+            confidence=result["confidence"],
+            processing_time=result["processing_time"]
+        ))
+        db.commit()
+    
+    await run_in_threadpool(_save)
+
+def is_document_queryable(document: Document) -> bool:
+    """文档处理完成，或流式入库过程中已有可检索的文本块"""
+    return document.status == "completed" or (
+        document.status == "processing" and (document.chunk_count or 0) > 0
+    )
+
 @app.get("/", response_model=HealthCheck)
 async def root():
     """健康检查接口"""
@@ -107,44 +169,178 @@ async def root():
         }
     )
 
+class UploadTooLargeError(Exception):
+    """上传文件超过大小限制"""
+
+async def save_upload_file(file: UploadFile, file_path: str, max_size: int = MAX_UPLOAD_SIZE) -> Dict:
+    """流式保存上传文件：分块写入临时文件，边写边校验大小并计算SHA-256，完成后原子重命名"""
+    temp_path = f"{file_path}.part"
+    sha256 = hashlib.sha256()
+    file_size = 0
+    
+    try:
+        with open(temp_path, "wb") as buffer:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                
+                file_size += len(chunk)
+                if file_size > max_size:
+                    raise UploadTooLargeError(f"文件大小超过限制: {max_size} 字节")
+                
+                sha256.update(chunk)
+                # 磁盘写入放到线程池，避免阻塞事件循环
+                await run_in_threadpool(buffer.write, chunk)
+            
+            await run_in_threadpool(buffer.flush)
+            await run_in_threadpool(os.fsync, buffer.fileno())
+        
+        # 原子替换到最终路径
+        os.replace(temp_path, file_path)
+        
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    
+    return {
+        "file_path": file_path,
+        "file_size": file_size,
+        "content_hash": sha256.hexdigest()
+    }
+
 @app.post("/api/v1/documents/upload", response_model=DocumentUploadResponse)
 async def upload_document(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    x_tenant_id: Optional[str] = Header(default=None)
 ):
-    """上传PDF文档 - 使用Celery异步处理"""
+    """上传PDF文档 - 使用Celery异步处理
+    
+    按页数和大小把文档分到interactive/bulk优先级通道；积压超过上限时排队或返回429。
+    """
+    tenant_id = x_tenant_id or DEFAULT_TENANT
     
     # 验证文件类型
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="只支持PDF文件")
     
-    # 验证文件大小（50MB限制）
-    file_content = await file.read()
-    if len(file_content) > 50 * 1024 * 1024:
+    # 生成唯一文档ID
+    document_id = str(uuid.uuid4())
+    file_path = f"uploads/{document_id}_{os.path.basename(file.filename)}"
+    
+    # 流式保存文件，同时校验大小（50MB限制）
+    try:
+        saved = await save_upload_file(file, file_path)
+    except UploadTooLargeError:
         raise HTTPException(status_code=400, detail="文件大小不能超过50MB")
+    except Exception as e:
+        logger.error(f"文件保存失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"文档上传失败: {str(e)}")
+    finally:
+        await file.close()
     
     try:
-        # 生成唯一文档ID
-        document_id = str(uuid.uuid4())
+        # 按内容哈希查找已处理完成的相同文档，复用其文本块和向量
+        existing = await run_in_threadpool(
+            lambda: db.query(Document).filter(
+                Document.content_hash == saved["content_hash"],
+                Document.status == "completed"
+            ).first()
+        )
+        
+        if existing:
+            # 重复文件无需再保存一份
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            
+            db_document = Document(
+                id=document_id,
+                filename=file.filename,
+                file_path=existing.file_path,
+                file_size=saved["file_size"],
+                pages=existing.pages,
+                chunk_count=existing.chunk_count,
+                status="completed",
+                content_hash=saved["content_hash"],
+                vector_document_id=existing.vector_id,
+                tenant_id=tenant_id,
+                lane=existing.lane
+            )
+            
+            def _save_duplicate():
+                db.add(db_document)
+                db.commit()
+            
+            await run_in_threadpool(_save_duplicate)
+            
+            logger.info(f"文档 {document_id} 与 {existing.id} 内容相同，复用向量数据")
+            
+            return DocumentUploadResponse(
+                document_id=document_id,
+                filename=file.filename,
+                status=TaskStatus.COMPLETED,
+                upload_time=datetime.now(),
+                message="检测到相同文档，已复用解析结果"
+            )
         
-        # 保存文件
-        file_path = f"uploads/{document_id}_{file.filename}"
-        with open(file_path, "wb") as buffer:
-            buffer.write(file_content)
+        # 只读取页数（不提取文本），选择优先级通道并做准入判断
+        try:
+            pages = (await run_in_threadpool(processor.get_pdf_info, file_path))["pages"]
+        except Exception as e:
+            os.remove(file_path)
+            raise HTTPException(status_code=400, detail=f"无法解析PDF文件: {str(e)}")
         
-        # 创建数据库记录
-        db_document = Document(
-            id=document_id,
-            filename=file.filename,
-            file_path=file_path,
-            file_size=len(file_content),
-            status="pending"
-        )
-        db.add(db_document)
-        db.commit()
+        lane = classify_lane(pages, saved["file_size"])
         
-        # 提交Celery任务
-        task = process_document_task.delay(document_id, file_path)
+        def _admit():
+            # 准入判断和记录写入在同一租户锁内完成，新记录提交后才计入下一个上传的积压
+            with admission_lock(tenant_id):
+                admission = check_admission(db, tenant_id, lane, pages)
+                if not admission["admitted"] and INGEST_ADMISSION_MODE == "reject":
+                    return admission, None
+                
+                # 创建数据库记录
+                db_document = Document(
+                    id=document_id,
+                    filename=file.filename,
+                    file_path=file_path,
+                    file_size=saved["file_size"],
+                    pages=pages,
+                    status="pending" if admission["admitted"] else DEFERRED_STATUS,
+                    content_hash=saved["content_hash"],
+                    vector_document_id=document_id,
+                    tenant_id=tenant_id,
+                    lane=lane
+                )
+                db.add(db_document)
+                db.commit()
+                return admission, db_document
+        
+        admission, db_document = await run_in_threadpool(_admit)
+        
+        if db_document is None:
+            os.remove(file_path)
+            raise HTTPException(
+                status_code=429,
+                detail=f"{admission['reason']}，请稍后重试",
+                headers={"Retry-After": str(admission["retry_after"])}
+            )
+        
+        if not admission["admitted"]:
+            logger.info(f"文档 {document_id} 排队等待处理: {admission['reason']}")
+            
+            return DocumentUploadResponse(
+                document_id=document_id,
+                filename=file.filename,
+                status=TaskStatus.DEFERRED,
+                upload_time=datetime.now(),
+                message=f"{admission['reason']}，文档已排队，将在资源空闲时自动处理"
+            )
+        
+        # 按优先级通道提交Celery任务
+        task = enqueue_document(db_document)
         
         return DocumentUploadResponse(
             document_id=document_id,
@@ -155,10 +351,95 @@ async def upload_document(
             task_id=task.id
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"文档上传失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"文档上传失败: {str(e)}")
 
+# 进度推送：无事件时发送心跳的间隔，以及Redis不可用时轮询数据库的间隔（秒）
+PROGRESS_HEARTBEAT = float(os.getenv("PROGRESS_HEARTBEAT", 15))
+PROGRESS_POLL_INTERVAL = float(os.getenv("PROGRESS_POLL_INTERVAL", 2))
+
+def document_progress_snapshot(document: Document) -> Dict:
+    """由文档记录生成进度快照（没有推送事件时使用）"""
+    return {
+        "document_id": document.id,
+        "stage": document.status,
+        "status": document.status,
+        "progress": 100 if document.status == "completed" else None,
+        "total_pages": document.pages,
+        "chunks_embedded": document.chunk_count
+    }
+
+@app.get("/api/v1/documents/{document_id}/progress")
+async def stream_document_progress(document_id: str):
+    """推送文档入库进度（Server-Sent Events），替代轮询 /api/v1/tasks/{task_id}
+    
+    每条progress事件包含阶段、进度百分比、已处理页数和已嵌入块数；文档处理完成或失败后关闭连接。
+    不使用get_db依赖：依赖的会话要到流式响应结束才释放，长连接会占满数据库连接池，
+    这里每次查询都使用短期会话。
+    """
+    def load_document() -> Optional[tuple]:
+        session = SessionLocal()
+        try:
+            current = session.query(Document).filter(Document.id == document_id).first()
+            return (current.vector_id, document_progress_snapshot(current)) if current else None
+        finally:
+            session.close()
+    
+    def load_snapshot() -> Optional[Dict]:
+        found = load_document()
+        return found[1] if found else None
+    
+    found = await run_in_threadpool(load_document)
+    if found is None:
+        raise HTTPException(status_code=404, detail="文档不存在")
+    vector_id, snapshot = found
+    
+    def format_event(event: Dict) -> str:
+        return f"event: progress\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+    
+    async def event_stream():
+        # 先返回数据库中的当前状态；已结束（包括复用向量数据的重复上传）时直接关闭
+        yield format_event(snapshot)
+        if snapshot["status"] in TERMINAL_STATUSES:
+            return
+        
+        if progress_broker.available:
+            # 进度事件以实际存放向量的文档ID发布
+            async for event in progress_broker.events(vector_id, heartbeat=PROGRESS_HEARTBEAT):
+                if event is None:
+                    # 心跳注释，防止代理断开空闲连接
+                    yield ": keep-alive\n\n"
+                    continue
+                
+                yield format_event({**event, "document_id": document_id})
+            return
+        
+        # 无Redis时退化为服务端轮询数据库，客户端仍只需保持一个连接
+        last = snapshot
+        while True:
+            current = await run_in_threadpool(load_snapshot)
+            if current is None:
+                return
+            if current != last:
+                yield format_event(current)
+                last = current
+            if current["status"] in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(PROGRESS_POLL_INTERVAL)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # 禁止Nginx缓冲SSE响应
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @app.get("/api/v1/tasks/{task_id}")
 async def get_task_status(task_id: str):
     """获取任务状态"""
@@ -182,22 +463,21 @@ async def hybrid_query_document(
     """混合检索查询文档内容"""
     
     # 检查文档状态
-    document = db.query(Document).filter(Document.id == document_id).first()
-    if not document:
-        raise HTTPException(status_code=404, detail="文档不存在")
+    document = await get_document_or_404(db, document_id)
     
-    if document.status != "completed":
+    if not is_document_queryable(document):
         raise HTTPException(status_code=400, detail=f"文档状态: {document.status}，无法查询")
     
     try:
         start_time = time.time()
         
         # 使用混合检索
-        search_results = vector_store.hybrid_search(
-            document_id=document_id,
+        search_results = await vector_store.ahybrid_search(
+            document_id=document.vector_id,
             query=request.question,
             k=request.max_results,
-            alpha=0.7  # 向量搜索权重
+            alpha=0.7,  # 向量搜索权重
+            where=build_query_filter(request)
         )
         
         if not search_results:
@@ -208,26 +488,19 @@ async def hybrid_query_document(
                 processing_time=time.time() - start_time
             )
         
-        # 使用智能体生成回答
-        response = agent.answer_question(
-            document_id=document_id,
-            question=request.question,
-            max_results=request.max_results
-        )
+        # 直接基于混合检索结果生成回答，不再重复检索
+        response = await agent.agenerate_answer(request.question, search_results, start_time)
+        
+        if not response["success"]:
+            raise HTTPException(status_code=500, detail=response["error"])
         
         # 记录查询历史
-        query_history = QueryHistory(
-            document_id=document_id,
-            question=request.question,
-            answer=response["answer"],
-            confidence=response["confidence"],
-            processing_time=response["processing_time"]
-        )
-        db.add(query_history)
-        db.commit()
+        await save_query_history(db, document_id, request.question, response)
         
         return QueryResponse(**response)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"混合查询失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
@@ -241,32 +514,23 @@ async def query_document(
     """查询文档内容"""
     
     # 检查文档是否存在且已处理完成
-    document = db.query(Document).filter(Document.id == document_id).first()
-    if not document:
-        raise HTTPException(status_code=404, detail="文档不存在")
+    document = await get_document_or_404(db, document_id)
     
-    if document.status != "completed":
+    if not is_document_queryable(document):
         raise HTTPException(status_code=400, detail=f"文档状态: {document.status}，无法查询")
     
     try:
         # 执行查询
-        result = agent.answer_question(
-            document_id=document_id,
+        result = await agent.aanswer_question(
+            document_id=document.vector_id,
             question=request.question,
-            max_results=request.max_results
+            max_results=request.max_results,
+            where=build_query_filter(request)
         )
         
         if result["success"]:
             # 保存查询历史
-            query_record = QueryHistory(
-                document_id=document_id,
-                question=request.question,
-                answer=result["answer"],
-                confidence=result["confidence"],
-                processing_time=result["processing_time"]
-            )
-            db.add(query_record)
-            db.commit()
+            await save_query_history(db, document_id, request.question, result)
             
             return QueryResponse(
                 answer=result["answer"],
@@ -283,6 +547,138 @@ async def query_document(
         logger.error(f"查询处理失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"查询处理失败: {str(e)}")
 
+@app.post("/api/v1/documents/{document_id}/query/stream")
+async def stream_query_document(
+    document_id: str,
+    request: QueryRequest,
+    db: Session = Depends(get_db)
+):
+    """流式查询文档内容（Server-Sent Events）
+    
+    先推送sources事件，然后逐段推送token事件，最后推送done事件。
+    """
+    
+    document = await get_document_or_404(db, document_id)
+    
+    if not is_document_queryable(document):
+        raise HTTPException(status_code=400, detail=f"文档状态: {document.status}，无法查询")
+    
+    vector_id = document.vector_id
+    where = build_query_filter(request)
+    
+    async def event_stream():
+        async for event in agent.astream_answer(
+            document_id=vector_id,
+            question=request.question,
+            max_results=request.max_results,
+            where=where
+        ):
+            if event["event"] == "done":
+                # 在推送done之前保存查询历史：客户端收到done后断开会取消生成器，之后的代码不再执行
+                # （请求级会话此时可能已关闭，使用独立会话）
+                session = SessionLocal()
+                try:
+                    await save_query_history(session, document_id, request.question, event["data"])
+                except Exception as e:
+                    logger.error(f"保存流式查询历史失败: {str(e)}")
+                finally:
+                    session.close()
+            
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # 禁止Nginx缓冲SSE响应
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+@app.post("/api/v1/query", response_model=MultiDocumentQueryResponse)
+async def query_documents(
+    request: MultiDocumentQueryRequest,
+    db: Session = Depends(get_db)
+):
+    """跨多个文档（或全部文档）查询
+    
+    并行检索所选文档，合并全局top-k后生成一个回答，来源标注所属文档。
+    未指定文档时只检索最新上传的MULTI_QUERY_MAX_DOCUMENTS个，响应中truncated标明是否截断。
+    """
+    
+    def _load_documents():
+        query = db.query(Document)
+        if request.document_ids:
+            return query.filter(Document.id.in_(request.document_ids)).all(), None
+        
+        query = query.filter(or_(Document.status == "completed", Document.chunk_count > 0))
+        documents = query.order_by(Document.upload_time.desc()).limit(MULTI_QUERY_MAX_DOCUMENTS).all()
+        total = query.count() if len(documents) >= MULTI_QUERY_MAX_DOCUMENTS else len(documents)
+        return documents, total
+    
+    documents, total_documents = await run_in_threadpool(_load_documents)
+    truncated = total_documents is not None and total_documents > len(documents)
+    if truncated:
+        logger.warning(
+            f"多文档查询未指定文档，共 {total_documents} 个可查询文档，只检索最新的 {len(documents)} 个"
+        )
+    
+    if request.document_ids:
+        found = {document.id for document in documents}
+        missing = [document_id for document_id in request.document_ids if document_id not in found]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"文档不存在: {', '.join(missing)}")
+    
+    documents = [document for document in documents if is_document_queryable(document)]
+    if not documents:
+        raise HTTPException(status_code=400, detail="没有可查询的文档")
+    
+    # 内容相同的文档共享向量数据，只检索一次，来源归属到第一个对应的文档
+    owners = {}
+    for document in documents:
+        owners.setdefault(document.vector_id, document)
+    
+    try:
+        result = await agent.aanswer_multi_document(
+            document_ids=list(owners.keys()),
+            question=request.question,
+            max_results=request.max_results,
+            where=VectorStoreManager.build_where(chapter=request.chapter, section=request.section),
+            document_names={vector_id: document.filename for vector_id, document in owners.items()}
+        )
+        
+        if not result["success"]:
+            raise HTTPException(status_code=500, detail=result["error"])
+        
+        for item in result["sources"] + result["documents"]:
+            owner = owners.get(item["document_id"])
+            if owner is not None:
+                item["document_id"] = owner.id
+        
+        logger.info(
+            f"多文档查询: {len(documents)} 个文档，"
+            + "，".join(f"{stage} {elapsed:.3f}s" for stage, elapsed in result["timings"].items())
+        )
+        
+        return MultiDocumentQueryResponse(
+            answer=result["answer"],
+            confidence=result["confidence"],
+            sources=result["sources"],
+            documents=result["documents"],
+            timings=result["timings"],
+            document_count=len(documents),
+            processing_time=result["processing_time"],
+            truncated=truncated,
+            total_documents=total_documents
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"多文档查询失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"查询处理失败: {str(e)}")
+
 @app.get("/api/v1/documents/{document_id}", response_model=DocumentInfo)
 async def get_document_info(document_id: str, db: Session = Depends(get_db)):
     """获取文档信息"""
@@ -324,15 +720,14 @@ async def list_documents(skip: int = 0, limit: int = 20, db: Session = Depends(g
 async def generate_document_summary(document_id: str, db: Session = Depends(get_db)):
     """生成文档摘要"""
     
-    document = db.query(Document).filter(Document.id == document_id).first()
-    if not document:
-        raise HTTPException(status_code=404, detail="文档不存在")
+    document = await get_document_or_404(db, document_id)
     
     if document.status != "completed":
         raise HTTPException(status_code=400, detail=f"文档状态: {document.status}，无法生成摘要")
     
     try:
-        result = agent.generate_summary(document_id)
+        # 入库时已在后台预生成，通常直接命中缓存
+        result = await agent.agenerate_summary(document.vector_id)
         
         if result["success"]:
             return {"summary": result["summary"]}
@@ -354,12 +749,22 @@ async def delete_document(document_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="文档不存在")
     
     try:
-        # 删除文件
-        if os.path.exists(document.file_path):
-            os.remove(document.file_path)
+        # 引用计数：仅当没有其他文档共享时才删除文件和向量数据
+        vector_id = document.vector_id
+        shared_refs = db.query(Document).filter(
+            Document.id != document_id,
+            or_(Document.vector_document_id == vector_id, Document.id == vector_id)
+        ).count()
         
-        # 删除向量存储
-        vector_store.delete_document_collection(document_id)
+        if shared_refs == 0:
+            # 删除文件
+            if os.path.exists(document.file_path):
+                os.remove(document.file_path)
+            
+            # 删除向量存储
+            vector_store.delete_document_collection(vector_id)
+        else:
+            logger.info(f"文档 {document_id} 的向量数据仍被 {shared_refs} 个文档引用，保留共享数据")
         
         # 删除数据库记录
         db.delete(document)
@@ -386,19 +791,35 @@ async def get_model_info():
         "current_config": {
             "llm_model": os.getenv("QWEN_MODEL", "qwen-plus") if llm_type == "qwen" else os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
             "embedding_model": os.getenv("QWEN_EMBEDDING_MODEL", "text-embedding-v1") if embedding_type == "qwen" else "text-embedding-ada-002"
-        }
+        },
+        "embedding_cache": get_embedding_cache_stats()
     }
 
 # 添加缓存管理接口
+@app.get("/api/v1/cache/stats")
+async def get_cache_stats():
+    """缓存统计信息：命中率、淘汰数、占用等"""
+    return {
+        "cache": await run_in_threadpool(cache_manager.stats),
+        "embedding_cache": get_embedding_cache_stats(),
+        "semantic_cache": agent.answer_cache.stats() if agent.answer_cache else None,
+        "single_flight": agent.coalescer.stats() if agent.coalescer else None
+    }
+
 @app.delete("/api/v1/cache/{document_id}")
-async def clear_document_cache(document_id: str):
+async def clear_document_cache(document_id: str, db: Session = Depends(get_db)):
     """清除文档相关缓存"""
     try:
-        # 这里可以实现更精确的缓存清理逻辑
-        cache_manager.delete(f"search:*{document_id}*")
-        cache_manager.delete(cache_manager.summary_cache_key(document_id))
+        # 缓存按向量文档ID打标签（内容相同的文档共享缓存）
+        document = await run_in_threadpool(
+            lambda: db.query(Document).filter(Document.id == document_id).first()
+        )
+        vector_id = document.vector_id if document else document_id
+        
+        cleared = await run_in_threadpool(cache_manager.invalidate_document, vector_id)
+        await run_in_threadpool(cache_manager.delete, cache_manager.summary_cache_key(vector_id))
         
-        return {"message": "缓存清理完成"}
+        return {"message": "缓存清理完成", "cleared": cleared}
     except Exception as e:
         logger.error(f"缓存清理失败: {str(e)}")
         raise HTTPException(status_code=500, detail="缓存清理失败")
@@ -8,6 +8,8 @@ class TaskStatus(str, Enum):
     PROCESSING = "processing" 
     COMPLETED = "completed"
     FAILED = "failed"
+    # 处理队列繁忙，等待资源空闲时自动提交
+    DEFERRED = "deferred"
 
 class DocumentUploadRequest(BaseModel):
     filename: str
@@ -19,11 +21,17 @@ class DocumentUploadResponse(BaseModel):
     status: TaskStatus
     upload_time: datetime
     message: str
+    task_id: Optional[str] = None
 
 class QueryRequest(BaseModel):
     document_id: str
     question: str = Field(..., min_length=1, max_length=1000)
     max_results: int = Field(default=5, ge=1, le=20)
+    # 可选检索范围：页码区间、章序号或章节标题
+    page_start: Optional[int] = Field(default=None, ge=1)
+    page_end: Optional[int] = Field(default=None, ge=1)
+    chapter: Optional[int] = Field(default=None, ge=1)
+    section: Optional[str] = Field(default=None, max_length=100)
 
 class QueryResponse(BaseModel):
     answer: str
@@ -31,6 +39,28 @@ class QueryResponse(BaseModel):
     sources: List[dict]
     processing_time: float
 
+class MultiDocumentQueryRequest(BaseModel):
+    question: str = Field(..., min_length=1, max_length=1000)
+    # 为空时查询全部可查询的文档
+    document_ids: Optional[List[str]] = Field(default=None, min_length=1, max_length=500)
+    max_results: int = Field(default=5, ge=1, le=20)
+    chapter: Optional[int] = Field(default=None, ge=1)
+    section: Optional[str] = Field(default=None, max_length=100)
+
+class MultiDocumentQueryResponse(BaseModel):
+    answer: str
+    confidence: float
+    sources: List[dict]
+    # 各文档的命中数
+    documents: List[dict]
+    # 分阶段耗时（秒）：embedding、retrieval、generation
+    timings: dict
+    document_count: int
+    processing_time: float
+    # 未指定文档时可查询文档总数超过MULTI_QUERY_MAX_DOCUMENTS，只检索了最新上传的document_count个
+    truncated: bool = False
+    total_documents: Optional[int] = None
+
 class DocumentInfo(BaseModel):
     document_id: str
     filename: str
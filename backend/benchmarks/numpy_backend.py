@@ -0,0 +1,95 @@
+"""NumPy暴力检索后端与Chroma的基准测试
+
+在同一份随机向量上分别构建Chroma集合和NumPy集合，比较写入耗时、检索延迟
+（p50/p95）以及Chroma HNSW相对精确检索的recall@k。不调用嵌入模型。
+
+用法（在backend目录下）:
+    python -m benchmarks.numpy_backend --chunks 2000 --dim 1536 --queries 200
+"""
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from app.core.numpy_store import NumpyClient
+
+def percentile(values, ratio: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * ratio), len(ordered) - 1)]
+
+def build(client, vectors: np.ndarray, batch_size: int = 64):
+    collection = client.get_or_create_collection(name="doc_benchmark")
+    for start in range(0, len(vectors), batch_size):
+        end = min(start + batch_size, len(vectors))
+        collection.upsert(
+            ids=[f"chunk_{i}" for i in range(start, end)],
+            embeddings=vectors[start:end].tolist(),
+            metadatas=[{"chunk_index": i, "page_start": i // 5 + 1} for i in range(start, end)],
+            documents=[f"chunk {i}" for i in range(start, end)]
+        )
+    return collection
+
+def run_queries(collection, queries: np.ndarray, k: int, where=None):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        result = collection.query(
+            query_embeddings=[query.tolist()],
+            n_results=k,
+            where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(result["ids"][0])
+    return latencies, results
+
+def main():
+    parser = argparse.ArgumentParser(description="NumPy暴力检索后端与Chroma的基准测试")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.chunks, args.dim)).astype(np.float32)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    workdir = tempfile.mkdtemp(prefix="numpy_backend_")
+    
+    try:
+        exact = None
+        for name, client in (
+            ("numpy", NumpyClient(path=f"{workdir}/numpy")),
+            ("chroma", chromadb.PersistentClient(path=f"{workdir}/chroma")),
+        ):
+            start = time.perf_counter()
+            collection = build(client, vectors)
+            build_time = time.perf_counter() - start
+            
+            latencies, results = run_queries(collection, queries, args.k)
+            filtered_latencies, _ = run_queries(
+                collection, queries, args.k, where={"page_start": {"$lte": args.chunks // 10}}
+            )
+            
+            if exact is None:
+                exact = results
+            recall = statistics.mean(
+                len(set(found) & set(expected)) / args.k for found, expected in zip(results, exact)
+            )
+            
+            print(
+                f"{name:<7} 写入 {build_time:6.2f}s  "
+                f"检索 p50 {statistics.median(latencies):6.2f}ms  p95 {percentile(latencies, 0.95):6.2f}ms  "
+                f"带过滤 p50 {statistics.median(filtered_latencies):6.2f}ms  "
+                f"recall@{args.k} {recall:.3f}"
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
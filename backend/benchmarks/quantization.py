@@ -0,0 +1,86 @@
+"""量化向量存储基准测试
+
+在同一份向量上分别以全精度、float16、int8构建NumPy集合，报告检索常驻内存、磁盘占用、
+检索延迟，以及相对全精度精确检索的recall@k（含不重排/重排两种情况）。
+向量由若干聚类中心加噪声生成，近似真实嵌入的分布。不调用嵌入模型。
+
+用法（在backend目录下）:
+    python -m benchmarks.quantization --chunks 2000 --dim 1536 --queries 200
+"""
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from app.core.numpy_store import NumpyClient
+
+def make_vectors(rng, count: int, dim: int, clusters: int) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    return centers[labels] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+
+def main():
+    parser = argparse.ArgumentParser(description="量化向量存储基准测试")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    vectors = make_vectors(rng, args.chunks, args.dim, args.clusters)
+    queries = make_vectors(rng, args.queries, args.dim, args.clusters)
+    workdir = tempfile.mkdtemp(prefix="quantization_")
+    
+    try:
+        exact = None
+        for mode, rescore_factor in (
+            ("none", 1),
+            ("float16", 1),
+            ("float16", args.rescore_factor),
+            ("int8", 1),
+            ("int8", args.rescore_factor),
+        ):
+            client = NumpyClient(
+                path=f"{workdir}/{mode}_{rescore_factor}",
+                quantization=mode,
+                rescore_factor=rescore_factor
+            )
+            collection = client.get_or_create_collection(name="doc_benchmark")
+            collection.upsert(
+                ids=[f"chunk_{i}" for i in range(args.chunks)],
+                embeddings=vectors,
+                documents=[f"chunk {i}" for i in range(args.chunks)]
+            )
+            
+            latencies = []
+            results = []
+            for query in queries:
+                start = time.perf_counter()
+                result = collection.query(query_embeddings=[query], n_results=args.k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                results.append(result["ids"][0])
+            
+            if exact is None:
+                exact = results
+            recall = statistics.mean(
+                len(set(found) & set(expected)) / args.k for found, expected in zip(results, exact)
+            )
+            
+            storage = collection.storage_stats()
+            print(
+                f"{mode:<8} 重排x{rescore_factor}  检索占用 {storage['search_bytes'] / 1024 / 1024:7.2f}MB "
+                f"(全精度 {storage['full_precision_bytes'] / 1024 / 1024:.2f}MB)  "
+                f"磁盘 {storage['disk_bytes'] / 1024 / 1024:7.2f}MB  "
+                f"p50 {statistics.median(latencies):6.2f}ms  recall@{args.k} {recall:.3f}"
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""通义千问嵌入并发批处理基准测试
+
+启动本地DashScope嵌入接口桩服务（模拟网络延迟和429限流），
+对比串行（并发1）和并发批处理的耗时，并校验输出顺序。
+
+用法（在backend目录下）:
+    python -m benchmarks.qwen_embedding_stub --texts 2000 --latency 0.2 --max-inflight 6
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import dashscope
+
+os.environ.setdefault("DASHSCOPE_API_KEY", "stub-key")
+
+from app.llm.qwen_embeddings import QwenEmbeddings
+
+class StubState:
+    """桩服务状态：同时在途请求超过上限时返回429"""
+    
+    def __init__(self, latency: float, max_inflight: int):
+        self.latency = latency
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+        
+        def _reply(self, status: int, body: dict):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            texts = request.get("input", {}).get("texts", [])
+            
+            with state.lock:
+                state.requests += 1
+                if state.inflight >= state.max_inflight:
+                    state.throttled += 1
+                    throttled = True
+                else:
+                    state.inflight += 1
+                    throttled = False
+            
+            if throttled:
+                self._reply(429, {
+                    "code": "Throttling.RateQuota",
+                    "message": "Requests rate limit exceeded",
+                    "request_id": "stub"
+                })
+                return
+            
+            try:
+                time.sleep(state.latency)
+                # 向量第一维编码文本内容，用于校验顺序；打乱返回顺序以校验text_index处理
+                embeddings = [
+                    {"text_index": i, "embedding": [float(len(text)), float(hash(text) % 1000)]}
+                    for i, text in enumerate(texts)
+                ][::-1]
+                self._reply(200, {
+                    "output": {"embeddings": embeddings},
+                    "usage": {"total_tokens": sum(len(text) for text in texts)},
+                    "request_id": "stub"
+                })
+            finally:
+                with state.lock:
+                    state.inflight -= 1
+    
+    return Handler
+
+def run_case(name: str, texts, **kwargs):
+    embeddings = QwenEmbeddings(**kwargs)
+    start = time.time()
+    vectors = embeddings.embed_documents(texts)
+    elapsed = time.time() - start
+    
+    expected = [[float(len(text)), float(hash(text) % 1000)] for text in texts]
+    print(
+        f"{name:<12} 耗时 {elapsed:7.2f}s  顺序正确: {vectors == expected}  "
+        f"最终并发 {embeddings._concurrency} 批大小 {embeddings._batch_size}"
+    )
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="通义千问嵌入并发批处理基准测试")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.2, help="桩服务每次请求的延迟（秒）")
+    parser.add_argument("--max-inflight", type=int, default=6, help="桩服务允许的最大并发请求数，超出返回429")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=10)
+    args = parser.parse_args()
+    
+    state = StubState(args.latency, args.max_inflight)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    dashscope.base_http_api_url = f"http://127.0.0.1:{server.server_port}/api/v1"
+    
+    texts = [f"第{i}个文本块 " + "内容" * (i % 17) for i in range(args.texts)]
+    
+    serial = run_case("串行", texts, max_batch_size=args.batch_size, max_concurrency=1)
+    state.requests = state.throttled = 0
+    concurrent = run_case(
+        "并发", texts, max_batch_size=args.batch_size, max_concurrency=args.concurrency
+    )
+    print(f"加速比 {serial / concurrent:.2f}x，并发阶段请求 {state.requests} 次，其中429 {state.throttled} 次")
+    
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
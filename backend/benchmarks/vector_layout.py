@@ -0,0 +1,112 @@
+"""向量存储布局基准测试
+
+分别以每文档一个集合（per_document）和共享分片集合（shared）两种布局写入
+N个文档 × M个随机向量，测量PersistentClient冷启动耗时和单文档检索延迟。
+不调用嵌入模型，直接写入随机向量。
+
+用法（在backend目录下）:
+    python -m benchmarks.vector_layout --documents 10000 --chunks 20 --shards 4
+"""
+import argparse
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+
+import chromadb
+
+from app.core.vector_store import merge_where, shared_collection_name
+
+def random_vectors(count: int, dim: int):
+    return [[random.random() for _ in range(dim)] for _ in range(count)]
+
+def build_per_document(path: str, document_ids, chunks: int, dim: int):
+    client = chromadb.PersistentClient(path=path)
+    for document_id in document_ids:
+        collection = client.create_collection(name=f"doc_{document_id}")
+        collection.add(
+            ids=[f"{document_id}_{i}" for i in range(chunks)],
+            embeddings=random_vectors(chunks, dim),
+            metadatas=[{"document_id": document_id, "chunk_index": i} for i in range(chunks)],
+            documents=[f"chunk {i}" for i in range(chunks)]
+        )
+
+def build_shared(path: str, document_ids, chunks: int, dim: int, shards: int):
+    client = chromadb.PersistentClient(path=path)
+    collections = {}
+    for document_id in document_ids:
+        name = shared_collection_name(document_id, shards)
+        if name not in collections:
+            collections[name] = client.get_or_create_collection(name=name)
+        collections[name].add(
+            ids=[f"{document_id}:{document_id}_{i}" for i in range(chunks)],
+            embeddings=random_vectors(chunks, dim),
+            metadatas=[{"document_id": document_id, "chunk_index": i} for i in range(chunks)],
+            documents=[f"chunk {i}" for i in range(chunks)]
+        )
+
+def measure(path: str, layout: str, document_ids, queries: int, dim: int, shards: int, k: int):
+    """冷启动客户端，随机选取文档执行检索，返回 (启动耗时, 延迟列表)"""
+    start = time.perf_counter()
+    client = chromadb.PersistentClient(path=path)
+    startup = time.perf_counter() - start
+    
+    latencies = []
+    for _ in range(queries):
+        document_id = random.choice(document_ids)
+        query_embedding = random_vectors(1, dim)
+        
+        start = time.perf_counter()
+        if layout == "shared":
+            collection = client.get_collection(name=shared_collection_name(document_id, shards))
+            where = merge_where({"document_id": document_id})
+        else:
+            collection = client.get_collection(name=f"doc_{document_id}")
+            where = None
+        collection.query(query_embeddings=query_embedding, n_results=k, where=where)
+        latencies.append((time.perf_counter() - start) * 1000)
+    
+    return startup, latencies
+
+def percentile(values, ratio: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * ratio), len(ordered) - 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description="向量存储布局基准测试")
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--chunks", type=int, default=20, help="每个文档的文本块数")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+    
+    document_ids = [str(uuid.uuid4()) for _ in range(args.documents)]
+    workdir = tempfile.mkdtemp(prefix="vector_layout_")
+    
+    try:
+        for layout in ("per_document", "shared"):
+            path = f"{workdir}/{layout}"
+            
+            start = time.perf_counter()
+            if layout == "shared":
+                build_shared(path, document_ids, args.chunks, args.dim, args.shards)
+            else:
+                build_per_document(path, document_ids, args.chunks, args.dim)
+            build_time = time.perf_counter() - start
+            
+            startup, latencies = measure(
+                path, layout, document_ids, args.queries, args.dim, args.shards, args.k
+            )
+            print(
+                f"{layout:<13} 写入 {build_time:8.1f}s  启动 {startup * 1000:8.1f}ms  "
+                f"检索 p50 {statistics.median(latencies):7.2f}ms  p95 {percentile(latencies, 0.95):7.2f}ms"
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
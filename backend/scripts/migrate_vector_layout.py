@@ -0,0 +1,109 @@
+"""向量存储布局迁移工具
+
+将按文档划分的集合（doc_{document_id}）迁移到共享分片集合（chunks_NNN），
+迁移后设置 VECTOR_STORE_LAYOUT=shared、VECTOR_STORE_SHARDS=<分片数> 即可切换布局。
+嵌入向量直接复制，不会重新调用嵌入模型。
+
+用法（在backend目录下）:
+    python -m scripts.migrate_vector_layout --persist-directory ./vector_db --shards 4
+    python -m scripts.migrate_vector_layout --shards 4 --delete-source   # 校验通过后删除原集合
+"""
+import argparse
+import logging
+import time
+
+import chromadb
+
+from app.core.vector_store import LAYOUT_SHARED, shared_collection_name
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 1000
+
+def migrate_collection(client, source, shards: int, dry_run: bool) -> int:
+    """迁移单个文档集合，返回迁移的记录数"""
+    document_id = source.name[len("doc_"):]
+    target = client.get_or_create_collection(
+        name=shared_collection_name(document_id, shards),
+        metadata={"layout": LAYOUT_SHARED}
+    )
+    
+    migrated = 0
+    offset = 0
+    while True:
+        page = source.get(
+            limit=PAGE_SIZE,
+            offset=offset,
+            include=["embeddings", "documents", "metadatas"]
+        )
+        if not page["ids"]:
+            break
+        
+        metadatas = []
+        for metadata in page["metadatas"]:
+            metadata = dict(metadata or {})
+            metadata["document_id"] = document_id
+            metadatas.append(metadata)
+        
+        if not dry_run:
+            target.upsert(
+                ids=[f"{document_id}:{chunk_id}" for chunk_id in page["ids"]],
+                embeddings=page["embeddings"],
+                documents=page["documents"],
+                metadatas=metadatas
+            )
+        
+        migrated += len(page["ids"])
+        offset += len(page["ids"])
+    
+    return migrated
+
+def main():
+    parser = argparse.ArgumentParser(description="将doc_*集合迁移到共享分片集合")
+    parser.add_argument("--persist-directory", default="./vector_db")
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--delete-source", action="store_true", help="迁移并校验记录数后删除原集合")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不写入")
+    args = parser.parse_args()
+    
+    client = chromadb.PersistentClient(path=args.persist_directory)
+    sources = [
+        collection for collection in client.list_collections()
+        if collection.name.startswith("doc_")
+    ]
+    logger.info(f"待迁移集合: {len(sources)} 个，目标分片数: {args.shards}")
+    
+    start = time.time()
+    total = 0
+    failed = []
+    
+    for i, source in enumerate(sources, 1):
+        document_id = source.name[len("doc_"):]
+        try:
+            source_count = source.count()
+            migrated = migrate_collection(client, source, args.shards, args.dry_run)
+            total += migrated
+            
+            if migrated != source_count:
+                raise Exception(f"记录数不一致: 原集合 {source_count}，已迁移 {migrated}")
+            
+            if args.delete_source and not args.dry_run:
+                client.delete_collection(name=source.name)
+        
+        except Exception as e:
+            logger.error(f"迁移文档 {document_id} 失败: {str(e)}")
+            failed.append(document_id)
+        
+        if i % 100 == 0:
+            logger.info(f"已处理 {i}/{len(sources)} 个集合，共 {total} 条记录")
+    
+    logger.info(
+        f"迁移完成: {len(sources) - len(failed)} 个集合，{total} 条记录，"
+        f"失败 {len(failed)} 个，耗时 {time.time() - start:.1f}s"
+    )
+    if failed:
+        logger.info(f"失败的文档: {', '.join(failed)}")
+
+if __name__ == "__main__":
+    main()
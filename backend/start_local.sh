@@ -72,7 +72,10 @@ API_PID=$!
 sleep 3
 
 echo "🚀 启动Celery工作者..."
-celery -A app.celery_app worker --loglevel=info &
+# 专用工作者只处理小文档（interactive通道），大文档积压时小文档不会排在后面
+celery -A app.celery_app worker --loglevel=info -Q document_interactive --concurrency=2 -n interactive@%h &
+INTERACTIVE_WORKER_PID=$!
+celery -A app.celery_app worker --loglevel=info -Q document_processing,document_interactive,maintenance,celery -n bulk@%h &
 WORKER_PID=$!
 
 echo "🚀 启动Celery监控..."
@@ -88,5 +91,5 @@ echo ""
 echo "按 Ctrl+C 停止所有服务"
 
 # 等待用户中断
-trap "echo '🛑 正在停止服务...'; kill $API_PID $WORKER_PID $FLOWER_PID 2>/dev/null; exit" INT
+trap "echo '🛑 正在停止服务...'; kill $API_PID $INTERACTIVE_WORKER_PID $WORKER_PID $FLOWER_PID 2>/dev/null; exit" INT
 wait
\ No newline at end of file
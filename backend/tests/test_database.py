@@ -0,0 +1,49 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app import database
+from app.database import Document
+
+# 初始版本的documents表结构
+BASELINE_DOCUMENTS = """
+CREATE TABLE documents (
+    id VARCHAR NOT NULL PRIMARY KEY,
+    filename VARCHAR NOT NULL,
+    file_path VARCHAR NOT NULL,
+    file_size INTEGER NOT NULL,
+    pages INTEGER,
+    upload_time DATETIME DEFAULT (CURRENT_TIMESTAMP),
+    status VARCHAR,
+    chunk_count INTEGER
+)
+"""
+
+def test_create_tables_upgrades_baseline_schema(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(BASELINE_DOCUMENTS))
+        conn.execute(text(
+            "INSERT INTO documents (id, filename, file_path, file_size, pages, status, chunk_count) "
+            "VALUES ('old', 'old.pdf', 'uploads/old.pdf', 1, 3, 'completed', 5)"
+        ))
+    monkeypatch.setattr(database, "engine", engine)
+    
+    database.create_tables()
+    
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns("documents")}
+    assert {"content_hash", "vector_document_id", "tenant_id", "lane"} <= columns
+    indexes = {index["name"] for index in inspector.get_indexes("documents")}
+    assert {"ix_documents_content_hash", "ix_documents_vector_document_id", "ix_documents_tenant_id"} <= indexes
+    
+    session = sessionmaker(bind=engine)()
+    try:
+        document = session.query(Document).filter(Document.tenant_id == "default").one()
+        assert document.id == "old"
+        assert document.lane == "bulk"
+        assert document.vector_id == "old"
+    finally:
+        session.close()
+    
+    # 再次启动时迁移是幂等的
+    database.create_tables()
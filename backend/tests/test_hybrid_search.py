@@ -0,0 +1,62 @@
+import pytest
+
+from app.core.enhanced_vector_store import EnhancedVectorStore
+
+def result(chunk_id, score):
+    return {
+        "content": f"content {chunk_id}",
+        "metadata": {"chunk_id": chunk_id},
+        "similarity_score": score,
+        "chunk_id": chunk_id,
+        "chunk_index": 0
+    }
+
+@pytest.fixture
+def store():
+    # 只测试融合逻辑，不初始化向量库和嵌入模型
+    return EnhancedVectorStore.__new__(EnhancedVectorStore)
+
+def test_nearest_vector_hit_ranks_first(store):
+    # 向量检索返回的是距离，越小越相似
+    vector_results = [result("far", 1.2), result("near", 0.1), result("mid", 0.6)]
+    
+    combined = store._combine_search_results(vector_results, [], alpha=0.7)
+    
+    assert [r["chunk_id"] for r in combined] == ["near", "mid", "far"]
+    assert combined[0]["vector_score"] == pytest.approx(1.0)
+    assert combined[-1]["vector_score"] == pytest.approx(0.0)
+
+def test_keyword_score_is_higher_is_better(store):
+    keyword_results = [result("weak", 0.5), result("strong", 3.0)]
+    
+    combined = store._combine_search_results([], keyword_results, alpha=0.7)
+    
+    assert [r["chunk_id"] for r in combined] == ["strong", "weak"]
+
+def test_fusion_combines_both_legs(store):
+    vector_results = [result("a", 0.2), result("b", 0.3), result("c", 0.9)]
+    keyword_results = [result("b", 4.0), result("c", 1.0)]
+    
+    combined = store._combine_search_results(vector_results, keyword_results, alpha=0.5)
+    
+    # b的向量距离接近最近，关键词分数最高
+    assert combined[0]["chunk_id"] == "b"
+    assert combined[-1]["chunk_id"] == "c"
+
+def test_cached_results_are_not_mutated(store):
+    vector_results = [result("near", 0.1), result("far", 0.8)]
+    
+    store._combine_search_results(vector_results, [], alpha=0.7)
+    
+    assert [r["similarity_score"] for r in vector_results] == [0.1, 0.8]
+
+def test_hybrid_search_returns_nearest_first(store, monkeypatch):
+    monkeypatch.setattr(
+        store, "search_similar_chunks_with_cache",
+        lambda document_id, query, k, where=None: [result("far", 1.5), result("near", 0.05)]
+    )
+    monkeypatch.setattr(store, "_keyword_search", lambda document_id, query, k, where=None: [])
+    
+    results = store.hybrid_search("doc", "question", k=1)
+    
+    assert [r["chunk_id"] for r in results] == ["near"]
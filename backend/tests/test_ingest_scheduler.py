@@ -0,0 +1,120 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import ingest_scheduler as scheduler
+from app.database import Base, Document
+
+@pytest.fixture
+def db(monkeypatch):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    monkeypatch.setattr(scheduler, "INGEST_MAX_BACKLOG_PAGES", 1000)
+    monkeypatch.setattr(scheduler, "INGEST_TENANT_MAX_BACKLOG_PAGES", 100)
+    yield session
+    session.close()
+
+START = datetime(2026, 1, 1)
+
+def add(db, document_id, tenant_id, pages, status=scheduler.DEFERRED_STATUS, lane=scheduler.LANE_BULK, minute=0):
+    db.add(Document(
+        id=document_id,
+        filename=f"{document_id}.pdf",
+        file_path=f"uploads/{document_id}.pdf",
+        file_size=1,
+        pages=pages,
+        status=status,
+        tenant_id=tenant_id,
+        lane=lane,
+        upload_time=START + timedelta(minutes=minute)
+    ))
+    db.commit()
+
+def selected_ids(db, limit=100):
+    return [document.id for document in scheduler.select_deferred(db, limit=limit)]
+
+def test_tenants_are_served_round_robin(db):
+    # 租户a先上传了三个文档，b和c各一个
+    add(db, "a1", "a", 10, minute=0)
+    add(db, "a2", "a", 10, minute=1)
+    add(db, "a3", "a", 10, minute=2)
+    add(db, "b1", "b", 10, minute=3)
+    add(db, "c1", "c", 10, minute=4)
+    
+    assert selected_ids(db, limit=3) == ["a1", "b1", "c1"]
+    assert selected_ids(db) == ["a1", "b1", "c1", "a2", "a3"]
+
+def test_tenant_backlog_limit_stops_that_tenant_only(db):
+    add(db, "a-running", "a", 80, status="processing")
+    add(db, "a1", "a", 30, minute=0)
+    add(db, "a2", "a", 5, minute=1)
+    add(db, "b1", "b", 30, minute=2)
+    
+    # a1超出租户上限；a2不能越过a1先处理
+    assert selected_ids(db) == ["b1"]
+
+def test_tenant_with_empty_backlog_always_admits_its_first_document(db):
+    add(db, "huge", "a", 500)
+    add(db, "after", "a", 10, minute=1)
+    
+    assert selected_ids(db) == ["huge"]
+
+def test_selected_documents_count_towards_the_lane_backlog(db, monkeypatch):
+    monkeypatch.setattr(scheduler, "INGEST_TENANT_MAX_BACKLOG_PAGES", 10000)
+    add(db, "running", "x", 900, status="processing")
+    add(db, "a1", "a", 60, minute=0)
+    add(db, "b1", "b", 60, minute=1)
+    add(db, "c1", "c", 60, lane=scheduler.LANE_INTERACTIVE, minute=2)
+    
+    # a1之后bulk积压达到960，b1会超出全局上限；interactive通道不受影响
+    assert selected_ids(db) == ["a1", "c1"]
+
+def test_small_document_overtakes_blocked_bulk_document_of_same_tenant(db, monkeypatch):
+    monkeypatch.setattr(scheduler, "INGEST_TENANT_MAX_BACKLOG_PAGES", 10000)
+    add(db, "running", "x", 900, status="processing")
+    add(db, "a-big", "a", 200, minute=0)
+    add(db, "a-big-2", "a", 10, minute=1)
+    add(db, "a-small", "a", 5, lane=scheduler.LANE_INTERACTIVE, minute=2)
+    add(db, "a-small-2", "a", 5, lane=scheduler.LANE_INTERACTIVE, minute=3)
+    
+    # a-big超出bulk通道上限，a-big-2仍排在它之后；小文档不受影响
+    assert selected_ids(db) == ["a-small", "a-small-2"]
+
+def test_check_admission_does_not_hold_interactive_uploads_behind_bulk(db):
+    add(db, "queued-bulk", "a", 10)
+    
+    assert scheduler.check_admission(db, "a", scheduler.LANE_INTERACTIVE, 1)["admitted"] is True
+    # bulk通道的新文档仍排在已排队的bulk文档之后
+    assert scheduler.check_admission(db, "b", scheduler.LANE_BULK, 1)["admitted"] is False
+
+def test_check_admission_defers_behind_queued_interactive_documents(db):
+    add(db, "queued-small", "a", 10, lane=scheduler.LANE_INTERACTIVE)
+    
+    assert scheduler.check_admission(db, "a", scheduler.LANE_INTERACTIVE, 1)["admitted"] is False
+    assert scheduler.check_admission(db, "b", scheduler.LANE_INTERACTIVE, 1)["admitted"] is True
+
+def test_admission_lock_serialises_a_tenant(monkeypatch):
+    monkeypatch.setattr(scheduler.cache_manager, "use_redis", False)
+    active = []
+    overlaps = []
+    
+    def admit(tenant_id):
+        with scheduler.admission_lock(tenant_id):
+            active.append(tenant_id)
+            if active.count(tenant_id) > 1:
+                overlaps.append(tenant_id)
+            time.sleep(0.01)
+            active.remove(tenant_id)
+    
+    threads = [threading.Thread(target=admit, args=(tenant,)) for tenant in ["a"] * 5 + ["b"] * 5]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert overlaps == []
@@ -0,0 +1,75 @@
+import math
+
+import pytest
+
+from app.core.keyword_index import KeywordIndex, tokenize
+
+@pytest.fixture
+def index(tmp_path):
+    keyword_index = KeywordIndex(str(tmp_path / "keyword_index.db"))
+    yield keyword_index
+    keyword_index.close()
+
+def chunk(chunk_id, content):
+    return {"chunk_id": chunk_id, "content": content}
+
+def test_tokenize_drops_stop_words_and_single_characters():
+    assert tokenize("的 Apple a 了 banana!") == ["apple", "banana"]
+
+def test_search_matches_bm25_formula(index):
+    index.add_chunks("doc", [
+        chunk("c0", "apple apple banana"),
+        chunk("c1", "banana cherry"),
+        chunk("c2", "cherry durian"),
+    ])
+    
+    results = dict(index.search("doc", "apple"))
+    
+    # 手工计算：N=3，df(apple)=1，c0长度3，平均长度7/3
+    k1, b = index.k1, index.b
+    idf = math.log(1 + (3 - 1 + 0.5) / (1 + 0.5))
+    norm = 2 + k1 * (1 - b + b * 3 / (7 / 3))
+    assert results == {"c0": pytest.approx(idf * 2 * (k1 + 1) / norm)}
+
+def test_rare_terms_and_higher_frequency_rank_first(index):
+    index.add_chunks("doc", [
+        chunk("common", "report report summary"),
+        chunk("rare", "report quantum"),
+        chunk("repeat", "quantum quantum report"),
+        chunk("other", "summary appendix"),
+    ])
+    
+    ranked = [chunk_id for chunk_id, _ in index.search("doc", "quantum report")]
+    
+    assert ranked[:2] == ["repeat", "rare"]
+    assert "other" not in ranked
+
+def test_search_is_scoped_to_document(index):
+    index.add_chunks("a", [chunk("c0", "apple pie")])
+    index.add_chunks("b", [chunk("c0", "banana bread")])
+    
+    assert [chunk_id for chunk_id, _ in index.search("a", "apple")] == ["c0"]
+    assert index.search("b", "apple") == []
+    assert index.search("missing", "apple") == []
+
+def test_readding_chunk_replaces_postings(index):
+    index.add_chunks("doc", [chunk("c0", "apple pie"), chunk("c1", "banana bread")])
+    index.add_chunks("doc", [chunk("c0", "cherry tart")])
+    
+    assert index.search("doc", "apple") == []
+    assert [chunk_id for chunk_id, _ in index.search("doc", "cherry")] == ["c0"]
+
+def test_limit_and_empty_query(index):
+    index.add_chunks("doc", [chunk(f"c{i}", "apple " * (i + 1)) for i in range(5)])
+    
+    assert len(index.search("doc", "apple", limit=2)) == 2
+    assert index.search("doc", "的 了 a") == []
+
+def test_delete_document(index):
+    index.add_chunks("doc", [chunk("c0", "apple pie")])
+    assert index.has_document("doc")
+    
+    index.delete_document("doc")
+    
+    assert not index.has_document("doc")
+    assert index.search("doc", "apple") == []
@@ -0,0 +1,124 @@
+import json
+import sys
+
+from app.core.cache_manager import MemoryCache
+
+def entry_size(key, value):
+    return sys.getsizeof(json.dumps(value, ensure_ascii=False)) + sys.getsizeof(key)
+
+def test_get_returns_a_copy():
+    cache = MemoryCache()
+    cache.set("k", {"items": [1]})
+    
+    value = cache.get("k")
+    value["items"].append(2)
+    
+    assert cache.get("k") == {"items": [1]}
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    
+    cache.set("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_expired_entry_is_a_miss(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.core.cache_manager.time.time", lambda: now[0])
+    cache = MemoryCache()
+    cache.set("short", "value", expire=10)
+    cache.set("long", "value", expire=100)
+    
+    now[0] += 11
+    
+    assert cache.get("short") is None
+    assert cache.get("long") == "value"
+    stats = cache.stats()
+    assert stats["expirations"] == 1
+    assert stats["entries"] == 1
+    assert stats["size_bytes"] == entry_size("long", "value")
+
+def test_byte_budget_evicts_oldest_entries():
+    value = "x" * 100
+    budget = entry_size("k0", value) * 3
+    cache = MemoryCache(max_bytes=budget)
+    
+    for i in range(5):
+        cache.set(f"k{i}", value)
+    
+    stats = cache.stats()
+    assert stats["entries"] == 3
+    assert stats["size_bytes"] <= budget
+    assert [cache.get(f"k{i}") for i in range(5)] == [None, None, value, value, value]
+
+def test_overwrite_replaces_size_accounting():
+    cache = MemoryCache()
+    cache.set("k", "x" * 1000)
+    cache.set("k", "y")
+    
+    assert cache.stats()["size_bytes"] == entry_size("k", "y")
+    assert cache.get("k") == "y"
+
+def test_value_larger_than_budget_is_rejected():
+    cache = MemoryCache(max_bytes=200)
+    
+    assert cache.set("big", "x" * 1000) is False
+    assert cache.get("big") is None
+    assert cache.stats()["size_bytes"] == 0
+
+def test_delete_and_clear_release_bytes():
+    cache = MemoryCache()
+    cache.set("a", 1)
+    cache.set("b", 2)
+    
+    assert cache.delete("a") is True
+    assert cache.delete("a") is False
+    assert cache.stats()["size_bytes"] == entry_size("b", 2)
+    
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["size_bytes"] == 0
+
+def test_invalidate_tag_removes_tagged_entries():
+    cache = MemoryCache()
+    cache.set("a", 1, tags=["doc:1"])
+    cache.set("b", 2, tags=["doc:1", "doc:2"])
+    cache.set("c", 3, tags=["doc:2"])
+    
+    assert sorted(cache.invalidate_tag("doc:1")) == ["a", "b"]
+    
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.tags == {"doc:2": {"c"}}
+    assert cache.invalidate_tag("doc:1") == []
+
+def test_tag_index_follows_eviction_expiry_and_delete(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.core.cache_manager.time.time", lambda: now[0])
+    cache = MemoryCache(max_entries=2)
+    cache.set("evicted", 1, tags=["doc:1"])
+    cache.set("expired", 2, expire=10, tags=["doc:2"])
+    cache.set("deleted", 3, tags=["doc:3"])
+    
+    now[0] += 11
+    cache.get("expired")
+    cache.delete("deleted")
+    
+    # 淘汰、过期、删除的条目都不再留在标签索引中
+    assert cache.tags == {}
+    assert cache.stats()["tags"] == 0
+
+def test_tags_count_towards_the_byte_budget():
+    cache = MemoryCache()
+    cache.set("k", 1, tags=["doc:1"])
+    
+    assert cache.stats()["size_bytes"] == entry_size("k", 1) + sys.getsizeof("doc:1")
+    
+    cache.clear()
+    assert cache.tags == {}
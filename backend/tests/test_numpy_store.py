@@ -0,0 +1,178 @@
+import json
+import os
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from app.core.numpy_store import NumpyClient, NumpyCollection, approximate_dot, encode, fit_quantization
+
+DIM = 8
+
+@pytest.fixture
+def client(tmp_path):
+    return NumpyClient(path=str(tmp_path))
+
+def vectors(start, count):
+    rng = np.random.default_rng(start)
+    return rng.standard_normal((count, DIM)).astype(np.float32)
+
+def upsert(collection, start, count, **metadata):
+    collection.upsert(
+        ids=[f"c{i}" for i in range(start, start + count)],
+        embeddings=vectors(start, count),
+        metadatas=[{"chunk_index": i, **metadata} for i in range(start, start + count)],
+        documents=[f"chunk {i}" for i in range(start, start + count)]
+    )
+
+def manifest(collection):
+    with open(os.path.join(collection.directory, NumpyCollection.MANIFEST), encoding="utf-8") as f:
+        return json.load(f)
+
+def data_files(collection):
+    return sorted(name for name in os.listdir(collection.directory) if name not in (".lock", NumpyCollection.MANIFEST))
+
+def test_upsert_appends_to_the_same_files(client):
+    collection = client.get_or_create_collection("doc")
+    upsert(collection, 0, 64)
+    files = data_files(collection)
+    
+    upsert(collection, 64, 64)
+    
+    assert data_files(collection) == files
+    assert manifest(collection)["rows"] == 128
+    vectors_file = manifest(collection)["files"]["vectors"]
+    assert os.path.getsize(os.path.join(collection.directory, vectors_file)) == 128 * DIM * 4
+
+def test_other_handles_see_appended_rows(client):
+    writer = client.get_or_create_collection("doc")
+    reader = client.get_collection("doc")
+    upsert(writer, 0, 10)
+    upsert(writer, 10, 10)
+    
+    query = vectors(10, 10)[3]
+    result = reader.query(query_embeddings=[query.tolist()], n_results=1)
+    
+    assert reader.count() == 20
+    assert result["ids"] == [["c13"]]
+    assert result["distances"][0][0] == pytest.approx(0.0, abs=1e-4)
+
+def test_reupserting_an_id_replaces_the_row(client):
+    collection = client.get_or_create_collection("doc")
+    upsert(collection, 0, 4)
+    replacement = vectors(100, 1)
+    collection.upsert(ids=["c1"], embeddings=replacement, documents=["new"])
+    
+    result = collection.query(query_embeddings=replacement.tolist(), n_results=4)
+    
+    assert collection.count() == 4
+    assert result["ids"][0][0] == "c1"
+    assert sorted(result["ids"][0]) == ["c0", "c1", "c2", "c3"]
+    assert collection.get(ids=["c1"])["documents"] == ["new"]
+
+def test_delete_hides_rows_and_compacts(client):
+    collection = client.get_or_create_collection("doc")
+    upsert(collection, 0, 6, document_id="a")
+    upsert(collection, 6, 4, document_id="b")
+    generation = manifest(collection)["generation"]
+    
+    collection.delete(where={"document_id": "a"})
+    
+    assert collection.count() == 4
+    assert collection.get()["ids"] == ["c6", "c7", "c8", "c9"]
+    result = collection.query(query_embeddings=vectors(0, 1).tolist(), n_results=10)
+    assert sorted(result["ids"][0]) == ["c6", "c7", "c8", "c9"]
+    
+    # 失效行多于有效行，压缩为新一代，上一代保留到下一次写入之后
+    assert manifest(collection)["generation"] != generation
+    assert manifest(collection)["rows"] == 4
+    assert any(generation in name for name in data_files(collection))
+    
+    upsert(collection, 10, 1)
+    upsert(collection, 11, 1)
+    assert not any(generation in name for name in data_files(collection))
+
+def test_reader_of_previous_generation_still_loads(client):
+    collection = client.get_or_create_collection("doc")
+    upsert(collection, 0, 4)
+    stale = client.get_collection("doc")
+    stale_manifest = manifest(collection)
+    
+    collection.delete(ids=["c0", "c1", "c2"])
+    
+    # 读取方刚读到旧清单，压缩后上一代文件还在，可以完整加载
+    stale._generation = None
+    stale._load(stale_manifest)
+    assert stale._ids == ["c0", "c1", "c2", "c3"]
+    assert stale.count() == 1
+
+def test_uncommitted_tail_is_discarded(client):
+    collection = client.get_or_create_collection("doc")
+    upsert(collection, 0, 4)
+    log_file = os.path.join(collection.directory, manifest(collection)["files"]["log"])
+    with open(log_file, "ab") as f:
+        f.write(b'{"id": "partial"')
+    
+    upsert(collection, 4, 2)
+    
+    assert client.get_collection("doc").get()["ids"] == [f"c{i}" for i in range(6)]
+
+@pytest.mark.parametrize("mode", ["float16", "int8"])
+def test_quantized_search_matches_exact_after_appends(tmp_path, mode):
+    exact = NumpyClient(path=str(tmp_path / "exact")).get_or_create_collection("doc")
+    quantized = NumpyClient(path=str(tmp_path / mode), quantization=mode).get_or_create_collection("doc")
+    for start in range(0, 200, 32):
+        upsert(exact, start, 32)
+        upsert(quantized, start, 32)
+    
+    query = vectors(999, 1).tolist()
+    expected = exact.query(query_embeddings=query, n_results=5)
+    result = quantized.query(query_embeddings=query, n_results=5)
+    
+    assert result["ids"] == expected["ids"]
+    assert result["distances"][0] == pytest.approx(expected["distances"][0], rel=1e-4)
+    assert quantized.storage_stats()["search_bytes"] < exact.storage_stats()["search_bytes"]
+
+@pytest.mark.parametrize("mode", ["float16", "int8"])
+def test_approximate_dot_scores_in_bounded_blocks(mode):
+    data = np.random.default_rng(0).standard_normal((5000, 64)).astype(np.float32)
+    params = fit_quantization(data, mode)
+    codes, _ = encode(data, mode, params)
+    query = data[0]
+    rows = np.arange(1, 5000, 3)
+    reconstructed = codes.astype(np.float32)
+    if mode == "int8":
+        reconstructed = (reconstructed + 128) * params["scale"] + params["offset"]
+    
+    assert approximate_dot(query, codes, params, block_rows=256) == pytest.approx(reconstructed @ query, rel=1e-3, abs=1e-2)
+    assert approximate_dot(query, codes, params, rows, block_rows=256) == pytest.approx(reconstructed[rows] @ query, rel=1e-3, abs=1e-2)
+    
+    # 临时内存只有一块float32，而不是整个压缩矩阵的float32副本
+    tracemalloc.start()
+    approximate_dot(query, codes, params, block_rows=256)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < data.nbytes / 4
+
+def test_storage_stats_report_disk_and_search_bytes(tmp_path):
+    collection = NumpyClient(path=str(tmp_path), quantization="int8").get_or_create_collection("doc")
+    upsert(collection, 0, 64)
+    
+    stats = collection.storage_stats()
+    
+    assert stats["quantization"] == "int8"
+    assert stats["full_precision_bytes"] == 64 * DIM * 4
+    assert stats["search_bytes"] < stats["full_precision_bytes"]
+    # 全精度向量仍在磁盘上用于重排
+    assert stats["disk_bytes"] > stats["full_precision_bytes"]
+
+def test_unreferenced_files_are_removed_on_write(client):
+    collection = client.get_or_create_collection("doc")
+    upsert(collection, 0, 4)
+    orphans = ["vectors-0123.npy", "codes-0123.npy", "params-0123.npz"]
+    for name in orphans:
+        open(os.path.join(collection.directory, name), "wb").close()
+    
+    upsert(collection, 4, 1)
+    
+    assert not set(orphans) & set(data_files(collection))
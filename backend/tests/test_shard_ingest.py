@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from app import celery_app as tasks
+from app.core.document_processor import DocumentProcessor
+
+def shard_chunks(*contents, page=1):
+    # 分片内的块编号从0开始
+    return [
+        DocumentProcessor._build_chunk(content, i, (page, page), {"chapter": 1})
+        for i, content in enumerate(contents)
+    ]
+
+class FakeProcessor:
+    def __init__(self, contents):
+        self.contents = contents
+        self.calls = []
+    
+    def iter_chunk_batches(self, file_path, start_page=0, end_page=None, parallel=True):
+        self.calls.append((start_page, end_page))
+        yield {"chunks": shard_chunks(*self.contents, page=start_page + 1), "pages_processed": end_page}
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+class FakeVectorStore:
+    embeddings = FakeEmbeddings()
+
+@pytest.fixture
+def shard_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(tasks, "INGEST_SHARD_DIR", str(tmp_path))
+    return tmp_path
+
+def test_renumber_chunks_assigns_global_indices():
+    chunks = shard_chunks("alpha", "beta", page=101)
+    
+    renumbered = DocumentProcessor.renumber_chunks(chunks, 40)
+    
+    assert [chunk["chunk_index"] for chunk in renumbered] == [40, 41]
+    assert [chunk["content"] for chunk in renumbered] == ["alpha", "beta"]
+    assert renumbered[0]["page_start"] == renumbered[0]["page_end"] == 101
+    assert renumbered[0]["chapter"] == 1
+    # chunk_id随全局编号重新生成，与整篇串行入库时的生成方式一致
+    assert renumbered[1]["chunk_id"] == DocumentProcessor._build_chunk("beta", 41)["chunk_id"]
+    assert renumbered[1]["chunk_id"] != chunks[1]["chunk_id"]
+
+def test_renumber_chunks_is_deterministic():
+    chunks = shard_chunks("alpha", "beta")
+    
+    first = DocumentProcessor.renumber_chunks(chunks, 7)
+    second = DocumentProcessor.renumber_chunks(chunks, 7)
+    
+    assert first == second
+    assert chunks[0]["chunk_index"] == 0
+
+def test_shard_round_trip(shard_dir):
+    path = tasks._shard_path("doc", 100, 200)
+    chunks = shard_chunks("alpha", "beta")
+    
+    tasks._write_shard(path, chunks, [[0.5, 1.5], [2.5, 3.5]])
+    loaded_chunks, embeddings = tasks._read_shard(path)
+    
+    assert loaded_chunks == chunks
+    assert embeddings.dtype == np.float32
+    assert embeddings.tolist() == [[0.5, 1.5], [2.5, 3.5]]
+    assert sorted(p.name for p in (shard_dir / "doc").iterdir()) == [
+        "pages-000100-000200.json",
+        "pages-000100-000200.npy"
+    ]
+
+def test_shard_without_completion_marker_is_not_done(shard_dir, monkeypatch):
+    path = tasks._shard_path("doc", 0, 100)
+    tasks._write_shard(path, shard_chunks("stale"), [[1.0, 1.0]])
+    # 模拟写入向量后、写入文本块文件前中断
+    (shard_dir / "doc" / "pages-000000-000100.json").unlink()
+    processor = FakeProcessor(["fresh"])
+    monkeypatch.setattr(tasks, "get_components", lambda: (processor, FakeVectorStore()))
+    
+    result = tasks.ingest_shard_task("doc", "doc.pdf", 0, 100, 300)
+    
+    assert processor.calls == [(0, 100)]
+    assert result == {"start_page": 0, "end_page": 100, "chunk_count": 1}
+    assert [chunk["content"] for chunk in tasks._read_shard(path)[0]] == ["fresh"]
+
+def test_completed_shard_is_skipped_on_retry(shard_dir, monkeypatch):
+    processor = FakeProcessor(["alpha", "beta", "gamma"])
+    monkeypatch.setattr(tasks, "get_components", lambda: (processor, FakeVectorStore()))
+    
+    first = tasks.ingest_shard_task("doc", "doc.pdf", 100, 200, 300)
+    
+    def fail():
+        raise AssertionError("已完成的分片不应重新处理")
+    monkeypatch.setattr(tasks, "get_components", fail)
+    
+    second = tasks.ingest_shard_task("doc", "doc.pdf", 100, 200, 300)
+    
+    assert first == second == {"start_page": 100, "end_page": 200, "chunk_count": 3}
+    assert processor.calls == [(100, 200)]
+    chunks, embeddings = tasks._read_shard(tasks._shard_path("doc", 100, 200))
+    assert [chunk["chunk_index"] for chunk in chunks] == [0, 1, 2]
+    assert embeddings.shape == (3, 2)
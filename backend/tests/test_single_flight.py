@@ -0,0 +1,158 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core.single_flight import SingleFlight
+
+class FakeRedis:
+    """只实现SingleFlight用到的命令"""
+    
+    def __init__(self):
+        self.values = {}
+        self.shared = []
+    
+    def get(self, key):
+        return self.values.get(key)
+    
+    def set(self, key, value, nx=False, px=None):
+        if nx and key in self.values:
+            return False
+        self.values[key] = value
+        return True
+    
+    def setex(self, key, ttl, value):
+        self.shared.append(key)
+        self.values[key] = value
+    
+    def eval(self, script, numkeys, key, token):
+        if self.values.get(key) == token:
+            del self.values[key]
+
+class FakeCache:
+    def __init__(self, redis_client=None):
+        self.use_redis = redis_client is not None
+        self.redis_client = redis_client
+
+def local_flight():
+    return SingleFlight(cache=FakeCache(), use_redis=False)
+
+def test_concurrent_calls_share_one_execution():
+    flight = local_flight()
+    calls = []
+    
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"answer": 42}
+    
+    async def main():
+        return await asyncio.gather(*(flight.run("k", compute) for _ in range(5)))
+    
+    results = asyncio.run(main())
+    
+    assert results == [{"answer": 42}] * 5
+    assert len(calls) == 1
+    assert flight.stats()["executions"] == 1
+    assert flight.stats()["coalesced"] == 4
+    assert flight.inflight == {}
+
+def test_different_keys_run_separately():
+    flight = local_flight()
+    calls = []
+    
+    async def compute(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value
+    
+    async def main():
+        return await asyncio.gather(
+            flight.run("a", lambda: compute("a")),
+            flight.run("b", lambda: compute("b"))
+        )
+    
+    assert asyncio.run(main()) == ["a", "b"]
+    assert sorted(calls) == ["a", "b"]
+
+def test_cancelled_caller_does_not_cancel_shared_task():
+    flight = local_flight()
+    
+    async def main():
+        started = asyncio.Event()
+        finish = asyncio.Event()
+        
+        async def compute():
+            started.set()
+            await finish.wait()
+            return "done"
+        
+        first = asyncio.ensure_future(flight.run("k", compute))
+        second = asyncio.ensure_future(flight.run("k", compute))
+        await started.wait()
+        
+        # 发起请求的客户端断开，其他等待者仍拿到结果
+        first.cancel()
+        await asyncio.sleep(0)
+        finish.set()
+        
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+    
+    assert asyncio.run(main()) == "done"
+
+def test_failure_is_not_reused_after_it_finishes():
+    flight = local_flight()
+    attempts = []
+    
+    async def compute():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise RuntimeError("boom")
+        return "ok"
+    
+    async def main():
+        failed = await asyncio.gather(*(flight.run("k", compute) for _ in range(3)), return_exceptions=True)
+        # 失败的执行结束后不再合并，下一次调用重新执行
+        retried = await flight.run("k", compute)
+        return failed, retried
+    
+    failed, retried = asyncio.run(main())
+    
+    assert all(isinstance(error, RuntimeError) for error in failed)
+    assert retried == "ok"
+    assert len(attempts) == 2
+
+def test_only_shareable_results_are_published_to_redis():
+    redis_client = FakeRedis()
+    flight = SingleFlight(cache=FakeCache(redis_client), use_redis=True)
+    
+    def shareable(result):
+        return result["success"]
+    
+    async def main():
+        failed = await flight.run("bad", lambda: asyncio.sleep(0, {"success": False}), shareable)
+        succeeded = await flight.run("good", lambda: asyncio.sleep(0, {"success": True}), shareable)
+        return failed, succeeded
+    
+    failed, succeeded = asyncio.run(main())
+    
+    assert failed == {"success": False}
+    assert succeeded == {"success": True}
+    assert redis_client.shared == ["flight:result:good"]
+    assert json.loads(redis_client.values["flight:result:good"]) == {"success": True}
+    # 执行完成后释放锁
+    assert not any(key.startswith("flight:lock:") for key in redis_client.values)
+
+def test_result_published_by_another_replica_is_reused():
+    redis_client = FakeRedis()
+    redis_client.values["flight:result:k"] = json.dumps({"answer": "remote"})
+    flight = SingleFlight(cache=FakeCache(redis_client), use_redis=True)
+    
+    async def compute():
+        raise AssertionError("持锁者已写入结果，不应重复执行")
+    
+    assert asyncio.run(flight.run("k", compute)) == {"answer": "remote"}
+    assert flight.stats()["remote_hits"] == 1